@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from os.path import join, exists, dirname, abspath
+
+import check_and_update_conf as conf
+from ctng_matrix import CtngMatrix
+
+## Benchmarks check_and_update_conf.py on synthetic inputs: config files of
+## a given number of lines (one group per arch, several versions per arch),
+## fake install trees with stub compilers and a synthetic build/latest. Each
+## phase is timed on its own, then the whole script is run end to end.
+
+SCRIPT = join(dirname(abspath(__file__)), "check_and_update_conf.py")
+
+NEW_VERSION = "15.2.0"
+
+parser = argparse.ArgumentParser(
+    description="Benchmark check_and_update_conf.py on synthetic inputs."
+)
+parser.add_argument(
+    "--lines",
+    default="1000,10000,50000,200000",
+    metavar="N[,N...]",
+    help="approximate number of lines of each generated config file",
+)
+parser.add_argument(
+    "--versions",
+    default=12,
+    type=int,
+    metavar="N",
+    help="number of existing versions per arch in the config files",
+)
+parser.add_argument(
+    "--targets",
+    default=8,
+    type=int,
+    metavar="N",
+    help="number of arches getting the new version (with an install tree)",
+)
+parser.add_argument(
+    "--tree-files",
+    default=500,
+    type=int,
+    metavar="N",
+    help="number of extra files in each install tree (headers, libs...)",
+)
+parser.add_argument("--repeat", default=3, type=int, metavar="N")
+parser.add_argument(
+    "--work-dir",
+    required=False,
+    metavar="DIR",
+    help="where to generate the inputs (a temporary directory by default)",
+)
+parser.add_argument("--keep", action="store_true", help="don't remove the inputs")
+parser.add_argument(
+    "--baseline",
+    default="bench.baseline.json",
+    metavar="BASELINE_PATH",
+    help="baseline to compare with (if it exists)",
+)
+parser.add_argument(
+    "--save-baseline",
+    action="store_true",
+    help="store the results as the new baseline instead of comparing",
+)
+parser.add_argument(
+    "--threshold",
+    default=1.25,
+    type=float,
+    metavar="RATIO",
+    help="ratio against the baseline above which a phase is reported as slower",
+)
+parser.add_argument("--json", metavar="RESULTS_PATH", help="also write results here")
+
+
+## Synthetic arch names must not end with digits, or the compiler IDs would
+## be ambiguous (e.g. 'syn1' + '1320' vs 'syn11' + '320').
+def arch_name(index: int):
+    letters = ""
+    index += 1
+    while index:
+        index, r = divmod(index - 1, 26)
+        letters = chr(ord("a") + r) + letters
+    return f"syn{letters}"
+
+
+def old_versions(count: int):
+    versions = []
+    major = 15
+    while len(versions) < count:
+        major -= 1
+        for minor in (2, 1):
+            versions.append(f"{major}.{minor}.0")
+    return sorted(versions[:count], key=conf.version_key)
+
+
+def generate_properties(path: str, lang: str, arches, versions):
+    with open(path, "w") as f:
+        f.write(f"# Synthetic {lang} config\n")
+        f.write("compilers=" + ":".join(f"&g{a}" for a in arches) + "\n")
+        f.write("defaultCompiler=none\n\n")
+        for arch in arches:
+            ids = [conf.CompilerId(arch, v, lang) for v in versions]
+            f.write(f"################################\n# GCC for {arch}\n")
+            f.write(f"group.g{arch}.compilers={':'.join(ids)}\n")
+            f.write(f"group.g{arch}.groupName={arch} GCC\n")
+            f.write(f"group.g{arch}.isSemVer=true\n")
+            for version, compiler_id in zip(versions, ids):
+                tree = f"/opt/compiler-explorer/{arch}/gcc-{version}/bin"
+                suffix = conf.COMPILER_SUFFIX[lang]
+                f.write(f"compiler.{compiler_id}.exe={tree}/{arch}-linux-{suffix}\n")
+                f.write(f"compiler.{compiler_id}.semver={version}\n")
+                f.write(f"compiler.{compiler_id}.name={arch} gcc {version}\n")
+                f.write(
+                    f"compiler.{compiler_id}.objdumper={tree}/{arch}-linux-objdump\n"
+                )
+            f.write("\n")
+
+
+def arch_count(lines: int, versions: int):
+    ## see generate_properties() for the number of lines per arch
+    return max(1, lines // (versions * 4 + 6))
+
+
+def generate_install_tree(root: str, arch: str, version: str, tree_files: int):
+    tree = join(root, arch, f"gcc-{version}")
+    bin_dir = join(tree, f"{arch}-linux", "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    for suffix in set(conf.COMPILER_SUFFIX.values()) | {"objdump", "c++filt"}:
+        path = join(bin_dir, f"{arch}-linux-{suffix}")
+        with open(path, "w") as f:
+            f.write(f"#!/bin/sh\necho '{arch}-linux-{suffix} (GCC) {version}'\n")
+        os.chmod(path, 0o755)
+
+    for i in range(tree_files):
+        directory = join(tree, "lib", "gcc", f"{arch}-linux", version, f"d{i % 20}")
+        os.makedirs(directory, exist_ok=True)
+        with open(join(directory, f"f{i}.h"), "w") as f:
+            f.write("\n")
+
+
+def generate_ctng_config(path: str, arch: str, version: str):
+    with open(path, "w") as f:
+        f.write("#\n# Synthetic crosstool-NG config\n#\n")
+        for i in range(800):
+            f.write(f'CT_SYNTHETIC_{i}="{i}"\n# CT_SYNTHETIC_OFF_{i} is not set\n')
+        f.write(f'CT_ARCH="{arch}"\nCT_GCC_VERSION="{version}"\n')
+        for ct_lang in conf.CT_LANGS.values():
+            f.write(f"CT_CC_LANG_{ct_lang}=y\n")
+
+
+def generate(work_dir: str, lines: int, versions_count: int, targets_count, tree_files):
+    versions = old_versions(versions_count)
+    arches = [arch_name(i) for i in range(arch_count(lines, versions_count))]
+    targets = arches[: min(targets_count, len(arches))]
+
+    config_dir = join(work_dir, "config")
+    install_root = join(work_dir, "opt")
+    ctng_dir = join(work_dir, "build", "latest")
+    for d in (config_dir, install_root, ctng_dir):
+        os.makedirs(d, exist_ok=True)
+
+    for lang in conf.LANGS:
+        generate_properties(
+            join(config_dir, f"{conf.FILEPREFIX[lang]}.amazon.properties"),
+            lang,
+            arches,
+            versions,
+        )
+
+    for arch in targets:
+        generate_install_tree(install_root, arch, NEW_VERSION, tree_files)
+        for version in versions + [NEW_VERSION]:
+            generate_ctng_config(
+                join(ctng_dir, f"{arch}-{version}.config"), arch, version
+            )
+
+    with open(join(work_dir, "targets.txt"), "w") as f:
+        for arch in targets:
+            f.write(f"{arch} {NEW_VERSION}\n")
+
+    return {
+        "config_dir": config_dir,
+        "install_root": install_root,
+        "ctng_dir": ctng_dir,
+        "targets": targets,
+        "arches": len(arches),
+    }
+
+
+## Each phase gets fresh module state so that nothing is reused from a
+## previous phase or a previous repetition.
+def reset_state(inputs):
+    conf.PARSE_CACHE = None
+    conf.PARSED_CONFS.clear()
+    conf.VERSION_INDEXES.clear()
+    conf.COMPILER_ID_DECODER = None
+    conf.TOOLCHAIN_INDEX = conf.ToolchainIndex()
+    conf.COMPILER_PROBER = conf.CompilerProber(
+        conf.parser.get_default("probe_jobs"), conf.parser.get_default("probe_timeout")
+    )
+    conf.CTNG_MATRIX = CtngMatrix(config_dir=inputs["ctng_dir"])
+
+
+def conf_paths(inputs):
+    return [
+        join(inputs["config_dir"], f"{conf.FILEPREFIX[lang]}.amazon.properties")
+        for lang in conf.LANGS
+    ]
+
+
+def phase_parse(inputs, _):
+    for path in conf_paths(inputs):
+        conf.get_parsed_conf(path)
+
+
+def prepare_parse_cached(inputs, work_dir):
+    cache_dir = join(work_dir, "parse-cache")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    conf.PARSE_CACHE = conf.ParseCache(cache_dir, 1024 * 1024 * 1024)
+    for path in conf_paths(inputs):
+        conf.parse_file(path)
+    conf.PARSED_CONFS.clear()
+    return cache_dir
+
+
+def phase_parse_cached(inputs, cache_dir):
+    conf.PARSE_CACHE = conf.ParseCache(cache_dir, 1024 * 1024 * 1024)
+    phase_parse(inputs, None)
+
+
+def phase_find_files(inputs, _):
+    for arch in inputs["targets"]:
+        for lang in conf.LANGS:
+            for suffix in ("objdump", "c++filt", conf.COMPILER_SUFFIX[lang]):
+                conf.findFile(arch, lang, NEW_VERSION, inputs["install_root"], suffix)
+
+
+def phase_find_compilers(inputs, _):
+    for arch in inputs["targets"]:
+        for lang in conf.LANGS:
+            conf.findCompiler(arch, lang, NEW_VERSION, inputs["install_root"])
+
+
+def prepare_parsed(inputs, _):
+    phase_parse(inputs, None)
+
+
+def phase_test_prev(inputs, _):
+    for arch in inputs["targets"]:
+        for lang in conf.LANGS:
+            p = conf.PARSED_CONFS[
+                join(inputs["config_dir"], f"{conf.FILEPREFIX[lang]}.amazon.properties")
+            ]
+            if not conf.test_prev(NEW_VERSION, arch, lang, p):
+                raise conf.Woops(f"No previous compiler found for {arch} {lang}")
+
+
+def prepare_add_sorted(inputs, _):
+    phase_parse(inputs, None)
+    p = conf.PARSED_CONFS[conf_paths(inputs)[0]]
+    lines = [p.props["compilers"].text]
+    lines += [p.props[f"group.g{arch}.compilers"].text for arch in inputs["targets"]]
+    return lines
+
+
+def phase_add_sorted(inputs, lines):
+    for line in lines:
+        for arch in inputs["targets"]:
+            conf.add_sorted(line, conf.CompilerId(arch, NEW_VERSION, conf.LANGS[0]))
+
+
+def prepare_end_to_end(inputs, work_dir):
+    config_copy = join(work_dir, "config-copy")
+    shutil.rmtree(config_copy, ignore_errors=True)
+    shutil.copytree(inputs["config_dir"], config_copy)
+    return config_copy
+
+
+def phase_end_to_end(inputs, config_copy):
+    work_dir = dirname(config_copy)
+    subprocess.run(
+        [
+            sys.executable,
+            SCRIPT,
+            "--batch",
+            join(work_dir, "targets.txt"),
+            "--guess-previous",
+            "--config-dir",
+            config_copy,
+            "--ctng-config-dir",
+            inputs["ctng_dir"],
+            "--inplace",
+            "--install-root",
+            inputs["install_root"],
+            "--summary",
+            join(work_dir, "summary.txt"),
+        ],
+        cwd=work_dir,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+## name -> (prepare, run), prepare is not timed and its result is given to run
+PHASES = {
+    "parse": (None, phase_parse),
+    "parse (cached)": (prepare_parse_cached, phase_parse_cached),
+    "findFile": (None, phase_find_files),
+    "findCompiler": (None, phase_find_compilers),
+    "test_prev": (prepare_parsed, phase_test_prev),
+    "add_sorted": (prepare_add_sorted, phase_add_sorted),
+    "end to end": (prepare_end_to_end, phase_end_to_end),
+}
+
+
+def run_phase(inputs, work_dir: str, prepare, run, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            reset_state(inputs)
+            state = prepare(inputs, work_dir) if prepare else None
+            start = time.perf_counter()
+            run(inputs, state)
+            timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": statistics.median(timings)}
+
+
+def run_size(args, lines: int, work_dir: str):
+    start = time.perf_counter()
+    inputs = generate(work_dir, lines, args.versions, args.targets, args.tree_files)
+    print(
+        f"## {lines} lines: {inputs['arches']} arches, {len(inputs['targets'])} targets"
+        f" (generated in {time.perf_counter() - start:.2f}s)"
+    )
+
+    results = {}
+    for name, (prepare, run) in PHASES.items():
+        results[name] = run_phase(inputs, work_dir, prepare, run, args.repeat)
+    return results
+
+
+def report(results, baseline, threshold: float):
+    slower = 0
+    print(
+        f"\n{'':10} {'phase':<16} {'min':>9} {'median':>9} {'baseline':>9} {'ratio':>6}"
+    )
+    for size, phases in results.items():
+        for name, timing in phases.items():
+            line = f"{size:>10} {name:<16} {timing['min']:9.4f} {timing['median']:9.4f}"
+            base = baseline.get(size, {}).get(name)
+            if base:
+                ratio = timing["min"] / base["min"] if base["min"] else 1
+                line += f" {base['min']:9.4f} {ratio:5.2f}x"
+                if ratio > threshold:
+                    line += " SLOWER"
+                    slower += 1
+            print(line)
+    return slower
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.lines.split(",")]
+
+    baseline = {}
+    if exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    work_root = args.work_dir or tempfile.mkdtemp(prefix="bench-update-conf-")
+    results = {}
+    try:
+        for lines in sizes:
+            work_dir = join(work_root, str(lines))
+            shutil.rmtree(work_dir, ignore_errors=True)
+            os.makedirs(work_dir)
+            results[str(lines)] = run_size(args, lines, work_dir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    output = {
+        "python": sys.version.split()[0],
+        "versions": args.versions,
+        "targets": args.targets,
+        "tree_files": args.tree_files,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(output, f, indent=1)
+        print(f"Baseline saved in {args.baseline}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=1)
+
+    slower = report(results, baseline, args.threshold)
+    if baseline:
+        print(
+            f"{slower} phases slower than the baseline by more than {args.threshold}x"
+        )
+    sys.exit(1 if slower else 0)
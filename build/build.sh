@@ -10,12 +10,23 @@ VERSION=$2
 BASEVERSION=${VERSION}
 if echo "${VERSION}" | grep 'trunk'; then
     VERSION=${VERSION}-$(date +%Y%m%d)
-    LAST_REVISION="${4}"
-else
-    LAST_REVISION="ignore"
 fi
+LAST_REVISION="${4:-}"
+
+# Codec of the tarball, optionally with a level (see package.py), e.g. zstd:19.
+# With CT_PACKAGE_SEEKABLE set (xz only), the tarball is seekable and comes
+# with an index for extract.py.
+PACKAGE_CODEC=${CT_PACKAGE_CODEC:-xz}
+PACKAGE_ARGS=(--codec "${PACKAGE_CODEC}")
+if [[ -n "${CT_PACKAGE_SEEKABLE:-}" ]]; then
+    PACKAGE_ARGS+=(--seekable)
+fi
+case "${PACKAGE_CODEC%%:*}" in
+    zstd) EXTENSION=tar.zst ;;
+    *) EXTENSION=tar.xz ;;
+esac
 
-OUTPUT=/home/gcc-user/${ARCHITECTURE}-gcc-${VERSION}.tar.xz
+OUTPUT=/home/gcc-user/${ARCHITECTURE}-gcc-${VERSION}.${EXTENSION}
 STAGING_DIR=/opt/compiler-explorer/${ARCHITECTURE}/gcc-${VERSION}
 export CT_PREFIX=${STAGING_DIR}
 
@@ -26,9 +37,9 @@ if [[ $ARG3 =~ s3:// ]]; then
 else
     S3OUTPUT=""
     if [[ -d "${ARG3}" ]]; then
-        OUTPUT="${ARG3}/${FULLNAME}.tar.xz"
+        OUTPUT="${ARG3}/${FULLNAME}.${EXTENSION}"
     else
-        OUTPUT=${3-/home/gcc-user/${FULLNAME}.tar.xz}
+        OUTPUT=${3-/home/gcc-user/${FULLNAME}.${EXTENSION}}
     fi
 fi
 
@@ -38,6 +49,7 @@ CT_NG_VERSIONS=(latest)
 for version in "${CT_NG_VERSIONS[@]}"; do
     if [[ -f "${version}/${CONFIG_FILE}" ]]; then
         CONFIG_FILE=${version}/${CONFIG_FILE}
+        CT_DIR=${ROOT}/crosstool-ng-$version
         CT=${ROOT}/crosstool-ng-$version/ct-ng
         if [[ ! -x ${CT} ]]; then
             # installed version rather than ct-ng configured with --enable-local
@@ -51,16 +63,6 @@ for version in "${CT_NG_VERSIONS[@]}"; do
     fi
 done
 
-REVISION="$(date +%s)"  # make up a revision every time
-
-echo "ce-build-revision:${REVISION}"
-echo "ce-build-output:${OUTPUT}"
-
-if [[ "${REVISION}" == "${LAST_REVISION}" ]]; then
-    echo "ce-build-status:SKIPPED"
-    exit
-fi
-
 # Pick the host base compiler.
 # We need to pick one as close as possible to the GCC version being built because of GNAT (Ada).
 # It needs a matching compiler to build the runtime. Too old or too recent may cause build errors.
@@ -89,25 +91,267 @@ for i in 1 2 3; do
     V=${V%.*}
 done
 
+# The revision is a hash of everything that affects the output: this script,
+# the ct-ng config and the local patches it uses, the ct-ng revision, the host
+# compiler and, for sources taken from git, the upstream commit. If the git
+# server can't be reached, a new revision is made up so that the build
+# happens; a branch which doesn't exist is an error.
+config_value() {
+    sed -n -r "s|^CT_$1=\"?([^\"]*)\"?$|\1|p" "${CONFIG_FILE}"
+}
+
+# The local patches of the packages of the config, for their version
+# (PATCH_DIR/PKG/VERSION/*) or for all the versions (PATCH_DIR/PKG/*), so that
+# changing a patch only changes the revision of the targets using it.
+local_patches() {
+    local pkg name version
+    for pkg in $(sed -n -r 's|^CT_([A-Z0-9_]+)_PKG_NAME=.*|\1|p' "${CONFIG_FILE}"); do
+        name=$(config_value "${pkg}_PKG_NAME")
+        version=$(config_value "${pkg}_VERSION")
+        if [[ -n "${name}" && -d "${name}" ]]; then
+            find "${name}" -maxdepth 1 -type f -print0
+            if [[ -n "${version}" && -d "${name}/${version}" ]]; then
+                find "${name}/${version}" -type f -print0
+            fi
+        fi
+    done
+}
+
+# Commit of a branch, or of a tag, of a git repository. The refs are matched
+# exactly: ls-remote also returns the refs merely ending with the name (e.g.
+# refs/heads/foo/master for master). Prints nothing if the server can't be
+# reached, fails if the name doesn't resolve.
+devel_commit() {
+    local url=$1 branch=$2 refs ref commit
+    if ! refs=$(git ls-remote "${url}" "refs/heads/${branch}" "refs/tags/${branch}" "refs/tags/${branch}^{}"); then
+        echo "Can't query ${url}, the revision is made up" >&2
+        return
+    fi
+    for ref in "refs/heads/${branch}" "refs/tags/${branch}^{}" "refs/tags/${branch}"; do
+        commit=$(awk -v ref="${ref}" '$2 == ref { print $1 }' <<< "${refs}")
+        if [[ -n "${commit}" ]]; then
+            echo "${commit}"
+            return
+        fi
+    done
+    echo "${branch} is neither a branch nor a tag of ${url}" >&2
+    return 1
+}
+
+ctng_revision() {
+    if [[ -f "${CT_DIR}/REVISION" ]]; then
+        cat "${CT_DIR}/REVISION"
+    else
+        ${CT} version | head -n 1
+    fi
+}
+
+build_inputs() {
+    echo "build.sh $(sha256sum < "${BASH_SOURCE[0]}")"
+    echo "config $(sha256sum < "${CONFIG_FILE}")"
+    echo "package ${PACKAGE_ARGS[*]}"
+
+    local patch_dir
+    patch_dir=$(config_value LOCAL_PATCH_DIR)
+    if [[ -n "${patch_dir}" && -d "${patch_dir}" ]]; then
+        (cd "${patch_dir}" && local_patches | LC_ALL=C sort -z -u | xargs -0 -r sha256sum)
+    fi
+
+    echo "ct-ng $(ctng_revision)"
+
+    echo "host $(readlink -f "$(command -v gcc)") $(gcc --version | head -n 1)"
+
+    if [[ "$(config_value GCC_SRC_DEVEL)" == "y" ]]; then
+        local commit
+        commit=$(config_value GCC_DEVEL_REVISION)
+        if [[ -z "${commit}" ]]; then
+            commit=$(devel_commit "$(config_value GCC_DEVEL_URL)" "$(config_value GCC_DEVEL_BRANCH)")
+        fi
+        echo "gcc ${commit:-unknown-$(date +%s)}"
+    fi
+}
+
+REVISION=$(build_inputs | sha256sum | cut -c 1-16)
+
+# Maps the revision of the last successful build of this target to its
+# tarball, next to the tarballs (locally or on S3).
+MANIFEST_NAME=${ARCHITECTURE}-gcc-${BASEVERSION}.ce-build
+if [[ -n "${S3OUTPUT}" ]]; then
+    MANIFEST=${S3OUTPUT%/*}/${MANIFEST_NAME}
+    ARTIFACT=${S3OUTPUT}
+    if [[ "${ARTIFACT}" == */ ]]; then
+        ARTIFACT=${ARTIFACT}${FULLNAME}.${EXTENSION}
+    fi
+else
+    MANIFEST=$(dirname "${OUTPUT}")/${MANIFEST_NAME}
+    ARTIFACT=${OUTPUT}
+fi
+
+artifact_exists() {
+    if [[ "$1" =~ s3:// ]]; then
+        aws s3 ls "$1" > /dev/null
+    else
+        [[ -f "$1" ]]
+    fi
+}
+
+LAST_BUILT=""
+if [[ -n "${S3OUTPUT}" ]]; then
+    LAST_BUILT=$(aws s3 cp "${MANIFEST}" - 2>/dev/null || true)
+elif [[ -f "${MANIFEST}" ]]; then
+    LAST_BUILT=$(cat "${MANIFEST}")
+fi
+
+echo "ce-build-revision:${REVISION}"
+
+if [[ "${REVISION}" == "${LAST_REVISION}" ]]; then
+    echo "ce-build-output:${OUTPUT}"
+    echo "ce-build-status:SKIPPED"
+    exit
+fi
+
+if [[ "${LAST_BUILT%% *}" == "${REVISION}" ]] && artifact_exists "${LAST_BUILT#* }"; then
+    echo "ce-build-output:${LAST_BUILT#* }"
+    echo "ce-build-status:SKIPPED"
+    exit
+fi
+
+echo "ce-build-output:${OUTPUT}"
+
 cp "${CONFIG_FILE}" .config
+
+# With CT_RESUME set, ct-ng saves the state of the build before each step, in a
+# work directory kept across attempts (CT_RESUME_DIR, .resume by default). A
+# failed build is then restarted from the step that failed (or from the step
+# named by CT_RESUME, e.g. CT_RESUME=libc) instead of from scratch, e.g. after
+# changing the host compiler. The saved states are dropped when the config or
+# ct-ng change, and after a successful build.
+RESTART_ARGS=()
+if [[ -n "${CT_RESUME:-}" ]]; then
+    RESUME_DIR=${CT_RESUME_DIR:-${ROOT}/.resume}
+    RESUME_KEY="${FULLNAME} $(sha256sum < "${CONFIG_FILE}" | cut -c 1-16) $(ctng_revision)"
+    if [[ "$(cat "${RESUME_DIR}/key" 2>/dev/null || true)" != "${RESUME_KEY}" ]]; then
+        rm -rf "${RESUME_DIR:?}/work"
+        mkdir -p "${RESUME_DIR}"
+        echo "${RESUME_KEY}" > "${RESUME_DIR}/key"
+    fi
+    sed -i -r \
+        -e "s|^CT_WORK_DIR=.*|CT_WORK_DIR=\"${RESUME_DIR}/work\"|" \
+        -e 's|^# CT_DEBUG_CT is not set|CT_DEBUG_CT=y\nCT_DEBUG_CT_SAVE_STEPS=y\nCT_DEBUG_CT_SAVE_STEPS_GZIP=y|' \
+        .config
+fi
+
 ${CT} olddefconfig
 # oldconfig will restore mirror urls, so as a workaround until
 # https://github.com/crosstool-ng/crosstool-ng/issues/1609 gets
 # fixed we have to update the mirror url after calling oldconfig
 sed -i -r 's|CT_ISL_MIRRORS=".*"|CT_ISL_MIRRORS="https://libisl.sourceforge.io/"|g' .config
-if ! ${CT} "build.$(nproc)"; then
-    cat build.log
-    cp build.log $(dirname "${OUTPUT}")/"build.$ARCHITECTURE.$VERSION.log"
-    exit 1
+
+# Shared cache of sources filled by source_cache.py: archives are taken from
+# there and VCS sources are cloned from its git mirrors. With CT_OFFLINE set,
+# the mirrors of all the packages point to the cache, so ct-ng can't download
+# anything else. CT_FORBID_DOWNLOAD is not used as it also forbids cloning the
+# git mirrors, needed by all the *_SRC_DEVEL configs.
+if [[ -n "${CT_TARBALLS_CACHE:-}" ]]; then
+    sed -i -r "s|^CT_LOCAL_TARBALLS_DIR=.*|CT_LOCAL_TARBALLS_DIR=\"${CT_TARBALLS_CACHE}\"|" .config
+    sed -i -r 's|^CT_SAVE_TARBALLS=y|# CT_SAVE_TARBALLS is not set|' .config
+    if [[ -f "${CT_TARBALLS_CACHE}/git/mirrors" ]]; then
+        while read -r url mirror; do
+            sed -i "s|_DEVEL_URL=\"${url}\"|_DEVEL_URL=\"file://${CT_TARBALLS_CACHE}/git/${mirror}\"|" .config
+        done < "${CT_TARBALLS_CACHE}/git/mirrors"
+    fi
+    if [[ -n "${CT_OFFLINE:-}" ]]; then
+        sed -i -r \
+            -e "s|^(CT_[A-Z0-9_]+_MIRRORS)=.*|\\1=\"file://${CT_TARBALLS_CACHE}\"|" \
+            -e 's|^CT_USE_MIRROR=y|# CT_USE_MIRROR is not set|' \
+            .config
+        for pkg in $(sed -n -r 's|^CT_([A-Z0-9_]+)_SRC_DEVEL=y$|\1|p' .config); do
+            url=$(sed -n -r "s|^CT_${pkg}_DEVEL_URL=\"(.*)\"$|\\1|p" .config)
+            if [[ "${url}" != file://* ]]; then
+                echo "${pkg} is cloned from ${url}, which is not mirrored in ${CT_TARBALLS_CACHE}"
+                exit 1
+            fi
+        done
+    fi
+fi
+
+# The state of a step is saved when it starts: the last saved step is the one
+# that failed.
+if [[ -n "${CT_RESUME:-}" ]]; then
+    STATE_DIR=$(find "${RESUME_DIR}/work" -mindepth 2 -maxdepth 3 -type d -name state 2>/dev/null | head -n 1 || true)
+    RESTART_STEP=""
+    if [[ -n "${STATE_DIR}" ]]; then
+        for step in $(${CT} list-steps | sed -n -r 's|^  - (.*)$|\1|p'); do
+            if [[ -d "${STATE_DIR}/${step}" ]]; then
+                RESTART_STEP=${step}
+                if [[ "${step}" == "${CT_RESUME}" ]]; then
+                    break
+                fi
+            fi
+        done
+    fi
+    if [[ -n "${RESTART_STEP}" ]]; then
+        echo "ce-build-resume:${RESTART_STEP}"
+        RESTART_ARGS=(RESTART="${RESTART_STEP}")
+    fi
 fi
 
-export XZ_DEFAULTS="-T 0"
-tar Jcf "${OUTPUT}" -C "${STAGING_DIR}"/.. "gcc-${VERSION}"
+# With CT_CCACHE_DIR set, the host compiler picked above is wrapped with ccache
+# (masquerading as gcc/g++ first in the PATH) and the cache is shared by the
+# builds: the targets of a release build the same companion libraries and
+# host parts of binutils/GCC. The paths are rewritten relative to the build
+# directory so that builds made in different directories share the results.
+# Done after computing the revision, which must not depend on it.
+ccache_stats() {
+    if [[ -n "${CT_CCACHE_DIR:-}" && -f "${CCACHE_STATSLOG}" ]]; then
+        ccache --show-log-stats || true
+        local hits misses
+        hits=$(grep -c -E '^(direct|preprocessed)_cache_hit$' "${CCACHE_STATSLOG}" || true)
+        misses=$(grep -c -E '^cache_miss$' "${CCACHE_STATSLOG}" || true)
+        echo "ce-build-ccache:${hits}/$((hits + misses))"
+    fi
+}
 
+if [[ -n "${CT_CCACHE_DIR:-}" ]]; then
+    export CCACHE_DIR=${CT_CCACHE_DIR}
+    export CCACHE_BASEDIR=${ROOT}
+    export CCACHE_NOHASHDIR=1
+    export CCACHE_STATSLOG=${ROOT}/ccache.stats
+    rm -f "${CCACHE_STATSLOG}"
+    CCACHE_WRAPPERS=${ROOT}/.ccache-bin
+    mkdir -p "${CCACHE_WRAPPERS}"
+    for tool in cc c++ gcc g++; do
+        ln -sf "$(command -v ccache)" "${CCACHE_WRAPPERS}/${tool}"
+    done
+    export PATH="${CCACHE_WRAPPERS}:${PATH}"
+fi
 
+# CT_JOBS lets a scheduler running several builds at once split the cores.
+if ! ${CT} "build.${CT_JOBS:-$(nproc)}" "${RESTART_ARGS[@]}"; then
+    ccache_stats
+    # The whole log is copied next to the output, only its summary (steps
+    # with their durations, first error with some context) is printed.
+    LOG_COPY=$(dirname "${OUTPUT}")/"build.$ARCHITECTURE.$VERSION.log"
+    cp build.log "${LOG_COPY}"
+    python3 "$(dirname "${BASH_SOURCE[0]}")/ctng_log.py" build.log --output "${LOG_COPY%.log}.json" || tail -n 200 build.log
+    exit 1
+fi
 
+# The tarball is streamed through the compressor straight to S3, without
+# a local copy.
+PACKAGE="$(dirname "${BASH_SOURCE[0]}")/package.py"
 if [[ -n "${S3OUTPUT}" ]]; then
-    aws s3 cp --storage-class REDUCED_REDUNDANCY "${OUTPUT}" "${S3OUTPUT}"
+    python3 "${PACKAGE}" "${PACKAGE_ARGS[@]}" --storage-class REDUCED_REDUNDANCY "${STAGING_DIR}" "${ARTIFACT}"
+    echo "${REVISION} ${ARTIFACT}" | aws s3 cp - "${MANIFEST}"
+else
+    python3 "${PACKAGE}" "${PACKAGE_ARGS[@]}" "${STAGING_DIR}" "${OUTPUT}"
+    echo "${REVISION} ${ARTIFACT}" > "${MANIFEST}"
 fi
 
+if [[ -n "${CT_RESUME:-}" ]]; then
+    rm -rf "${RESUME_DIR:?}/work" "${RESUME_DIR}/key"
+fi
+
+ccache_stats
+
 echo "ce-build-status:OK"
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import bz2
+import gzip
+import json
+import lzma
+import re
+import sys
+from collections import Counter, defaultdict, deque
+from os.path import abspath, basename, dirname
+
+## Summarizes a ct-ng build.log in a single pass with bounded memory: the
+## steps (CT_DoStep/CT_EndStep) with their durations, the warnings, and the
+## first error with some context. Works on the build.log of a ct-ng build
+## directory, on the build.log.bz2 ct-ng installs in the toolchain
+## (CT_LOG_FILE_COMPRESS) and on the output of build.sh.
+##
+## With --fleet, summarizes many logs (or their JSON summaries) and lists the
+## slowest steps of each target and overall.
+
+LOG_LINE = re.compile(
+    r"^\[(ERROR|WARN |INFO |EXTRA|CFG  |FILE |ALL  |DEBUG)\]  (\s*)(.*)$"
+)
+STEP_SEPARATOR = "=" * 65
+STEP_END = re.compile(r"^(.*): done in ([\d:.]+)s \(at ([\d:]+)\)$")
+ELAPSED = re.compile(r"^\(elapsed: ([\d:.]+)\)$")
+FAILED_STEP = re.compile(r"^>>  Build failed in step '(.*)'$")
+WARNING_FLAG = re.compile(r"\[-W([\w=+-]+)\]")
+
+CONTEXT_BEFORE = 10
+CONTEXT_AFTER = 5
+SUMMARY_FORMAT = 1
+
+
+## "MM:SS.cc" or "SS.cc" to seconds.
+def parse_duration(text: str) -> float:
+    seconds = 0.0
+    for part in text.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def open_log(path: str):
+    if path == "-":
+        return sys.stdin
+    for suffix, opener in ((".bz2", bz2.open), (".gz", gzip.open), (".xz", lzma.open)):
+        if path.endswith(suffix):
+            return opener(path, "rt", errors="replace")
+    return open(path, errors="replace")
+
+
+## "ARCH VERSION" from the usual log locations: build.ARCH.VERSION.log (copied
+## by build.sh on failure), ROOT/ARCH/gcc-VERSION/build.log.bz2 (installed
+## toolchain), logs/ARCH-VERSION.log or ARCH-VERSION/build.log
+## (build_scheduler.py).
+def target_of(path: str) -> str:
+    name = basename(path)
+    m = re.match(r"^build\.(.+?)\.(\d[\w.-]*|trunk[\w.-]*)\.log$", name)
+    if m:
+        return f"{m.group(1)} {m.group(2)}"
+    directory = dirname(abspath(path))
+    parent = basename(directory)
+    if name.startswith("build.log") and parent.startswith("gcc-"):
+        return f"{basename(dirname(directory))} {parent[4:]}"
+    if name.startswith("build.log"):
+        name = f"{parent}.log"
+    m = re.match(r"^(.+)-(\d[\w.]*|trunk[\w.]*)\.log$", name)
+    if m:
+        return f"{m.group(1)} {m.group(2)}"
+    return path
+
+
+class LogAnalyzer:
+    def __init__(self):
+        self.steps = []
+        self.stack = []
+        self.separator = None
+        self.clock = 0.0
+        self.elapsed = None
+        self.warnings = 0
+        self.warning_flags = Counter()
+        self.error = None
+        self.failed_step = None
+        self.before = deque(maxlen=CONTEXT_BEFORE)
+        self.lines = 0
+
+    def feed(self, text: str):
+        self.lines += 1
+        text = text.rstrip("\n")
+        if self.error and len(self.error["after"]) < CONTEXT_AFTER:
+            self.error["after"].append(text)
+
+        m = LOG_LINE.match(text)
+        if not m:
+            self.before.append(text)
+            return
+        level, indent, message = m.group(1).strip(), len(m.group(2)), m.group(3)
+
+        if message == STEP_SEPARATOR:
+            self.separator = (level, indent)
+        elif self.separator == (level, indent):
+            self.start_step(message, indent)
+        else:
+            end = STEP_END.match(message)
+            if end:
+                self.end_step(end.group(1), parse_duration(end.group(2)))
+                self.clock = parse_duration(end.group(3))
+
+        if level == "WARN" or "warning:" in message:
+            self.warnings += 1
+            if self.stack:
+                self.stack[-1]["warnings"] += 1
+            flag = WARNING_FLAG.search(message)
+            if flag:
+                self.warning_flags[flag.group(1)] += 1
+        elif level == "ERROR":
+            self.handle_error(text, message)
+
+        self.before.append(text)
+
+    def start_step(self, name: str, indent: int):
+        self.separator = None
+        step = {
+            "name": name,
+            "parent": self.stack[-1]["name"] if self.stack else None,
+            "depth": len(self.stack),
+            "line": self.lines,
+            "start": self.clock,
+            "seconds": None,
+            "warnings": 0,
+            "status": "running",
+        }
+        self.steps.append(step)
+        self.stack.append(step)
+
+    def end_step(self, name: str, seconds: float):
+        ## Close the step, and any inner one that wasn't closed properly.
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i]["name"] == name:
+                self.stack[i]["seconds"] = seconds
+                self.stack[i]["status"] = "done"
+                del self.stack[i:]
+                return
+
+    def handle_error(self, text: str, message: str):
+        failed = FAILED_STEP.match(message)
+        if failed:
+            self.failed_step = failed.group(1)
+            return
+        elapsed = ELAPSED.match(message)
+        if elapsed:
+            self.elapsed = parse_duration(elapsed.group(1))
+            return
+        if self.error or not message.strip() or message.startswith(">>"):
+            return
+        self.error = {
+            "line": self.lines,
+            "message": message.strip(),
+            "step": self.stack[-1]["name"] if self.stack else None,
+            "before": list(self.before),
+            "after": [],
+        }
+
+    def summary(self, path: str):
+        failed = self.failed_step is not None or self.error is not None
+        for step in self.stack:
+            step["status"] = "failed" if failed else "unfinished"
+            if self.elapsed is not None:
+                step["seconds"] = round(self.elapsed - step["start"], 2)
+        for step in self.steps:
+            del step["start"]
+        if self.elapsed is None and self.steps:
+            self.elapsed = self.clock
+        return {
+            "format": SUMMARY_FORMAT,
+            "log": path,
+            "target": target_of(path),
+            "status": "failed" if failed else "ok" if not self.stack else "unfinished",
+            "lines": self.lines,
+            "seconds": self.elapsed,
+            "failed_step": self.failed_step,
+            "steps": self.steps,
+            "warnings": self.warnings,
+            "warning_flags": dict(self.warning_flags.most_common(20)),
+            "error": self.error,
+        }
+
+
+def analyze(path: str):
+    analyzer = LogAnalyzer()
+    with open_log(path) as f:
+        for line in f:
+            analyzer.feed(line)
+    return analyzer.summary(path)
+
+
+def load(path: str):
+    if path.endswith(".json"):
+        with open(path) as f:
+            summary = json.load(f)
+        if summary.get("format") == SUMMARY_FORMAT:
+            return summary
+    return analyze(path)
+
+
+def format_seconds(seconds) -> str:
+    if seconds is None:
+        return "?"
+    return f"{int(seconds // 60)}:{seconds % 60:05.2f}"
+
+
+def print_summary(summary):
+    print(
+        f"{summary['target']}: {summary['status']} in"
+        f" {format_seconds(summary['seconds'])}, {summary['warnings']} warnings"
+    )
+    for step in summary["steps"]:
+        indent = "  " * step["depth"]
+        extra = f" ({step['status']})" if step["status"] != "done" else ""
+        print(
+            f"  {format_seconds(step['seconds']):>9} {step['warnings']:6}  {indent}{step['name']}{extra}"
+        )
+    if summary["warning_flags"]:
+        flags = ", ".join(f"-W{f} {n}" for f, n in summary["warning_flags"].items())
+        print(f"warnings: {flags}")
+    error = summary["error"]
+    if error:
+        print(f"first error at line {error['line']} in step '{error['step']}':")
+        for line in error["before"]:
+            print(f"    {line}")
+        print(f">>> {error['message']}")
+        for line in error["after"]:
+            print(f"    {line}")
+    elif summary["failed_step"]:
+        print(f"failed in step '{summary['failed_step']}'")
+
+
+## Slowest steps of each target, and the total time spent in each step over
+## all the targets that completed it (nested steps are counted in their
+## parents too).
+def fleet(summaries, top: int):
+    per_step = defaultdict(list)
+    for summary in summaries:
+        for step in summary["steps"]:
+            if step["status"] == "done":
+                per_step[step["name"]].append((step["seconds"], summary["target"]))
+
+    targets = []
+    for summary in sorted(summaries, key=lambda s: -(s["seconds"] or 0)):
+        steps = sorted(
+            (
+                s
+                for s in summary["steps"]
+                if s["depth"] == 0 and s["seconds"] is not None
+            ),
+            key=lambda s: -s["seconds"],
+        )
+        targets.append(
+            {
+                "target": summary["target"],
+                "status": summary["status"],
+                "seconds": summary["seconds"],
+                "slowest": [
+                    {"step": s["name"], "seconds": s["seconds"]} for s in steps[:top]
+                ],
+            }
+        )
+
+    steps = []
+    for name, timings in per_step.items():
+        seconds = [t[0] for t in timings]
+        slowest = max(timings)
+        steps.append(
+            {
+                "step": name,
+                "builds": len(timings),
+                "total": round(sum(seconds), 2),
+                "mean": round(sum(seconds) / len(seconds), 2),
+                "max": slowest[0],
+                "max_target": slowest[1],
+            }
+        )
+    steps.sort(key=lambda s: -s["total"])
+    return {"targets": targets, "steps": steps}
+
+
+def print_fleet(report, top: int):
+    print(f"{'target':28} {'status':10} {'total':>9}  slowest steps")
+    for target in report["targets"]:
+        slowest = ", ".join(
+            f"{s['step']} {format_seconds(s['seconds'])}" for s in target["slowest"]
+        )
+        print(
+            f"{target['target']:28} {target['status']:10}"
+            f" {format_seconds(target['seconds']):>9}  {slowest}"
+        )
+    print()
+    print(
+        f"{'step':50} {'builds':>6} {'total':>10} {'mean':>9} {'max':>9}  slowest target"
+    )
+    for step in report["steps"][: top * 5]:
+        print(
+            f"{step['step'][:50]:50} {step['builds']:6} {format_seconds(step['total']):>10}"
+            f" {format_seconds(step['mean']):>9} {format_seconds(step['max']):>9}"
+            f"  {step['max_target']}"
+        )
+
+
+parser = argparse.ArgumentParser(description="Summarize ct-ng build logs.")
+parser.add_argument(
+    "logs",
+    nargs="+",
+    metavar="LOG",
+    help="build.log (possibly compressed), '-' for stdin, or a JSON summary with --fleet",
+)
+parser.add_argument("--json", action="store_true", help="output JSON")
+parser.add_argument(
+    "--output",
+    required=False,
+    metavar="PATH",
+    help="also write the JSON summary of the (single) log in PATH",
+)
+parser.add_argument(
+    "--fleet", action="store_true", help="aggregate the logs of many builds"
+)
+parser.add_argument(
+    "--top",
+    default=3,
+    type=int,
+    metavar="N",
+    help="number of slowest steps listed per target with --fleet",
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.fleet:
+        report = fleet([load(path) for path in args.logs], args.top)
+        if args.json:
+            print(json.dumps(report, indent=1))
+        else:
+            print_fleet(report, args.top)
+        sys.exit()
+
+    if args.output and len(args.logs) != 1:
+        parser.error("--output needs a single log")
+
+    summaries = [analyze(path) for path in args.logs]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summaries[0], f, indent=1)
+    if args.json:
+        print(json.dumps(summaries if len(summaries) > 1 else summaries[0], indent=1))
+    else:
+        for summary in summaries:
+            print_summary(summary)
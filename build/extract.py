@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import hashlib
+import json
+import lzma
+import os
+import sys
+import urllib.request
+from bisect import bisect_right
+from os.path import dirname, join, normpath
+
+## Extracts single files or subtrees from an archive made by
+## "package.py --seekable", using its ARCHIVE.index.json: only the compressed
+## blocks holding the selected files are read (with HTTP range requests for a
+## remote archive) and decompressed. Also checks an installed tree against the
+## index without the archive.
+
+INDEX_SUFFIX = ".index.json"
+INDEX_FORMAT = 1
+
+## Consecutive blocks are fetched together, up to this size.
+MAX_FETCH = 64 * 1024 * 1024
+
+
+class ExtractError(Exception):
+    pass
+
+
+def read_location(location: str, start=None, end=None) -> bytes:
+    if location.startswith(("http://", "https://")):
+        headers = {}
+        if start is not None:
+            headers["Range"] = f"bytes={start}-{end - 1}"
+        with urllib.request.urlopen(
+            urllib.request.Request(location, headers=headers)
+        ) as response:
+            if start is not None and response.status != 206:
+                raise ExtractError(f"{location} doesn't support range requests")
+            return response.read()
+    with open(location, "rb") as f:
+        if start is None:
+            return f.read()
+        f.seek(start)
+        return f.read(end - start)
+
+
+class SeekableArchive:
+    def __init__(self, location: str, index_location=None):
+        self.location = location
+        self.index = json.loads(
+            read_location(index_location or location + INDEX_SUFFIX)
+        )
+        if self.index.get("format") != INDEX_FORMAT:
+            raise ExtractError(f"unsupported index format {self.index.get('format')}")
+        self.blocks = self.index["blocks"]
+        self.offsets = [block[0] for block in self.blocks]
+        self.entries = {entry["path"]: entry for entry in self.index["entries"]}
+
+    def select(self, paths):
+        if not paths:
+            return list(self.entries.values())
+        selected = []
+        for entry in self.entries.values():
+            if any(
+                entry["path"] == p or entry["path"].startswith(p.rstrip("/") + "/")
+                for p in paths
+            ):
+                selected.append(entry)
+        return selected
+
+    def block_range(self, entry) -> range:
+        first = bisect_right(self.offsets, entry["offset"]) - 1
+        last = bisect_right(self.offsets, entry["offset"] + entry["size"] - 1) - 1
+        return range(first, last + 1)
+
+    ## Yields (block number, uncompressed data) for the given sorted blocks,
+    ## reading runs of consecutive blocks at once.
+    def read_blocks(self, numbers):
+        i = 0
+        while i < len(numbers):
+            j = i + 1
+            start = self.blocks[numbers[i]][1]
+            while (
+                j < len(numbers)
+                and numbers[j] == numbers[j - 1] + 1
+                and sum(self.blocks[numbers[j]][1:]) - start <= MAX_FETCH
+            ):
+                j += 1
+            end = sum(self.blocks[numbers[j - 1]][1:])
+            data = read_location(self.location, start, end)
+            for n in numbers[i:j]:
+                _, offset, size = self.blocks[n]
+                yield n, lzma.decompress(data[offset - start : offset - start + size])
+            i = j
+
+    ## Writes the content of the files (sorted by offset) through write(entry,
+    ## chunk), decompressing each needed block once. A block is dropped once
+    ## the last file using it is written (several files can have the same
+    ## content, e.g. copies of a hardlinked member).
+    def read_files(self, files, write):
+        files = sorted((e for e in files if e["size"]), key=lambda e: e["offset"])
+        last_use = {}
+        for i, entry in enumerate(files):
+            for n in self.block_range(entry):
+                last_use[n] = i
+        blocks = self.read_blocks(sorted(last_use))
+        cache = {}
+        for i, entry in enumerate(files):
+            for n in self.block_range(entry):
+                while n not in cache:
+                    number, data = next(blocks)
+                    cache[number] = data
+                block_start = self.offsets[n]
+                start = max(entry["offset"], block_start) - block_start
+                end = min(entry["offset"] + entry["size"], block_start + len(cache[n]))
+                write(entry, cache[n][start : end - block_start])
+                if last_use[n] == i:
+                    del cache[n]
+
+
+def safe_path(destination: str, path: str) -> str:
+    if os.path.isabs(path) or normpath(path).startswith(".."):
+        raise ExtractError(f"refusing to extract {path} outside of {destination}")
+    return join(destination, path)
+
+
+def extract(archive: SeekableArchive, entries, destination: str) -> int:
+    ## Hardlinks to files that are not selected get their own copy: the first
+    ## one is extracted and the others are linked to it.
+    selected = {entry["path"] for entry in entries}
+    copies = {}
+    files = []
+    links = []
+    for entry in entries:
+        if entry["type"] == "file":
+            files.append(entry)
+        elif entry["type"] == "hardlink":
+            link = entry["link"]
+            if link in selected:
+                links.append(entry)
+            elif link in copies:
+                links.append({**entry, "link": copies[link]})
+            else:
+                copies[link] = entry["path"]
+                files.append({**archive.entries[link], "path": entry["path"]})
+
+    for entry in entries:
+        if entry["type"] == "dir":
+            os.makedirs(safe_path(destination, entry["path"]), exist_ok=True)
+
+    outputs = {}
+
+    def write(entry, chunk):
+        output = outputs[entry["path"]]
+        output[1].update(chunk)
+        output[0].write(chunk)
+
+    for entry in files:
+        path = safe_path(destination, entry["path"])
+        os.makedirs(dirname(path), exist_ok=True)
+        outputs[entry["path"]] = (open(path, "wb"), hashlib.sha256())
+    try:
+        archive.read_files(files, write)
+    finally:
+        for f, _ in outputs.values():
+            f.close()
+
+    for entry in files:
+        if outputs[entry["path"]][1].hexdigest() != entry["sha256"]:
+            raise ExtractError(f"sha256 mismatch for {entry['path']}")
+        os.chmod(safe_path(destination, entry["path"]), entry["mode"])
+
+    for entry in entries:
+        path = safe_path(destination, entry["path"])
+        if entry["type"] == "symlink":
+            os.makedirs(dirname(path), exist_ok=True)
+            if os.path.lexists(path):
+                os.unlink(path)
+            os.symlink(entry["link"], path)
+    for entry in links:
+        path = safe_path(destination, entry["path"])
+        if os.path.lexists(path):
+            os.unlink(path)
+        os.link(safe_path(destination, entry["link"]), path)
+
+    ## Directories last, in case they are read-only.
+    for entry in reversed(entries):
+        if entry["type"] == "dir":
+            os.chmod(safe_path(destination, entry["path"]), entry["mode"])
+    return len(files) + len(links)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while data := f.read(1024 * 1024):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+## Checks an installed tree (the parent directory of the archive's top
+## directory) against the index, returns the (path, problem) found.
+def verify_tree(archive: SeekableArchive, entries, root: str):
+    problems = []
+    for entry in entries:
+        path = join(root, entry["path"])
+        if entry["type"] == "hardlink":
+            entry = {**archive.entries[entry["link"]], "path": entry["path"]}
+        if not os.path.lexists(path):
+            problems.append((entry["path"], "missing"))
+        elif entry["type"] == "symlink":
+            if not os.path.islink(path) or os.readlink(path) != entry["link"]:
+                problems.append((entry["path"], "different link"))
+        elif entry["type"] == "file":
+            if os.path.getsize(path) != entry["size"]:
+                problems.append((entry["path"], "different size"))
+            elif file_sha256(path) != entry["sha256"]:
+                problems.append((entry["path"], "different content"))
+            elif os.stat(path).st_mode & 0o7777 != entry["mode"]:
+                problems.append((entry["path"], "different mode"))
+    return problems
+
+
+parser = argparse.ArgumentParser(
+    description="Extract files from an archive made by package.py --seekable."
+)
+parser.add_argument("archive", metavar="ARCHIVE", help="path or http(s) URL")
+parser.add_argument(
+    "paths",
+    nargs="*",
+    metavar="PATH",
+    help="files or directories to extract, as listed by --list (default: all)",
+)
+parser.add_argument(
+    "--index",
+    metavar="INDEX",
+    help=f"path or URL of the index (default: ARCHIVE{INDEX_SUFFIX})",
+)
+parser.add_argument("-C", "--directory", default=".", metavar="DIR")
+parser.add_argument("--list", action="store_true", help="list the entries")
+parser.add_argument(
+    "--verify-tree",
+    metavar="ROOT",
+    help="check the entries installed under ROOT against the index instead",
+)
+
+if __name__ == "__main__":
+    args = parser.parse_intermixed_args()
+    try:
+        archive = SeekableArchive(args.archive, args.index)
+        entries = archive.select(args.paths)
+        if not entries:
+            sys.exit(f"Nothing matches {' '.join(args.paths)}")
+
+        if args.list:
+            for entry in entries:
+                print(f"{entry['mode']:04o} {entry['size']:>10} {entry['path']}")
+        elif args.verify_tree:
+            problems = verify_tree(archive, entries, args.verify_tree)
+            for path, problem in problems:
+                print(f"{path}: {problem}")
+            print(f"{len(entries)} entries, {len(problems)} problems")
+            sys.exit(1 if problems else 0)
+        else:
+            count = extract(archive, entries, args.directory)
+            print(f"{count} files extracted to {args.directory}")
+    except (ExtractError, OSError, lzma.LZMAError) as e:
+        sys.exit(f"Extraction failed: {e}")
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import contextlib
+import hashlib
+import json
+import lzma
+import os
+import signal
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os.path import basename, dirname, isdir, join, relpath
+
+## Packs a directory (the staging dir of a build) as a compressed tarball,
+## streaming tar through the compressor straight into the destination: a file,
+## or an S3 object uploaded with "aws s3 cp -" (multipart). Nothing is written
+## to local disk in the S3 case, and compression overlaps with the upload.
+## Reports the compression ratio and throughput of each codec, so several
+## codecs can be compared on the same tree.
+##
+## With --seekable (xz only), the tar stream is cut in blocks compressed
+## independently (each one is a complete xz stream, so the archive is still a
+## regular .tar.xz), and a sidecar index (ARCHIVE.index.json) lists the blocks
+## and every entry with its size, mode, sha256 and offset in the tar stream.
+## extract.py uses it to extract single files or subtrees, reading and
+## decompressing only the blocks that contain them.
+
+CHUNK_SIZE = 1024 * 1024
+BLOCK_SIZE = 4 * 1024 * 1024
+INDEX_SUFFIX = ".index.json"
+INDEX_FORMAT = 1
+## Time given to the aws CLI to abort its multipart upload when interrupted.
+ABORT_TIMEOUT = 30
+
+## codec: (extension, default level, command for level/threads)
+CODECS = {
+    "xz": ("tar.xz", 6, lambda level, threads: ["xz", f"-{level}", f"-T{threads}"]),
+    "zstd": (
+        "tar.zst",
+        19,
+        lambda level, threads: ["zstd", "-q", f"-{level}", f"-T{threads}"]
+        + (["--ultra"] if level > 19 else []),
+    ),
+}
+
+
+class PackageError(Exception):
+    pass
+
+
+def parse_codec(spec: str):
+    name, _, level = spec.partition(":")
+    if name not in CODECS:
+        raise argparse.ArgumentTypeError(
+            f"unknown codec {name}, expected one of {', '.join(CODECS)}"
+        )
+    try:
+        return name, int(level) if level else CODECS[name][1]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad level in {spec}")
+
+
+def tree_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            total += os.lstat(join(root, f)).st_size
+    return total
+
+
+class FileSink:
+    def __init__(self, path: str):
+        self.path = path
+        self.part = f"{path}.part"
+        self.f = open(self.part, "wb")
+
+    def write(self, data: bytes):
+        self.f.write(data)
+
+    def close(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+        os.replace(self.part, self.path)
+
+    def abort(self):
+        self.f.close()
+        os.unlink(self.part)
+
+
+## The stream is uploaded to URL.part, which is moved to URL (a copy on the
+## server) once complete, so that URL is never a truncated object. On abort,
+## the aws CLI is interrupted as with Ctrl-C and aborts its multipart upload.
+## The parts of an upload whose CLI is killed are left behind, the bucket needs
+## a lifecycle rule to remove them (see README).
+class S3Sink:
+    def __init__(self, url: str, expected_size: int, args):
+        self.url = url
+        self.part = f"{url}.part"
+        self.endpoint = []
+        if args.endpoint_url:
+            self.endpoint = ["--endpoint-url", args.endpoint_url]
+        ## Not kept by the copy, given to both.
+        self.storage_class = []
+        if args.storage_class:
+            self.storage_class = ["--storage-class", args.storage_class]
+        ## The expected size only sizes the parts of the multipart upload, the
+        ## tree size is a safe upper bound.
+        cmd = ["aws", "s3", "cp", "-", self.part, "--expected-size", str(expected_size)]
+        self.process = subprocess.Popen(
+            cmd + self.storage_class + self.endpoint, stdin=subprocess.PIPE
+        )
+
+    def write(self, data: bytes):
+        self.process.stdin.write(data)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            self.remove_part()
+            raise PackageError(f"upload to {self.part} failed")
+        cmd = ["aws", "s3", "mv", self.part, self.url]
+        if subprocess.run(cmd + self.storage_class + self.endpoint).returncode != 0:
+            self.remove_part()
+            raise PackageError(f"moving {self.part} to {self.url} failed")
+
+    def abort(self):
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(timeout=ABORT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        with contextlib.suppress(OSError):
+            self.process.stdin.close()
+        self.remove_part()
+
+    ## Best effort, in case the upload completed anyway.
+    def remove_part(self):
+        subprocess.run(
+            ["aws", "s3", "rm", self.part, "--quiet"] + self.endpoint,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+
+## When comparing several codecs, each archive is named after its codec and
+## level.
+def destination(output: str, name: str, codec: str, level: int, several: bool):
+    extension = CODECS[codec][0]
+    if output.endswith("/") or (not output.startswith("s3://") and isdir(output)):
+        if several:
+            return join(output, f"{name}-{codec}{level}.{extension}")
+        return join(output, f"{name}.{extension}")
+    if several:
+        raise PackageError(f"{output} must be a directory to compare several codecs")
+    return output
+
+
+def package(source: str, codec: str, level: int, output: str, args) -> dict:
+    source = os.path.abspath(source)
+    raw_size = tree_size(source)
+    if output.startswith("s3://"):
+        sink = S3Sink(output, raw_size, args)
+    else:
+        sink = FileSink(output)
+
+    start = time.monotonic()
+    tar = subprocess.Popen(
+        ["tar", "cf", "-", "-C", dirname(source), basename(source)],
+        stdout=subprocess.PIPE,
+    )
+    compressor = subprocess.Popen(
+        CODECS[codec][2](level, args.threads),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+
+    ## tar -> compressor in a thread, compressor -> sink here, counting the
+    ## bytes on both sides.
+    counts = {"raw": 0, "compressed": 0}
+
+    def feed():
+        try:
+            while data := tar.stdout.read(CHUNK_SIZE):
+                counts["raw"] += len(data)
+                compressor.stdin.write(data)
+        except BrokenPipeError:
+            pass
+        finally:
+            compressor.stdin.close()
+
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    try:
+        while data := compressor.stdout.read(CHUNK_SIZE):
+            counts["compressed"] += len(data)
+            sink.write(data)
+        feeder.join()
+        if tar.wait() != 0:
+            raise PackageError(f"tar failed on {source}")
+        if compressor.wait() != 0:
+            raise PackageError(f"{codec} failed")
+        sink.close()
+    except BaseException:
+        tar.kill()
+        compressor.kill()
+        feeder.join()
+        sink.abort()
+        raise
+    seconds = time.monotonic() - start
+
+    return {
+        "codec": codec,
+        "level": level,
+        "output": output,
+        "raw": counts["raw"],
+        "compressed": counts["compressed"],
+        "ratio": counts["raw"] / max(counts["compressed"], 1),
+        "seconds": seconds,
+        "throughput": counts["raw"] / max(seconds, 1e-9),
+    }
+
+
+## File object given to tarfile: cuts the tar stream in blocks, compresses
+## them in a thread pool (lzma releases the GIL) and writes them in order to
+## the sink, keeping the offsets of each block.
+class SeekableWriter:
+    def __init__(self, sink, block_size: int, level: int, threads: int):
+        self.sink = sink
+        self.block_size = block_size
+        self.level = level
+        self.pool = ThreadPoolExecutor(max_workers=threads or os.cpu_count())
+        self.max_pending = 2 * self.pool._max_workers
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.raw = 0
+        self.compressed = 0
+        ## [offset in the tar stream, offset in the archive, compressed size]
+        self.blocks = []
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[: self.block_size]))
+            del self.buffer[: self.block_size]
+        return len(data)
+
+    def _submit(self, raw: bytes):
+        future = self.pool.submit(lzma.compress, raw, preset=self.level)
+        self.pending.append((len(raw), future))
+        while len(self.pending) > self.max_pending:
+            self._write_next()
+
+    def _write_next(self):
+        size, future = self.pending.popleft()
+        data = future.result()
+        self.blocks.append([self.raw, self.compressed, len(data)])
+        self.raw += size
+        self.compressed += len(data)
+        self.sink.write(data)
+
+    def close(self):
+        if self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer.clear()
+        while self.pending:
+            self._write_next()
+        self.pool.shutdown()
+
+    def abort(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class HashingReader:
+    def __init__(self, f, digest):
+        self.f = f
+        self.digest = digest
+
+    def read(self, size=-1) -> bytes:
+        data = self.f.read(size)
+        self.digest.update(data)
+        return data
+
+
+def walk_sorted(top: str):
+    yield top
+    for root, dirs, files in os.walk(top):
+        dirs.sort()
+        for name in sorted(dirs + files):
+            yield join(root, name)
+
+
+def package_seekable(source: str, level: int, output: str, args) -> dict:
+    source = os.path.abspath(source)
+    if output.startswith("s3://"):
+        sink = S3Sink(output, tree_size(source), args)
+    else:
+        sink = FileSink(output)
+
+    start = time.monotonic()
+    writer = SeekableWriter(sink, args.block_size, level, args.threads)
+    entries = []
+    try:
+        with tarfile.open(fileobj=writer, mode="w|", format=tarfile.GNU_FORMAT) as tar:
+            for path in walk_sorted(source):
+                info = tar.gettarinfo(path, relpath(path, dirname(source)))
+                entry = {"path": info.name, "mode": info.mode & 0o7777, "size": 0}
+                if info.isreg():
+                    digest = hashlib.sha256()
+                    with open(path, "rb") as f:
+                        tar.addfile(info, HashingReader(f, digest))
+                    padded = -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                    entry.update(
+                        type="file",
+                        size=info.size,
+                        sha256=digest.hexdigest(),
+                        offset=tar.offset - padded,
+                    )
+                else:
+                    tar.addfile(info)
+                    if info.isdir():
+                        entry["type"] = "dir"
+                    elif info.issym():
+                        entry.update(type="symlink", link=info.linkname)
+                    elif info.islnk():
+                        entry.update(type="hardlink", link=info.linkname)
+                    else:
+                        entry["type"] = "other"
+                entries.append(entry)
+        writer.close()
+        sink.close()
+    except BaseException:
+        writer.abort()
+        sink.abort()
+        raise
+    seconds = time.monotonic() - start
+
+    offsets = [block[0] for block in writer.blocks]
+    for entry in entries:
+        if entry["type"] == "file":
+            entry["block"] = bisect_right(offsets, entry["offset"]) - 1
+    index = {
+        "format": INDEX_FORMAT,
+        "codec": "xz",
+        "level": level,
+        "block_size": args.block_size,
+        "size": writer.raw,
+        "blocks": writer.blocks,
+        "entries": entries,
+    }
+    data = json.dumps(index, separators=(",", ":")).encode()
+    index_output = output + INDEX_SUFFIX
+    if index_output.startswith("s3://"):
+        index_sink = S3Sink(index_output, len(data), args)
+    else:
+        index_sink = FileSink(index_output)
+    index_sink.write(data)
+    index_sink.close()
+
+    return {
+        "codec": "xz-seekable",
+        "level": level,
+        "output": output,
+        "raw": writer.raw,
+        "compressed": writer.compressed,
+        "ratio": writer.raw / max(writer.compressed, 1),
+        "seconds": seconds,
+        "throughput": writer.raw / max(seconds, 1e-9),
+        "blocks": len(writer.blocks),
+        "index": index_output,
+    }
+
+
+def print_result(r: dict):
+    mib = 1024 * 1024
+    print(
+        f"{r['codec'] + ':' + str(r['level']):<8}"
+        f" {r['raw'] / mib:>9.1f} MiB -> {r['compressed'] / mib:>8.1f} MiB"
+        f"  ratio {r['ratio']:>5.2f}  {r['seconds']:>7.1f}s"
+        f"  {r['throughput'] / mib:>7.1f} MiB/s  {r['output']}"
+    )
+
+
+parser = argparse.ArgumentParser(
+    description="Stream a directory as a compressed tarball to a file or S3."
+)
+parser.add_argument("source", metavar="DIR", help="directory to pack")
+parser.add_argument(
+    "output",
+    metavar="OUTPUT",
+    help="file, directory or s3:// URL (directory if ending with /)",
+)
+parser.add_argument(
+    "--codec",
+    action="append",
+    type=parse_codec,
+    metavar="CODEC[:LEVEL]",
+    help=f"{', '.join(CODECS)} (default: xz), repeat to compare codecs",
+)
+parser.add_argument(
+    "--name",
+    metavar="NAME",
+    help="archive name when OUTPUT is a directory (default: DIR's name)",
+)
+parser.add_argument(
+    "-T",
+    "--threads",
+    default=0,
+    type=int,
+    metavar="N",
+    help="compression threads (default: 0, all cores)",
+)
+parser.add_argument(
+    "--seekable",
+    action="store_true",
+    help=f"xz only: independent blocks and an ARCHIVE{INDEX_SUFFIX} index, see extract.py",
+)
+parser.add_argument(
+    "--block-size",
+    default=BLOCK_SIZE,
+    type=int,
+    metavar="BYTES",
+    help=f"uncompressed size of the --seekable blocks (default: {BLOCK_SIZE})",
+)
+parser.add_argument("--endpoint-url", metavar="URL", help="S3-compatible endpoint")
+parser.add_argument("--storage-class", metavar="CLASS", help="S3 storage class")
+parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    codecs = args.codec or [parse_codec("xz")]
+    if args.seekable and any(codec != "xz" for codec, _ in codecs):
+        sys.exit("--seekable is only supported with xz")
+    name = args.name or basename(os.path.abspath(args.source))
+
+    results = []
+    try:
+        for codec, level in codecs:
+            output = destination(args.output, name, codec, level, len(codecs) > 1)
+            if args.seekable:
+                results.append(package_seekable(args.source, level, output, args))
+            else:
+                results.append(package(args.source, codec, level, output, args))
+            print_result(results[-1])
+    except (PackageError, OSError) as e:
+        sys.exit(f"Packaging failed: {e}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import bz2
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from os.path import dirname, join
+
+import ctng_log
+
+## Tests of ctng_log.py on small ct-ng logs, run with:
+##   python3 -m unittest test_ctng_log   (in build/)
+
+SCRIPT = join(dirname(__file__) or ".", "ctng_log.py")
+SEPARATOR = "=" * 65
+
+OK_LOG = f"""\
+[INFO ]  Performing some trivial sanity checks
+[INFO ]  Build started 20260101.120000
+[INFO ]  {SEPARATOR}
+[INFO ]  Retrieving needed toolchain components' tarballs
+[EXTRA]    Retrieving 'gcc-14.2.0'
+[INFO ]  Retrieving needed toolchain components' tarballs: done in 1.50s (at 00:03)
+[INFO ]  {SEPARATOR}
+[INFO ]  Installing pass-1 core C gcc compiler
+[EXTRA]    {SEPARATOR}
+[EXTRA]    Installing libgcc
+[ALL  ]    ../libgcc/foo.c:12:3: warning: unused variable 'x' [-Wunused-variable]
+[ALL  ]    ../libgcc/bar.c:3:1: warning: no return [-Wreturn-type]
+[EXTRA]    Installing libgcc: done in 20.00s (at 01:30)
+[WARN ]    Some option is deprecated
+[INFO ]  Installing pass-1 core C gcc compiler: done in 1:27.00s (at 01:30)
+[INFO ]  {SEPARATOR}
+[INFO ]  Installing final gcc compiler
+[ALL  ]    ../gcc/foo.c:1:1: warning: unused variable 'y' [-Wunused-variable]
+[INFO ]  Installing final gcc compiler: done in 2:30.00s (at 04:00)
+[INFO ]  Finishing installation (may take a few seconds)...
+"""
+
+## The same build, killed during the final compiler.
+TRUNCATED_LOG = OK_LOG[: OK_LOG.index("[INFO ]  Installing final gcc compiler:")]
+
+FAILED_LOG = f"""\
+[INFO ]  {SEPARATOR}
+[INFO ]  Retrieving needed toolchain components' tarballs
+[INFO ]  Retrieving needed toolchain components' tarballs: done in 2.00s (at 00:02)
+[INFO ]  {SEPARATOR}
+[INFO ]  Installing C library
+[EXTRA]    {SEPARATOR}
+[EXTRA]    Building for multilib 1/1: ''
+[ALL  ]    checking for gcc... gcc
+[ALL  ]    checking whether we are cross compiling... yes
+[ERROR]    configure: error: no acceptable C compiler found in $PATH
+[ALL  ]    make: *** [Makefile:12: all] Error 1
+[ERROR]  
+[ERROR]  >>
+[ERROR]  >>  Build failed in step 'Installing C library'
+[ERROR]  >>        called in step '(top-level)'
+[ERROR]  >>
+[ERROR]  (elapsed: 1:02.50)
+"""
+
+
+class LogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write_log(self, path: str, text: str) -> str:
+        path = join(self.tmpdir.name, path)
+        os.makedirs(dirname(path), exist_ok=True)
+        opener = bz2.open if path.endswith(".bz2") else open
+        with opener(path, "wt") as f:
+            f.write(text)
+        return path
+
+    def steps(self, summary):
+        return [
+            (s["name"], s["depth"], s["seconds"], s["warnings"], s["status"])
+            for s in summary["steps"]
+        ]
+
+    def run_script(self, *args: str) -> str:
+        return subprocess.run(
+            [sys.executable, SCRIPT, *args], check=True, capture_output=True, text=True
+        ).stdout
+
+
+class AnalyzeTest(LogTestCase):
+    def test_ok(self):
+        summary = ctng_log.analyze(self.write_log("arm-14.2.0/build.log", OK_LOG))
+        self.assertEqual(summary["target"], "arm 14.2.0")
+        self.assertEqual(summary["status"], "ok")
+        self.assertEqual(summary["seconds"], 240.0)
+        self.assertEqual(summary["lines"], len(OK_LOG.splitlines()))
+        self.assertEqual(
+            self.steps(summary),
+            [
+                ("Retrieving needed toolchain components' tarballs", 0, 1.5, 0, "done"),
+                ("Installing pass-1 core C gcc compiler", 0, 87.0, 1, "done"),
+                ("Installing libgcc", 1, 20.0, 2, "done"),
+                ("Installing final gcc compiler", 0, 150.0, 1, "done"),
+            ],
+        )
+        self.assertEqual(
+            summary["steps"][2]["parent"], "Installing pass-1 core C gcc compiler"
+        )
+        self.assertEqual(summary["warnings"], 4)
+        self.assertEqual(
+            summary["warning_flags"], {"unused-variable": 2, "return-type": 1}
+        )
+        self.assertIsNone(summary["error"])
+        self.assertIsNone(summary["failed_step"])
+
+    def test_truncated(self):
+        summary = ctng_log.analyze(
+            self.write_log("build.arm.14.2.0.log", TRUNCATED_LOG)
+        )
+        self.assertEqual(summary["target"], "arm 14.2.0")
+        self.assertEqual(summary["status"], "unfinished")
+        ## the time of the last step done
+        self.assertEqual(summary["seconds"], 90.0)
+        self.assertEqual(
+            self.steps(summary)[-1],
+            ("Installing final gcc compiler", 0, None, 1, "unfinished"),
+        )
+        self.assertIsNone(summary["error"])
+
+    def test_truncated_mid_line(self):
+        summary = ctng_log.analyze(self.write_log("build.log", OK_LOG[:-40]))
+        self.assertEqual(summary["status"], "ok")
+        summary = ctng_log.analyze(self.write_log("build.log", ""))
+        self.assertEqual((summary["status"], summary["steps"]), ("ok", []))
+        self.assertIsNone(summary["seconds"])
+
+    def test_failed(self):
+        path = self.write_log("root/arm64/gcc-13.1.0/build.log.bz2", FAILED_LOG)
+        summary = ctng_log.analyze(path)
+        self.assertEqual(summary["target"], "arm64 13.1.0")
+        self.assertEqual(summary["status"], "failed")
+        self.assertEqual(summary["seconds"], 62.5)
+        self.assertEqual(summary["failed_step"], "Installing C library")
+        self.assertEqual(
+            self.steps(summary),
+            [
+                ("Retrieving needed toolchain components' tarballs", 0, 2.0, 0, "done"),
+                ("Installing C library", 0, 60.5, 0, "failed"),
+                ("Building for multilib 1/1: ''", 1, 60.5, 0, "failed"),
+            ],
+        )
+        error = summary["error"]
+        self.assertEqual(
+            error["message"],
+            "configure: error: no acceptable C compiler found in $PATH",
+        )
+        self.assertEqual(error["line"], 10)
+        self.assertEqual(error["step"], "Building for multilib 1/1: ''")
+        self.assertEqual(
+            error["before"][-2:],
+            [
+                "[ALL  ]    checking for gcc... gcc",
+                "[ALL  ]    checking whether we are cross compiling... yes",
+            ],
+        )
+        self.assertEqual(
+            error["after"][0], "[ALL  ]    make: *** [Makefile:12: all] Error 1"
+        )
+        self.assertEqual(len(error["after"]), ctng_log.CONTEXT_AFTER)
+
+    def test_print_summary(self):
+        output = self.run_script(self.write_log("build.arm64.13.1.0.log", FAILED_LOG))
+        lines = output.splitlines()
+        self.assertEqual(lines[0], "arm64 13.1.0: failed in 1:02.50, 0 warnings")
+        self.assertIn(
+            "    0:02.00      0  Retrieving needed toolchain components' tarballs",
+            lines,
+        )
+        self.assertIn("    1:00.50      0  Installing C library (failed)", lines)
+        self.assertIn(
+            "    1:00.50      0    Building for multilib 1/1: '' (failed)", lines
+        )
+        self.assertIn(
+            "first error at line 10 in step 'Building for multilib 1/1: ''':", lines
+        )
+        self.assertIn(
+            ">>> configure: error: no acceptable C compiler found in $PATH", lines
+        )
+
+    def test_output(self):
+        path = self.write_log("build.log", OK_LOG)
+        json_path = join(self.tmpdir.name, "summary.json")
+        printed = json.loads(self.run_script("--json", "--output", json_path, path))
+        with open(json_path) as f:
+            self.assertEqual(json.load(f), printed)
+        self.assertEqual(ctng_log.load(json_path), printed)
+
+
+class FleetTest(LogTestCase):
+    def test_fleet(self):
+        logs = join(self.tmpdir.name, "logs")
+        self.write_log("logs/arm-14.2.0.log", OK_LOG)
+        self.write_log("logs/arm64-13.1.0.log", FAILED_LOG)
+        self.write_log("logs/riscv64-14.2.0.log", TRUNCATED_LOG)
+        ## a summary kept from an older run
+        with open(join(logs, "mips-12.1.0.json"), "w") as f:
+            summary = ctng_log.analyze(self.write_log("mips-12.1.0/build.log", OK_LOG))
+            summary["seconds"] = 300.0
+            summary["steps"][1]["seconds"] = 200.0
+            json.dump(summary, f)
+
+        paths = sorted(join(logs, name) for name in os.listdir(logs))
+        report = json.loads(self.run_script("--fleet", "--json", "--top", "2", *paths))
+        self.assertEqual(
+            [(t["target"], t["status"], t["seconds"]) for t in report["targets"]],
+            [
+                ("mips 12.1.0", "ok", 300.0),
+                ("arm 14.2.0", "ok", 240.0),
+                ("riscv64 14.2.0", "unfinished", 90.0),
+                ("arm64 13.1.0", "failed", 62.5),
+            ],
+        )
+        self.assertEqual(
+            report["targets"][0]["slowest"],
+            [
+                {"step": "Installing pass-1 core C gcc compiler", "seconds": 200.0},
+                {"step": "Installing final gcc compiler", "seconds": 150.0},
+            ],
+        )
+        self.assertEqual(
+            report["targets"][3]["slowest"],
+            [
+                {"step": "Installing C library", "seconds": 60.5},
+                {
+                    "step": "Retrieving needed toolchain components' tarballs",
+                    "seconds": 2.0,
+                },
+            ],
+        )
+
+        steps = {s["step"]: s for s in report["steps"]}
+        self.assertEqual(
+            report["steps"][0]["step"], "Installing pass-1 core C gcc compiler"
+        )
+        self.assertEqual(
+            steps["Installing pass-1 core C gcc compiler"],
+            {
+                "step": "Installing pass-1 core C gcc compiler",
+                "builds": 3,
+                "total": 374.0,
+                "mean": 124.67,
+                "max": 200.0,
+                "max_target": "mips 12.1.0",
+            },
+        )
+        ## only the builds which completed the step
+        self.assertEqual(steps["Installing final gcc compiler"]["builds"], 2)
+        self.assertNotIn("Installing C library", steps)
+        self.assertEqual(
+            steps["Retrieving needed toolchain components' tarballs"]["builds"], 4
+        )
+
+        output = self.run_script("--fleet", *paths).splitlines()
+        self.assertTrue(output[1].startswith("mips 12.1.0"))
+        self.assertIn("Installing pass-1 core C gcc compiler 3:20.00", output[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
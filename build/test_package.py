@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import argparse
+import io
+import json
+import lzma
+import os
+import shutil
+import stat
+import subprocess
+import tarfile
+import tempfile
+import time
+import unittest
+from os.path import join
+from unittest import mock
+
+import extract
+import package
+
+## Tests of package.py (and of extract.py on its seekable archives), with a
+## stub aws CLI for the uploads, run with:
+##   python3 -m unittest test_package   (in build/)
+
+## Keeps the objects in FAKE_S3_DIR (named after the last part of their URL)
+## and logs its arguments in FAKE_S3_DIR/calls. The command named by
+## FAKE_S3_FAIL (cp or mv) fails. An interrupted cp leaves a NAME.aborted
+## marker, a started one a NAME.started marker.
+FAKE_AWS = """#!/usr/bin/env python3
+import json, os, sys
+args = sys.argv[1:]
+s3 = os.environ["FAKE_S3_DIR"]
+fail = os.environ.get("FAKE_S3_FAIL") == args[1]
+
+def path(url):
+    return os.path.join(s3, url.rsplit("/", 1)[1])
+
+with open(os.path.join(s3, "calls"), "a") as f:
+    f.write(json.dumps(args) + "\\n")
+if args[1] == "cp":
+    open(path(args[3]) + ".started", "w").close()
+    try:
+        data = sys.stdin.buffer.read()
+    except KeyboardInterrupt:
+        open(path(args[3]) + ".aborted", "w").close()
+        sys.exit(130)
+    if not fail:
+        with open(path(args[3]), "wb") as f:
+            f.write(data)
+elif args[1] == "mv" and not fail:
+    os.replace(path(args[2]), path(args[3]))
+elif args[1] == "rm" and os.path.exists(path(args[2])):
+    os.remove(path(args[2]))
+sys.exit(1 if fail else 0)
+"""
+
+
+def make_args(**kwargs):
+    options = dict(threads=1, storage_class=None, endpoint_url=None, block_size=4096)
+    return argparse.Namespace(**dict(options, **kwargs))
+
+
+def tar_members(data: bytes, codec: str):
+    if codec == "zstd":
+        data = subprocess.run(
+            ["zstd", "-dc"], input=data, capture_output=True, check=True
+        ).stdout
+    else:
+        data = lzma.decompress(data)
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        return {
+            m.name: tar.extractfile(m).read() if m.isreg() or m.islnk() else m.type
+            for m in tar.getmembers()
+        }
+
+
+class PackageTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+        ## A small toolchain tree, with a file spanning several blocks and
+        ## hardlinks to it.
+        self.source = join(self.tmp, "gcc-14.2.0")
+        os.makedirs(join(self.source, "bin"))
+        os.makedirs(join(self.source, "libexec", "gcc"))
+        self.big = os.urandom(20000)
+        with open(join(self.source, "bin", "arm-gcc"), "wb") as f:
+            f.write(self.big)
+        os.chmod(join(self.source, "bin", "arm-gcc"), 0o755)
+        os.link(join(self.source, "bin", "arm-gcc"), join(self.source, "libexec", "a"))
+        os.link(join(self.source, "bin", "arm-gcc"), join(self.source, "libexec", "b"))
+        with open(join(self.source, "libexec", "gcc", "cc1"), "wb") as f:
+            f.write(b"cc1" * 1000)
+        os.symlink("arm-gcc", join(self.source, "bin", "gcc"))
+
+        bin_dir = join(self.tmp, "bin")
+        os.makedirs(bin_dir)
+        aws = join(bin_dir, "aws")
+        with open(aws, "w") as f:
+            f.write(FAKE_AWS)
+        os.chmod(aws, os.stat(aws).st_mode | stat.S_IXUSR)
+        self.s3 = join(self.tmp, "s3")
+        os.makedirs(self.s3)
+        env = mock.patch.dict(
+            os.environ,
+            PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+            FAKE_S3_DIR=self.s3,
+        )
+        env.start()
+        self.addCleanup(env.stop)
+
+    def check_members(self, data: bytes, codec="xz"):
+        members = tar_members(data, codec)
+        self.assertEqual(members["gcc-14.2.0/bin/arm-gcc"], self.big)
+        self.assertEqual(members["gcc-14.2.0/libexec/gcc/cc1"], b"cc1" * 1000)
+        self.assertEqual(members["gcc-14.2.0/bin/gcc"], tarfile.SYMTYPE)
+
+    def test_package_to_file(self):
+        for codec in ("xz", "zstd"):
+            if not shutil.which(codec):
+                continue
+            output = join(self.tmp, f"out.{codec}")
+            result = package.package(self.source, codec, 1, output, make_args())
+            with open(output, "rb") as f:
+                data = f.read()
+            self.check_members(data, codec)
+            self.assertEqual(result["compressed"], len(data))
+            self.assertFalse(os.path.exists(output + ".part"))
+
+    def aws_calls(self):
+        with open(join(self.s3, "calls")) as f:
+            return [json.loads(line) for line in f]
+
+    def s3_objects(self):
+        return sorted(
+            f
+            for f in os.listdir(self.s3)
+            if f != "calls" and not f.endswith((".started", ".aborted"))
+        )
+
+    def test_package_to_s3(self):
+        url = "s3://bucket/path/gcc.tar.xz"
+        args = make_args(
+            endpoint_url="http://localhost:9000", storage_class="STANDARD_IA"
+        )
+        result = package.package(self.source, "xz", 1, url, args)
+        with open(join(self.s3, "gcc.tar.xz"), "rb") as f:
+            self.check_members(f.read())
+        self.assertEqual(self.s3_objects(), ["gcc.tar.xz"])
+
+        cp, mv = self.aws_calls()
+        self.assertEqual(cp[:4], ["s3", "cp", "-", f"{url}.part"])
+        expected_size = int(cp[cp.index("--expected-size") + 1])
+        self.assertGreaterEqual(expected_size, result["compressed"])
+        self.assertEqual(mv[:4], ["s3", "mv", f"{url}.part", url])
+        for call in (cp, mv):
+            self.assertEqual(
+                call[call.index("--endpoint-url") + 1], "http://localhost:9000"
+            )
+            self.assertEqual(call[call.index("--storage-class") + 1], "STANDARD_IA")
+
+    def test_failed_upload(self):
+        for command in ("cp", "mv"):
+            with self.subTest(command=command):
+                with mock.patch.dict(os.environ, FAKE_S3_FAIL=command):
+                    with self.assertRaises(package.PackageError):
+                        package.package(
+                            self.source, "xz", 1, "s3://b/gcc.tar.xz", make_args()
+                        )
+                self.assertEqual(self.s3_objects(), [])
+                self.assertEqual(
+                    self.aws_calls()[-1][:3], ["s3", "rm", "s3://b/gcc.tar.xz.part"]
+                )
+
+    def test_aborted_upload(self):
+        url = "s3://b/gcc.tar.xz"
+        sink = package.S3Sink(url, 1000, make_args())
+        sink.write(b"x" * 100)
+        ## The CLI must be started to handle the interrupt.
+        deadline = time.monotonic() + 10
+        while not os.path.exists(join(self.s3, "gcc.tar.xz.part.started")):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        sink.abort()
+        self.assertTrue(os.path.exists(join(self.s3, "gcc.tar.xz.part.aborted")))
+        self.assertEqual(self.s3_objects(), [])
+        self.assertEqual(
+            [call[:3] for call in self.aws_calls()],
+            [["s3", "cp", "-"], ["s3", "rm", f"{url}.part"]],
+        )
+
+    def test_failed_compression_leaves_nothing(self):
+        output = join(self.tmp, "out.tar.xz")
+        with mock.patch.dict(
+            package.CODECS, xz=("tar.xz", 6, lambda level, threads: ["false"])
+        ):
+            with self.assertRaises(package.PackageError):
+                package.package(self.source, "xz", 1, output, make_args())
+        self.assertEqual([f for f in os.listdir(self.tmp) if f.startswith("out")], [])
+
+    def test_destination(self):
+        out = join(self.tmp, "out")
+        os.makedirs(out)
+        self.assertEqual(
+            package.destination(out, "gcc", "xz", 6, False), join(out, "gcc.tar.xz")
+        )
+        self.assertEqual(
+            package.destination("s3://b/p/", "gcc", "zstd", 19, True),
+            "s3://b/p/gcc-zstd19.tar.zst",
+        )
+        self.assertEqual(
+            package.destination("s3://b/x", "gcc", "xz", 6, False), "s3://b/x"
+        )
+        with self.assertRaises(package.PackageError):
+            package.destination("s3://b/x", "gcc", "xz", 6, True)
+
+    def test_seekable_round_trip(self):
+        output = join(self.tmp, "gcc.tar.xz")
+        result = package.package_seekable(self.source, 1, output, make_args())
+        self.assertGreater(result["blocks"], 4)
+        ## Still a regular .tar.xz.
+        with open(output, "rb") as f:
+            self.check_members(f.read())
+
+        archive = extract.SeekableArchive(output)
+        ## Two hardlinks to a member which isn't extracted.
+        entries = archive.select(["gcc-14.2.0/libexec"])
+        destination = join(self.tmp, "x")
+        extract.extract(archive, entries, destination)
+        for name in ("a", "b"):
+            with open(join(destination, "gcc-14.2.0", "libexec", name), "rb") as f:
+                self.assertEqual(f.read(), self.big)
+        self.assertEqual(extract.verify_tree(archive, entries, destination), [])
+
+        destination = join(self.tmp, "all")
+        extract.extract(archive, archive.select([]), destination)
+        self.assertEqual(
+            extract.verify_tree(archive, archive.select([]), destination), []
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from os.path import join, exists, abspath, basename, dirname
+
+from ctng_matrix import DEFAULT_CONFIG_DIR, select_configs, split_target
+
+## Runs several ct-ng builds (build/build.sh) at once, splitting the cores and
+## memory of the host between them. The queue is ordered by past build
+## duration, longest first, and the state is kept on disk so that an
+## interrupted batch can be resumed.
+
+ROOT = dirname(abspath(__file__))
+BUILD_SH = join(ROOT, "build", "build.sh")
+
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+OK = "OK"
+SKIPPED = "SKIPPED"
+FAILED = "FAILED"
+
+STATUS_RE = re.compile(r"ce-build-status:(\w+)")
+OUTPUT_RE = re.compile(r"ce-build-output:(\S+)")
+CCACHE_RE = re.compile(r"ce-build-ccache:(\d+)/(\d+)")
+
+parser = argparse.ArgumentParser(
+    description="Build several ct-ng targets in parallel within a cores/memory budget."
+)
+parser.add_argument(
+    "targets",
+    nargs="*",
+    metavar="TARGET",
+    help="ARCH-VERSION of the configs to build, shell patterns allowed (e.g. '*-14.2.0')",
+)
+parser.add_argument("--config-dir", default=DEFAULT_CONFIG_DIR, metavar="CONFIGDIR")
+parser.add_argument(
+    "--state",
+    default="build-scheduler.json",
+    metavar="STATE_PATH",
+    help="status of each target and past build durations",
+)
+parser.add_argument(
+    "--status", action="store_true", help="print the status of the targets and exit"
+)
+parser.add_argument(
+    "--rebuild", action="store_true", help="also build targets that already succeeded"
+)
+parser.add_argument(
+    "--cores",
+    default=os.cpu_count(),
+    type=int,
+    metavar="N",
+    help="cores to share between the builds (default: all)",
+)
+parser.add_argument(
+    "--memory",
+    default=None,
+    metavar="SIZE",
+    help="memory to share between the builds (default: all), e.g. 64G",
+)
+parser.add_argument(
+    "--memory-per-build",
+    default="4G",
+    metavar="SIZE",
+    help="memory needed by one build, limits the number of concurrent builds",
+)
+parser.add_argument(
+    "--hard-memory-limit",
+    action="store_true",
+    help="docker runner: also limit the containers to --memory-per-build (going over it kills the build)",
+)
+parser.add_argument(
+    "--min-cores",
+    default=2,
+    type=int,
+    metavar="N",
+    help="minimum number of cores given to a build",
+)
+parser.add_argument(
+    "-j",
+    "--jobs",
+    default=None,
+    type=int,
+    metavar="N",
+    help="maximum number of concurrent builds",
+)
+parser.add_argument(
+    "--runner",
+    choices=["docker", "local"],
+    default="docker",
+    help="run build.sh in a gcc-cross container (default) or directly (e.g. in the container, or with a fake ct-ng)",
+)
+parser.add_argument("--image", default="gcc-cross", metavar="IMAGE")
+parser.add_argument(
+    "--ct-ng-root",
+    default="/opt",
+    metavar="DIR",
+    help="local runner: directory containing crosstool-ng-latest/",
+)
+parser.add_argument(
+    "--work-dir",
+    default="build-work",
+    metavar="DIR",
+    help="where the build directories and logs are created",
+)
+parser.add_argument("--output", default="output", metavar="OUTPUT_DIR")
+parser.add_argument(
+    "--sources-cache",
+    required=False,
+    metavar="CACHE_DIR",
+    help="shared sources cache filled by source_cache.py",
+)
+parser.add_argument(
+    "--offline",
+    action="store_true",
+    help="with --sources-cache, don't let ct-ng download anything",
+)
+parser.add_argument(
+    "--ccache",
+    required=False,
+    metavar="CACHE",
+    help="ccache directory shared by the builds (a docker volume name or a directory with the docker runner)",
+)
+parser.add_argument(
+    "--resume",
+    action="store_true",
+    help="keep the ct-ng work directory of the failed builds and restart them from the failed step",
+)
+
+
+def parse_size(size: str):
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    size = size.strip().upper().rstrip("B")
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def host_memory():
+    with open("/proc/meminfo") as f:
+        for line in f:
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("Can't find MemTotal in /proc/meminfo")
+
+
+class State:
+    def __init__(self, path: str):
+        self.path = path
+        self.targets = {}
+        if exists(path):
+            with open(path) as f:
+                self.targets = json.load(f)["targets"]
+
+    def save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"targets": self.targets}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def target(self, name: str):
+        return self.targets.setdefault(name, {"status": PENDING, "durations": []})
+
+    ## Last known duration of the target, or of the slowest build of the same
+    ## arch, or of the slowest build overall. Never built targets are assumed
+    ## to be slow so they don't end up last in the queue.
+    def estimate(self, name: str):
+        durations = self.targets.get(name, {}).get("durations")
+        if durations:
+            return durations[-1]
+
+        arch = split_target(name)[0]
+        same_arch = [
+            t["durations"][-1]
+            for n, t in self.targets.items()
+            if t.get("durations") and split_target(n)[0] == arch
+        ]
+        if same_arch:
+            return max(same_arch)
+
+        everything = [
+            t["durations"][-1] for t in self.targets.values() if t.get("durations")
+        ]
+        return max(everything, default=0)
+
+
+class Build:
+    def __init__(self, args, name: str, cores: int, memory: int):
+        self.name = name
+        self.arch, self.version = split_target(name)
+        self.cores = cores
+        self.memory = memory
+        self.log_path = abspath(join(args.work_dir, "logs", f"{name}.log"))
+        self.container = f"gcc-cross-build-{name}"
+        self.volume = f"gcc-cross-resume-{name}"
+        self.ccache = None
+        self.args = args
+        self.start = time.monotonic()
+
+        log = open(self.log_path, "w")
+        env = dict(os.environ, CT_JOBS=str(cores))
+        cache_options = []
+        if args.sources_cache:
+            env["CT_TARBALLS_CACHE"] = abspath(args.sources_cache)
+            cache_options = [
+                "-v",
+                f"{abspath(args.sources_cache)}:/opt/.build/sources-cache:ro",
+                "-e",
+                "CT_TARBALLS_CACHE=/opt/.build/sources-cache",
+            ]
+            if args.offline:
+                env["CT_OFFLINE"] = "1"
+                cache_options += ["-e", "CT_OFFLINE=1"]
+
+        ccache_options = []
+        if args.ccache and args.runner == "docker":
+            ccache = abspath(args.ccache) if "/" in args.ccache else args.ccache
+            ccache_options = [
+                "-v",
+                f"{ccache}:/opt/.ccache",
+                "-e",
+                "CT_CCACHE_DIR=/opt/.ccache",
+            ]
+        elif args.ccache:
+            env["CT_CCACHE_DIR"] = abspath(args.ccache)
+
+        ## The ct-ng work directory is kept in a volume per target in the
+        ## docker case, and in the build directory otherwise.
+        resume_options = []
+        if args.resume:
+            env["CT_RESUME"] = "1"
+            resume_options = ["-e", "CT_RESUME=1", "-v", f"{self.volume}:/opt/.resume"]
+
+        if args.runner == "docker":
+            ## The memory per build is only used to decide how many builds can
+            ## run at once: a build going over it is killed by a hard limit.
+            memory_options = [f"--memory={memory}"] if args.hard_memory_limit else []
+            command = [
+                docker(),
+                "run",
+                "--name",
+                self.container,
+                f"--cpus={cores}",
+                *memory_options,
+                "-e",
+                f"CT_JOBS={cores}",
+                *cache_options,
+                *ccache_options,
+                *resume_options,
+                args.image,
+                "./build.sh",
+                self.arch,
+                self.version,
+                "/opt/",
+                self.last_revision() or "nope",
+            ]
+            cwd = None
+        else:
+            ## ct-ng builds in the current directory: give each build its own.
+            cwd = abspath(join(args.work_dir, name))
+            os.makedirs(cwd, exist_ok=True)
+            for link, target in (
+                ("latest", abspath(args.config_dir)),
+                (
+                    "crosstool-ng-latest",
+                    abspath(join(args.ct_ng_root, "crosstool-ng-latest")),
+                ),
+            ):
+                if not os.path.islink(join(cwd, link)):
+                    os.symlink(target, join(cwd, link))
+            command = ["bash", BUILD_SH, self.arch, self.version, abspath(args.output)]
+            ## build.sh runs with 'set -u' and expects it (set in the image)
+            env.setdefault("LD_LIBRARY_PATH", "")
+
+        self.process = subprocess.Popen(
+            command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        log.close()
+
+    ## build.sh writes the .ce-build manifest next to the tarball, in the
+    ## container. It is copied to the output directory with the tarball, and
+    ## its revision is given back to build.sh (which then reports SKIPPED if
+    ## nothing changed) as long as the tarball is still there.
+    def manifest_path(self):
+        return join(self.args.output, f"{self.arch}-gcc-{self.version}.ce-build")
+
+    def last_revision(self):
+        if not exists(self.manifest_path()):
+            return None
+        with open(self.manifest_path()) as f:
+            revision, _, artifact = f.read().strip().partition(" ")
+        if not exists(join(self.args.output, basename(artifact))):
+            return None
+        return revision
+
+    def poll(self):
+        return self.process.poll()
+
+    def terminate(self):
+        self.process.terminate()
+        if self.args.runner == "docker":
+            subprocess.run([docker(), "rm", "-f", self.container], capture_output=True)
+
+    ## ce-build-status from the log (OK, SKIPPED), FAILED if build.sh failed
+    def finish(self):
+        status, output = None, None
+        with open(self.log_path, errors="replace") as f:
+            for line in f:
+                if m := STATUS_RE.search(line):
+                    status = m.group(1)
+                if m := OUTPUT_RE.search(line):
+                    output = m.group(1)
+                if m := CCACHE_RE.search(line):
+                    self.ccache = (int(m.group(1)), int(m.group(2)))
+
+        if self.process.returncode != 0 or status is None:
+            status = FAILED
+
+        if self.args.runner == "docker":
+            if status == OK and output:
+                manifest = join(dirname(output), basename(self.manifest_path()))
+                for path in (output, manifest):
+                    copied = subprocess.run(
+                        [docker(), "cp", f"{self.container}:{path}", self.args.output],
+                        stdout=subprocess.DEVNULL,
+                    )
+                    if copied.returncode != 0:
+                        status = FAILED
+            subprocess.run([docker(), "rm", "-f", self.container], capture_output=True)
+            if self.args.resume and status != FAILED:
+                subprocess.run(
+                    [docker(), "volume", "rm", self.volume], capture_output=True
+                )
+        return status
+
+
+def docker():
+    for candidate in ("docker", "podman"):
+        for directory in os.environ.get("PATH", "").split(os.pathsep):
+            if os.access(join(directory, candidate), os.X_OK):
+                return candidate
+    return "docker"
+
+
+## How many builds can run at once and with how many cores each. The
+## remaining cores are split between the builds that can still be started,
+## so the builds starting last (the shortest ones, and the tail of the
+## queue) get more cores.
+def cores_for_next_build(args, free_cores: int, free_slots: int, pending: int):
+    share = free_cores // max(1, min(free_slots, pending))
+    return max(share, min(args.min_cores, free_cores))
+
+
+def run(args, state: State, queue):
+    total_memory = parse_size(args.memory) if args.memory else host_memory()
+    memory_per_build = parse_size(args.memory_per_build)
+    max_builds = max(
+        1, min(total_memory // memory_per_build, args.cores // args.min_cores)
+    )
+    if args.jobs:
+        max_builds = min(max_builds, args.jobs)
+
+    print(
+        f"{len(queue)} builds, up to {max_builds} at once, {args.cores} cores,"
+        f" {total_memory / (1 << 30):.1f}GiB"
+    )
+
+    running = []
+    free_cores = args.cores
+    try:
+        while queue or running:
+            while (
+                queue
+                and len(running) < max_builds
+                and free_cores >= min(args.min_cores, args.cores)
+            ):
+                name = queue.pop(0)
+                cores = cores_for_next_build(
+                    args, free_cores, max_builds - len(running), len(queue) + 1
+                )
+                free_cores -= cores
+                build = Build(args, name, cores, memory_per_build)
+                running.append(build)
+
+                target = state.target(name)
+                target.update(
+                    status=RUNNING, cores=cores, log=build.log_path, started=time.time()
+                )
+                state.save()
+                print(f"START {name} with {cores} cores ({len(queue)} left)")
+
+            time.sleep(0.5)
+            for build in [b for b in running if b.poll() is not None]:
+                running.remove(build)
+                free_cores += build.cores
+                duration = time.monotonic() - build.start
+                status = build.finish()
+
+                target = state.target(build.name)
+                target.update(status=status, duration=duration)
+                ## Failed builds stop early, their duration is meaningless.
+                if status == OK:
+                    target["durations"] = (target["durations"] + [duration])[-5:]
+                state.save()
+                ccache = ""
+                if build.ccache:
+                    hits, calls = build.ccache
+                    ccache = f", ccache {hits}/{calls} hits"
+                print(
+                    f"{status} {build.name} in {duration:.0f}s{ccache}, see {build.log_path}"
+                )
+    except KeyboardInterrupt:
+        for build in running:
+            build.terminate()
+            state.target(build.name)["status"] = PENDING
+        state.save()
+        raise
+
+
+def report(state: State, names):
+    print(f"{'target':<28} {'status':<8} {'cores':>5} {'last':>8} {'estimate':>8}")
+    for name in names:
+        target = state.targets.get(name, {"status": PENDING})
+        last = target.get("duration")
+        print(
+            f"{name:<28} {target['status']:<8} {target.get('cores', ''):>5}"
+            f" {f'{last:.0f}s' if last is not None else '':>8}"
+            f" {state.estimate(name):7.0f}s"
+        )
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    state = State(args.state)
+
+    if args.targets:
+        try:
+            names = [
+                f"{arch}-{version}"
+                for arch, version in select_configs(args.config_dir, args.targets)
+            ]
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        names = sorted(state.targets)
+
+    if args.status:
+        report(state, names)
+        sys.exit(0)
+
+    if not args.targets:
+        parser.error("no TARGET given")
+
+    ## An interrupted run leaves RUNNING targets behind: start them again.
+    queue = [
+        name
+        for name in names
+        if args.rebuild or state.target(name)["status"] not in (OK, SKIPPED)
+    ]
+    queue.sort(key=state.estimate, reverse=True)
+
+    os.makedirs(join(args.work_dir, "logs"), exist_ok=True)
+    os.makedirs(args.output, exist_ok=True)
+
+    run(args, state, queue)
+    report(state, names)
+    sys.exit(1 if any(state.target(n)["status"] == FAILED for n in names) else 0)
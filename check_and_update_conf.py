@@ -25,14 +25,27 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 from enum import Enum
-import glob
-from os.path import join, abspath, exists
+import copy
+import hashlib
+import os
+from os.path import join, abspath, basename, dirname, exists, isdir, relpath
 import io
 import re
-from collections import defaultdict
+from collections import defaultdict, deque
 import json
 import subprocess
 import argparse
+import bisect
+import difflib
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import contextlib
+
+from ctng_matrix import DEFAULT_CONFIG_DIR, CtngMatrix, list_configs
 
 LANGS = ["ADA", "D", "FORTRAN", "CXX", "GO", "C", "OBJC", "OBJCXX", "GIMPLE"]
 
@@ -48,7 +61,7 @@ CT_LANGS = {
 }
 
 parser = argparse.ArgumentParser(description="Update and check config files.")
-parser.add_argument("-a", "--arch", required=True, metavar="ARCH")
+parser.add_argument("-a", "--arch", required=False, metavar="ARCH")
 parser.add_argument(
     "-l",
     "--lang",
@@ -60,8 +73,25 @@ parser.add_argument(
     "--inplace", default=False, action="store_true", help="write change inplace"
 )
 parser.add_argument("--output", required=False, metavar="OUTPUT")
+parser.add_argument(
+    "--dry-run",
+    action="store_true",
+    help="print a unified diff of the changes instead of writing them",
+)
+parser.add_argument(
+    "--patch",
+    required=False,
+    metavar="PATCH_PATH",
+    help="with --dry-run, write the diff in PATCH_PATH instead of printing it",
+)
+parser.add_argument(
+    "--journal",
+    required=False,
+    metavar="JOURNAL_PATH",
+    help="journal of the files being written (default: .check_and_update_conf.journal in the config dir)",
+)
 parser.add_argument("--error-if-missing-previous", action="store_true")
-parser.add_argument("--version", required=True, metavar="VERSION")
+parser.add_argument("--version", required=False, metavar="VERSION")
 parser.add_argument("--guess-previous", required=False, action="store_true")
 parser.add_argument(
     "--previous-version", required=False, action="append", metavar="PREVVERSION"
@@ -70,20 +100,91 @@ parser.add_argument("--config", required=False, metavar="CONFIG")
 parser.add_argument("--config-dir", required=False, metavar="CONFIGDIR")
 parser.add_argument("--config-todo", required=False, metavar="TODO_PATH")
 parser.add_argument("--summary", required=False, metavar="SUMMARY_PATH")
+parser.add_argument(
+    "--batch",
+    required=False,
+    metavar="TARGETS_PATH",
+    help="handle all targets listed in TARGETS_PATH (one 'ARCH VERSION [PREVVERSION]' per line) instead of -a/--version",
+)
+
+parser.add_argument(
+    "--install-root",
+    default="/opt/compiler-explorer",
+    metavar="INSTALL_ROOT",
+    help="where the toolchains are installed",
+)
+parser.add_argument(
+    "--install-index",
+    required=False,
+    metavar="INDEX_PATH",
+    help="keep the index of the installed toolchains in INDEX_PATH and reuse it across runs",
+)
+parser.add_argument(
+    "--ctng-config-dir",
+    default=DEFAULT_CONFIG_DIR,
+    metavar="CTNG_CONFIG_DIR",
+    help="where the ct-ng configs are (default: build/latest next to this script)",
+)
+parser.add_argument(
+    "--ctng-matrix-cache",
+    required=False,
+    metavar="CACHE_PATH",
+    help="keep the parsed ct-ng configs in CACHE_PATH (see ctng_matrix.py)",
+)
+parser.add_argument(
+    "--probe-jobs",
+    default=8,
+    type=int,
+    metavar="JOBS",
+    help="number of compilers probed with --version concurrently",
+)
+parser.add_argument(
+    "--probe-timeout",
+    default=60,
+    type=float,
+    metavar="SECONDS",
+    help="time allowed for a compiler to answer --version",
+)
+parser.add_argument(
+    "--parse-cache",
+    required=False,
+    metavar="CACHE_DIR",
+    help="cache the parsed config files in CACHE_DIR and reuse them while they are unchanged",
+)
+parser.add_argument(
+    "--parse-cache-max-size",
+    default=64 * 1024 * 1024,
+    type=int,
+    metavar="BYTES",
+    help="maximum size of the parse cache before evicting least recently used entries",
+)
 
 parser.add_argument("--create-api-tests", required=False, metavar="TESTS_PATH")
+parser.add_argument(
+    "--api-tests-format",
+    choices=["manifest", "bash"],
+    default="manifest",
+    help="create a test manifest for run_api_tests.py (default) or a bash/curl script",
+)
 parser.add_argument(
     "--api-test-host", default="http://localhost:10240", metavar="TEST_HOST"
 )
+parser.add_argument(
+    "--timings",
+    required=False,
+    metavar="TRACE_PATH",
+    help="time each phase per target and language, write a Chrome trace in TRACE_PATH and print a summary",
+)
+parser.add_argument(
+    "--profile",
+    required=False,
+    metavar="PROFILE_PATH",
+    help="run under cProfile and dump the stats in PROFILE_PATH",
+)
 
 PREVIOUS_VERSIONS = defaultdict(None)
 PREVIOUS_VERSIONS.default_factory = lambda: None
 
-PROP_RE = re.compile(r"[^#]*=.*")
-COMPILERS_LIST_RE = re.compile(r"compilers=(.*)")
-COMPILER_EXE_RE = re.compile(r"compiler\.(.*?)\.exe=(.*)")
-COMPILER_ANYPROP_RE = re.compile(r"compiler\.(?P<name>.*?)\.(?P<prop>.*)=(?P<value>.*)")
-
 API_TESTS_OUTPUT = None
 
 TEST_FOR_LANG = {
@@ -134,8 +235,15 @@ square (int num)
 }
 
 
-def create_test(arch, lang, compilerId):
-    print(f"lang is {lang}")
+API_TESTS_FORMAT = "manifest"
+
+API_TEST_KINDS = {
+    "ASM": {},
+    "ASM+BINARY": {"binary": True},
+}
+
+
+def compile_request(lang, filters=None):
     json_content = {
         "source": TEST_FOR_LANG[lang],
         "options": {
@@ -153,6 +261,53 @@ def create_test(arch, lang, compilerId):
             },
         },
     }
+    if filters:
+        json_content["options"]["filters"].update(filters)
+    return json_content
+
+
+## The tests are appended to the output, a new one starts with the CE host.
+def open_api_tests(path: str, api_tests_format: str, host: str):
+    results_exists = exists(path)
+    output = open(path, "a")
+    if not results_exists and api_tests_format == "bash":
+        output.write("#!/bin/bash\n")
+        output.write("set -euo pipefail\n")
+        output.write("line='----------------------------------------'\n")
+        output.write(f"CEHOST='{host}'\n")
+    elif not results_exists:
+        output.write(json.dumps({"host": host}) + "\n")
+    return output
+
+
+def create_test(arch, lang, compilerId, fake=False, previous=None):
+    print(f"lang is {lang}")
+    if API_TESTS_FORMAT == "bash":
+        create_bash_test(arch, lang, compilerId)
+        return
+
+    ## One JSON object per line, see run_api_tests.py. The source is given by
+    ## its TEST_FOR_LANG key and only the filters differing from
+    ## compile_request() are recorded.
+    for kind, filters in API_TEST_KINDS.items():
+        test = {
+            "name": f"{arch} {lang} {compilerId} {kind}",
+            "arch": arch,
+            "lang": lang,
+            "compiler": compilerId,
+            "kind": kind,
+            "source": lang,
+            "filters": filters,
+            "fake": fake,
+        }
+        if previous:
+            ## used to compare timings in benchmark mode
+            test["previous"] = previous
+        API_TESTS_OUTPUT.write(json.dumps(test) + "\n")
+
+
+def create_bash_test(arch, lang, compilerId):
+    json_content = compile_request(lang)
 
     curl_cmd = f"""if curl -s "$CEHOST/api/compiler/{compilerId}/compile" --header "Accept: application/json"\\
        -X POST -H"Content-Type: application/json"\\
@@ -196,6 +351,80 @@ def create_test(arch, lang, compilerId):
     API_TESTS_OUTPUT.write("\nfi\n")
 
 
+## Wall and CPU time of the phases of a run, see --timings. Spans can be
+## nested (e.g. findCompiler within a language of a target) and are recorded
+## from any thread, they are written as "complete" events of the Chrome
+## trace-event format (chrome://tracing, https://ui.perfetto.dev).
+class Timings:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **span_args):
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": (time.perf_counter() - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": dict(span_args, cpu=time.thread_time() - cpu_start),
+            }
+            with self.lock:
+                self.events.append(event)
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events}, f)
+
+    def summary(self):
+        print("\n#### Timings (wall/cpu in seconds, nested phases are included)")
+        by_phase = defaultdict(lambda: [0, 0.0, 0.0])
+        by_target = defaultdict(lambda: [0, 0.0, 0.0])
+        by_lang = defaultdict(lambda: [0, 0.0, 0.0])
+        for event in self.events:
+            wall, cpu = event["dur"] / 1e6, event["args"]["cpu"]
+            totals = [by_phase[event["name"]]]
+            if event["name"] == "lang":
+                totals.append(by_lang[event["args"]["lang"]])
+            elif event["name"] == "target":
+                totals.append(by_target[event["args"]["target"]])
+            for total in totals:
+                total[0] += 1
+                total[1] += wall
+                total[2] += cpu
+
+        for title, totals in (
+            ("phase", by_phase),
+            ("target", by_target),
+            ("lang", by_lang),
+        ):
+            if not totals:
+                continue
+            print(f"{title:<24} {'count':>6} {'wall':>9} {'cpu':>9}")
+            for name, (count, wall, cpu) in sorted(
+                totals.items(), key=lambda t: -t[1][1]
+            ):
+                print(f"{name:<24} {count:>6} {wall:9.3f} {cpu:9.3f}")
+            print()
+
+
+TIMINGS = None
+
+
+def timed(name: str, **span_args):
+    if TIMINGS is None:
+        return contextlib.nullcontext()
+    return TIMINGS.span(name, **span_args)
+
+
 class Line:
     def __init__(self, line_number, text):
         self.number = line_number
@@ -205,61 +434,381 @@ class Line:
         return f"<{self.number}> {self.text}"
 
 
-def match_and_add(line: Line, expr, s):
-    match = expr.match(line.text)
-    if match:
-        s[match.group(1)] = line
-    return match
+## Round-trip model of a CE properties file. The file is read and indexed in a
+## single pass, comments and ordering are kept untouched and only the lines
+## with fixups attached are rewritten when serializing.
+class PropertiesFile:
+    def __init__(self, path: str):
+        self.path = path
+        self.listed_compilers = {}
+        self.compilers_exe = {}
+        self.last_compilers_prop = {}
+        self.compilers_name_prop = {}
+        self.compilers_semver_prop = {}
+        self.fixups = defaultdict(list)
+
+        ## The fixups refer to line numbers, the file must not change before
+        ## they are written (see WriteTransaction).
+        self.stamp = file_stamp(path)
+
+        ## Only filled when the file is actually parsed (i.e. not when loaded
+        ## from the parse cache), see _ensure_parsed().
+        self._lines = None
+        self._props = None
+        self._groups = None
+        self._compilers = None
+
+    @classmethod
+    def parse(cls, path: str):
+        p = cls(path)
+        p._parse()
+        return p
+
+    def _parse(self):
+        self._props = {}
+        self._groups = defaultdict(dict)
+        self._compilers = defaultdict(dict)
+        for line_number, text in enumerate(self.lines, start=1):
+            self._index_line(line_number, text)
+
+    def _index_line(self, line_number: int, text: str):
+        text = text.strip()
+        key, sep, value = text.partition("=")
+        if not sep or "#" in key:
+            return
+
+        line = Line(line_number, text)
+        self._props[key] = line
+
+        if key == "compilers" or key.endswith(".compilers"):
+            for elem_id in value.split(":"):
+                if elem_id and not elem_id.startswith("&") and "@" not in elem_id:
+                    self.listed_compilers[elem_id] = line
+
+        kind, _, rest = key.partition(".")
+        name, _, prop = rest.partition(".")
+        if not prop:
+            return
+
+        if kind == "compiler":
+            self._compilers[name][prop] = line
+            self.last_compilers_prop[name] = line
+            if prop == "exe":
+                self.compilers_exe[name] = line
+            elif prop == "name":
+                self.compilers_name_prop[name] = value
+            elif prop == "semver":
+                self.compilers_semver_prop[name] = value
+        elif kind == "group":
+            self._groups[name][prop] = line
+
+    def _ensure_parsed(self):
+        if self._props is None:
+            full = PropertiesFile.parse(self.path)
+            self._props = full._props
+            self._groups = full._groups
+            self._compilers = full._compilers
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            with open(self.path, newline="") as f:
+                self._lines = f.readlines()
+        return self._lines
+
+    @property
+    def props(self):
+        self._ensure_parsed()
+        return self._props
+
+    @property
+    def groups(self):
+        self._ensure_parsed()
+        return self._groups
+
+    @property
+    def compilers(self):
+        self._ensure_parsed()
+        return self._compilers
+
+    def value(self, key: str):
+        if key not in self.props:
+            return None
+        return self.props[key].text.partition("=")[2]
+
+    def compiler_prop(self, compiler_id: str, prop: str):
+        return self.value(f"compiler.{compiler_id}.{prop}")
+
+    def group_prop(self, group: str, prop: str):
+        return self.value(f"group.{group}.{prop}")
+
+    def add_fixup(self, fixup):
+        self.fixups[fixup.line].append(fixup)
+
+    ## Streamed from the file, so that big files are not kept in memory.
+    def serialize(self, output):
+        with open(self.path, newline="") as f:
+            for line_number, text in enumerate(f, start=1):
+                if line_number in self.fixups:
+                    text = apply_fixups(
+                        text, self.fixups[line_number], self.compilers_semver_prop
+                    )
+                output.write(text)
+
+    def write(self, output_path: str):
+        transaction = WriteTransaction(None)
+        transaction.add(output_path, self.serialize)
+        transaction.commit()
+
+    def diff(self, output_path: str):
+        new = io.StringIO()
+        self.serialize(new)
+        old = []
+        if exists(output_path):
+            with open(output_path, newline="") as f:
+                old = f.readlines()
+        return difflib.unified_diff(
+            old,
+            new.getvalue().splitlines(keepends=True),
+            f"a/{output_path.lstrip('/')}",
+            f"b/{output_path.lstrip('/')}",
+        )
 
+    ## Compact form of the indexes used by the parse cache: each referenced
+    ## line is stored once and the indexes only refer to line numbers.
+    def to_index(self):
+        lines = {}
+        indexes = {}
+        for index_name in ("listed_compilers", "compilers_exe", "last_compilers_prop"):
+            index = {}
+            for compiler_id, line in getattr(self, index_name).items():
+                lines[line.number] = line.text
+                index[compiler_id] = line.number
+            indexes[index_name] = index
+
+        indexes["compilers_name_prop"] = self.compilers_name_prop
+        indexes["compilers_semver_prop"] = self.compilers_semver_prop
+        indexes["lines"] = lines
+        return indexes
+
+    @classmethod
+    def from_index(cls, path: str, indexes):
+        p = cls(path)
+        lines = {
+            int(number): Line(int(number), text)
+            for number, text in indexes["lines"].items()
+        }
+        for index_name in ("listed_compilers", "compilers_exe", "last_compilers_prop"):
+            setattr(
+                p,
+                index_name,
+                {
+                    compiler_id: lines[number]
+                    for compiler_id, number in indexes[index_name].items()
+                },
+            )
+        p.compilers_name_prop = indexes["compilers_name_prop"]
+        p.compilers_semver_prop = indexes["compilers_semver_prop"]
+        return p
+
+
+## On-disk cache of the PropertiesFile indexes. An entry is valid as long as the
+## file has the same size and mtime, or the same content hash if only the mtime
+## changed (e.g. after a git checkout). The least recently used entries are
+## evicted when the cache grows over max_size bytes.
+class ParseCache:
+    ## Bump when the content of the index changes.
+    FORMAT = 2
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_path(self, path: str):
+        key = hashlib.sha1(abspath(path).encode("utf-8")).hexdigest()
+        return join(self.directory, f"{key}.json")
+
+    @staticmethod
+    def _content_hash(path: str):
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def load(self, path: str):
+        entry_path = self._entry_path(path)
+        try:
+            with open(entry_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        st = os.stat(path)
+        if entry.get("format") != self.FORMAT or entry["size"] != st.st_size:
+            return None
+        if entry["mtime"] != st.st_mtime_ns:
+            if entry["sha256"] != self._content_hash(path):
+                return None
+            entry["mtime"] = st.st_mtime_ns
+            self._write_entry(entry_path, entry)
+        else:
+            ## bump the entry for the LRU eviction
+            os.utime(entry_path)
+
+        return PropertiesFile.from_index(path, entry["index"])
+
+    def store(self, path: str, p: PropertiesFile):
+        st = os.stat(path)
+        entry = {
+            "format": self.FORMAT,
+            "path": abspath(path),
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "sha256": self._content_hash(path),
+            "index": p.to_index(),
+        }
+        self._write_entry(self._entry_path(path), entry)
+        self.evict()
+
+    def _write_entry(self, entry_path: str, entry):
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f, separators=(",", ":"))
+        os.replace(tmp_path, entry_path)
+
+    def evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if e.name.endswith(".json"):
+                    st = e.stat()
+                    entries.append((st.st_mtime, st.st_size, e.path))
+                    total += st.st_size
+
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_size:
+                break
+            os.remove(entry_path)
+            total -= size
+
+
+PARSE_CACHE = None
+
+
+def file_stamp(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
 
-def match_and_update(line: Line, expr, s, split=":"):
-    match = expr.match(line.text)
-    if match:
-        s.update(match.group(1).split(split))
-    return match
+
+def fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+## Writes a set of files all together or not at all. The new content of each
+## file is streamed to a temporary file next to it and synced. On commit, the
+## targets are checked to be unchanged since they were read, and a journal
+## listing the pending renames is synced before renaming the temporary files
+## over their targets: a commit interrupted half-way is finished by
+## recover_journal() on the next run. Until then, rollback() only has to remove
+## the temporary files.
+class WriteTransaction:
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self.pending = []
+
+    def add(self, target: str, serialize, stamp=None):
+        fd, tmp_path = tempfile.mkstemp(
+            dir=dirname(abspath(target)), prefix=f".{basename(target)}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", newline="") as f:
+                serialize(f)
+                f.flush()
+                os.fsync(f.fileno())
+            if exists(target):
+                shutil.copymode(target, tmp_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.pending.append((tmp_path, target, stamp))
+
+    def rollback(self):
+        for tmp_path, _, _ in self.pending:
+            if exists(tmp_path):
+                os.remove(tmp_path)
+        self.pending.clear()
+
+    def commit(self):
+        for _, target, stamp in self.pending:
+            if stamp is not None and file_stamp(target) != stamp:
+                self.rollback()
+                raise Woops(f"{target} changed since it was read, nothing written")
+
+        journaled = self.journal_path and len(self.pending) > 1
+        if journaled:
+            journal = [[tmp_path, target] for tmp_path, target, _ in self.pending]
+            tmp_journal = f"{self.journal_path}.{os.getpid()}.tmp"
+            with open(tmp_journal, "w") as f:
+                json.dump(journal, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_journal, self.journal_path)
+            fsync_dir(dirname(abspath(self.journal_path)))
+
+        ## From here, the journal is used to finish the commit.
+        pending, self.pending = self.pending, []
+        for tmp_path, target, _ in pending:
+            os.replace(tmp_path, target)
+        for directory in {dirname(abspath(t)) for _, t, _ in pending}:
+            fsync_dir(directory)
+
+        ## The journal of an interrupted run is only removed by recover_journal().
+        if journaled:
+            os.remove(self.journal_path)
+
+
+## A dry run doesn't change any file, the interrupted writes are only
+## reported.
+def recover_journal(journal_path: str, dry_run=False):
+    if not exists(journal_path):
+        return
+    with open(journal_path) as f:
+        journal = json.load(f)
+    if dry_run:
+        print(
+            f"{len(journal)} files were not written by an interrupted run,"
+            " run without --dry-run to finish writing them"
+        )
+        return
+    for tmp_path, target in journal:
+        if exists(tmp_path):
+            os.replace(tmp_path, target)
+    os.remove(journal_path)
+    print(f"Finished writing {len(journal)} files interrupted in a previous run")
 
 
 def parse_file(file: str):
-    listed_compilers = {}
-    compilers_exe = {}
-    last_compilers_prop = {}
-    compilers_name_prop = {}
+    with timed("parse_file", file=basename(file)):
+        return _parse_file(file)
 
-    with open(file) as f:
-        for line_number, text in enumerate(f, start=1):
-            text = text.strip()
-            if not text:
-                continue
-            line = Line(line_number, text)
 
-            match_prop = PROP_RE.match(line.text)
-            if not match_prop:
-                continue
+def _parse_file(file: str):
+    if PARSE_CACHE:
+        p = PARSE_CACHE.load(file)
+        if p:
+            return p
 
-            match_compilers = COMPILERS_LIST_RE.search(line.text)
-            if match_compilers:
-                ids = match_compilers.group(1).split(":")
-                for elem_id in ids:
-                    if elem_id.startswith("&"):
-                        pass
-                    elif "@" not in elem_id:
-                        listed_compilers[elem_id] = line
-
-            m = match_and_add(line, COMPILER_EXE_RE, compilers_exe)
-
-            m = COMPILER_ANYPROP_RE.match(line.text)
-            if m:
-                last_compilers_prop[m.group("name")] = line
-                if m.group("prop") == "name":
-                    compilers_name_prop[m.group("name")] = m.group("value")
-
-            m = match_and_add(line, COMPILER_ANYPROP_RE, last_compilers_prop)
-    return {
-        "listed_compilers": listed_compilers,
-        "compilers_exe": compilers_exe,
-        "last_compilers_prop": last_compilers_prop,
-        "compilers_name_prop": compilers_name_prop,
-    }
+    p = PropertiesFile.parse(file)
+    if PARSE_CACHE:
+        PARSE_CACHE.store(file, p)
+    return p
 
 
 # because some arch (ie. riscv) are using a nicer naming {arch}-bla. But we
@@ -366,28 +915,82 @@ class FixupAction(Enum):
     ADD_SORTED = 4
 
 
-## takes the first number it finds in the key and use it. if no number is found,
-## put the item at the end (probably some trunk compiler)
-def find_int_key(key):
-    if key.isdigit():
-        t = key
-    m = re.search(r"(\d+)", key)
-    if m:
-        t = int(m.group(1))
-    else:
-        t = 99999
-    return t
-
-
-def compiler_version_sort(l):
-    return sorted(l, key=find_int_key)
-
-
-def add_sorted(original_line: str, new_value: str):
+## Version key of a listed compiler ID, decoded from the ID (see
+## CompilerIdDecoder), or None for groups (&name) and IDs that can't be decoded.
+def compiler_id_version_key(compiler_id: str, semver_props):
+    if compiler_id.startswith("&"):
+        return None
+    decoded = get_compiler_id_decoder().decode(compiler_id)
+    if not decoded:
+        return None
+    return version_key(id_version(compiler_id, decoded[0][2], semver_props))
+
+
+## Inserts the new IDs in a compilers list already ordered by version, in a
+## single pass: each new ID goes before the first decoded ID with a greater
+## version (after the equal ones). Groups and IDs that can't be decoded keep
+## their place, and new IDs that can't be decoded are appended at the end. IDs
+## already listed are not added again.
+def add_sorted(original_line: str, new_values, semver_props=None):
+    if isinstance(new_values, str):
+        new_values = [new_values]
+    semver_props = semver_props or {}
     k, v = original_line.split("=")
-    values = v.split(":")
-    values.append(new_value)
-    return "=".join([k, ":".join(compiler_version_sort(values))])
+    values = v.split(":") if v else []
+
+    new_keyed = []
+    undecoded = []
+    for value in dict.fromkeys(new_values):
+        if value in values:
+            continue
+        key = compiler_id_version_key(value, semver_props)
+        if key is None:
+            undecoded.append(value)
+        else:
+            new_keyed.append((key, value))
+    new_keyed.sort(key=lambda kv: kv[0])
+
+    keys = [compiler_id_version_key(value, semver_props) for value in values]
+    last_known = max((i for i, key in enumerate(keys) if key is not None), default=-1)
+
+    result = []
+    n = 0
+    for i, (value, key) in enumerate(zip(values, keys)):
+        while key is not None and n < len(new_keyed) and new_keyed[n][0] < key:
+            result.append(new_keyed[n][1])
+            n += 1
+        result.append(value)
+        if i == last_known:
+            result.extend(value for _, value in new_keyed[n:])
+            n = len(new_keyed)
+    result.extend(value for _, value in new_keyed[n:])
+    result.extend(undecoded)
+    return "=".join([k, ":".join(result)])
+
+
+## The line ending of the original line is kept (a CRLF file stays CRLF).
+def apply_fixups(text: str, fixups, semver_props=None):
+    eol = text[len(text.rstrip("\r\n")) :] or "\n"
+    added = []
+    ## Consecutive ADD_SORTED fixups are applied together.
+    to_sort = []
+    for fixup in fixups:
+        if fixup.action == FixupAction.ADD_SORTED:
+            to_sort.append(fixup.text)
+            continue
+        if to_sort:
+            text = add_sorted(text.strip(), to_sort, semver_props) + eol
+            to_sort = []
+        match fixup.action:
+            case FixupAction.REPLACE:
+                text = fixup.text
+            case FixupAction.ADD_NEW_LINE_AFTER:
+                added.append(fixup.text)
+            case FixupAction.APPEND_TO_LINE:
+                text = text.strip() + fixup.text + eol
+    if to_sort:
+        text = add_sorted(text.strip(), to_sort, semver_props) + eol
+    return text + "".join(added)
 
 
 class Fixup:
@@ -428,24 +1031,189 @@ compiler.{compiler_id}.demangler={cppfilt_path}
     return ret
 
 
-def findFile(arch: str, lang: str, version: str, directory: str, suffix: str):
+def toolchain_dir(arch: str, version: str, directory: str):
     if arch == "arm-unknown":
-        target_dir = f"{directory}/arm/gcc-arm-unknown-{version}/**/*-{suffix}"
-    else:
-        target_dir = f"{directory}/{arch}/gcc-{version}/**/*-{suffix}"
+        return f"{directory}/{arch_directory(arch)}/gcc-arm-unknown-{version}"
+    return f"{directory}/{arch_directory(arch)}/gcc-{version}"
 
-    print("search in {}".format(target_dir))
-    for f in glob.glob(target_dir, recursive=True):
-        return abspath(f)
-    raise Woops(f"Can't find '{target_dir}, something's wrong")
+
+## Directory of the toolchains of an arch in the install root: the arm-unknown
+## ones are installed with the arm ones.
+def arch_directory(arch: str):
+    if arch == "arm-unknown":
+        return "arm"
+    return arch
+
+
+## Inverse of toolchain_dir(): (arch, version) of a toolchain tree, or None.
+def toolchain_target(tree: str, directory: str):
+    parent, _, name = tree.rstrip("/").rpartition("/")
+    arch_directory, _, arch = parent.rpartition("/")
+    if abspath(arch_directory) != abspath(directory) or not name.startswith("gcc-"):
+        return None
+    version = name[len("gcc-") :]
+    if arch == "arm" and version.startswith("arm-unknown-"):
+        return ("arm-unknown", version[len("arm-unknown-") :])
+    return (arch, version)
+
+
+## Index of the executables found in the bin/ directories of the installed
+## toolchains. Each toolchain tree is walked only once and the executables are
+## recorded under all their '-' separated suffixes (e.g.
+## arm-linux-gnueabi-g++ is recorded as 'linux-gnueabi-g++', 'gnueabi-g++'
+## and 'g++'), the shallowest match winning. An entry is valid as long as the
+## mtimes of all the directories of the tree didn't change (an executable added
+## to a bin/, or a new bin/ anywhere), which is checked once per run.
+class ToolchainIndex:
+    def __init__(self):
+        self.trees = {}
+        self.dirty = False
+        self.checked = set()
+
+    def load(self, path: str):
+        if exists(path):
+            with open(path) as f:
+                self.trees = json.load(f)
+
+    def save(self, path: str):
+        if not self.dirty:
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.trees, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+        self.dirty = False
+
+    @staticmethod
+    def _scan(tree: str):
+        executables = {}
+        ## directory (relative to the tree): mtime
+        dirs = {}
+        pending = deque([tree])
+        while pending:
+            directory = pending.popleft()
+            try:
+                dirs[relpath(directory, tree)] = os.stat(directory).st_mtime_ns
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+
+            in_bin = basename(directory) == "bin"
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif in_bin and entry.is_file() and os.access(entry.path, os.X_OK):
+                    name = entry.name
+                    pos = name.find("-")
+                    while pos != -1:
+                        executables.setdefault(name[pos + 1 :], abspath(entry.path))
+                        pos = name.find("-", pos + 1)
+        return executables, dirs
+
+    @staticmethod
+    def _up_to_date(tree: str, entry):
+        ## Entries of older indexes only have the mtimes of some directories.
+        if "dirs" not in entry:
+            return False
+        for path, mtime in entry["dirs"].items():
+            try:
+                if os.stat(join(tree, path)).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def executables(self, tree: str):
+        if not isdir(tree):
+            return {}
+
+        entry = self.trees.get(tree)
+        if entry is None or (
+            tree not in self.checked and not self._up_to_date(tree, entry)
+        ):
+            try:
+                executables, dirs = self._scan(tree)
+            except OSError:
+                return {}
+            entry = {"dirs": dirs, "executables": executables}
+            self.trees[tree] = entry
+            self.dirty = True
+        self.checked.add(tree)
+        return entry["executables"]
+
+
+TOOLCHAIN_INDEX = ToolchainIndex()
+
+
+def findFile(arch: str, lang: str, version: str, directory: str, suffix: str):
+    tree = toolchain_dir(arch, version, directory)
+
+    print("search in {}".format(tree))
+    with timed("findFile", tree=tree):
+        executables = TOOLCHAIN_INDEX.executables(tree)
+    if suffix in executables:
+        return executables[suffix]
+    raise Woops(f"Can't find '{tree}/**/bin/*-{suffix}', something's wrong")
+
+
+## Runs `<compiler> --version` in a bounded thread pool. Probes are memoized
+## per binary (path, inode, mtime) so that languages sharing the same driver
+## (e.g. C, OBJC and GIMPLE all use *-gcc) only run it once, and they can be
+## started ahead of time, see prefetch_compiler_probes().
+class CompilerProber:
+    def __init__(self, jobs: int, timeout: float):
+        self.pool = ThreadPoolExecutor(max_workers=jobs)
+        self.timeout = timeout
+        self.probes = {}
+        self.lock = threading.Lock()
+
+    def _run(self, path: str):
+        try:
+            with timed("--version", compiler=basename(path)):
+                output = subprocess.check_output(
+                    [path, "--version"], timeout=self.timeout
+                )
+        except subprocess.TimeoutExpired:
+            raise Woops(
+                f"Compiler {path} didn't answer to --version within {self.timeout}s"
+            )
+        except subprocess.CalledProcessError as e:
+            raise Woops(f"Compiler {path} --version exited with {e.returncode}")
+        except OSError as e:
+            raise Woops(f"Can't run {path} --version: {e}")
+        return output.decode("utf-8").splitlines()
+
+    def probe(self, path: str):
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            raise Woops(f"Can't probe {path}: {e}")
+        key = (path, st.st_ino, st.st_mtime_ns)
+        with self.lock:
+            if key not in self.probes:
+                self.probes[key] = self.pool.submit(self._run, path)
+            return self.probes[key]
+
+    ## Waits for the probes and stops the threads, e.g. before forking.
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+
+## Set up from the command line in __main__, the scripts importing this one get
+## the default --probe-jobs and --probe-timeout.
+COMPILER_PROBER = CompilerProber(
+    parser.get_default("probe_jobs"), parser.get_default("probe_timeout")
+)
 
 
 def findCompiler(arch: str, lang: str, version: str, directory: str):
     candidate = findFile(arch, lang, version, directory, COMPILER_SUFFIX[lang])
     version_found = False
-    lines = (
-        subprocess.check_output([candidate, "--version"]).decode("utf-8").splitlines()
-    )
+    with timed("findCompiler", compiler=basename(candidate)):
+        lines = COMPILER_PROBER.probe(candidate).result()
     for l in lines:
         if re.search(version, l):
             version_found = True
@@ -459,6 +1227,29 @@ def findCompiler(arch: str, lang: str, version: str, directory: str):
     return candidate
 
 
+def prefetch_compiler_probes(targets, langs):
+    for target_args in targets:
+        for lang in langs:
+            new_compiler_id = CompilerId(target_args.arch, target_args.version, lang)
+            try:
+                if (
+                    new_compiler_id
+                    in get_parsed_conf(conf_path(target_args, lang)).listed_compilers
+                ):
+                    continue
+                candidate = findFile(
+                    target_args.arch,
+                    lang,
+                    target_args.version,
+                    target_args.install_root,
+                    COMPILER_SUFFIX[lang],
+                )
+            except (Woops, OSError):
+                ## Reported when the target is actually handled.
+                continue
+            COMPILER_PROBER.probe(candidate)
+
+
 def CompilerId(arch: str, version: str, lang: str):
     renamed_arch = arch
     if arch in ARCH_RENAMING_IN_CONFIG:
@@ -469,40 +1260,193 @@ def CompilerId(arch: str, version: str, lang: str):
     )
 
 
+## The arches of the ct-ng configs, when they are available, and the special
+## cased ones. The arch of the target is added by get_compiler_id_decoder().
+def known_arches():
+    arches = set(COMPILER_ID_PATTERN) | set(ARCH_RENAMING_IN_CONFIG)
+    if isdir(CTNG_MATRIX.config_dir):
+        arches |= {arch for arch, _ in list_configs(CTNG_MATRIX.config_dir)}
+    return arches
+
+
+def version_key(version: str):
+    return tuple(int(v) for v in version.split("."))
+
+
+## Best effort to get back a version from the dot-less form used in compiler
+## IDs: majors 10 to 39 use 2 digits, minors use 1 digit and anything left is
+## the patch level (e.g. 940 -> 9.4.0, 1320 -> 13.2.0, 121 -> 12.1,
+## 12110 -> 12.1.10).
+def decode_version_digits(digits: str):
+    major_len = 2 if digits[0] in "123" and len(digits) > 2 else 1
+    parts = [digits[:major_len], digits[major_len : major_len + 1]]
+    if digits[major_len + 1 :]:
+        parts.append(digits[major_len + 1 :])
+    return ".".join(str(int(p)) for p in parts)
+
+
+## Inverse of CompilerId(): the COMPILER_ID_PATTERN for each language (and each
+## special cased arch) is turned into a regex matching all the arches using it,
+## so that a compiler ID can be decoded back to (arch, lang, version digits).
+## An ID can decode to several (arch, lang), e.g. objcrv32g* is used by both
+## riscv32 and riscv64.
+class CompilerIdDecoder:
+    def __init__(self, arches):
+        self.arches = set()
+        self.matchers = []
+        self.decoded = {}
+        self.add_arches(arches)
+
+    def add_arches(self, arches):
+        if set(arches) <= self.arches:
+            return
+        self.arches |= set(arches)
+        self.decoded.clear()
+
+        by_pattern = defaultdict(lambda: defaultdict(list))
+        for arch in self.arches:
+            renamed_arch = ARCH_RENAMING_IN_CONFIG.get(arch, arch)
+            for lang, pattern in COMPILER_ID_PATTERN[arch].items():
+                by_pattern[(lang, pattern)][renamed_arch].append(arch)
+
+        self.matchers = []
+        for (lang, pattern), renamed_arches in by_pattern.items():
+            ## longest first, so that e.g. 'arm64' wins over 'arm'
+            alternatives = "|".join(
+                re.escape(a) for a in sorted(renamed_arches, key=len, reverse=True)
+            )
+            regex = (
+                re.escape(pattern)
+                .replace(re.escape("{arch}"), f"(?P<arch>{alternatives})")
+                .replace(re.escape("{version}"), r"(?P<version>\d+)")
+            )
+            self.matchers.append((re.compile(regex), lang, renamed_arches))
+
+    def decode(self, compiler_id: str):
+        if compiler_id in self.decoded:
+            return self.decoded[compiler_id]
+        decoded = []
+        for regex, lang, renamed_arches in self.matchers:
+            m = regex.fullmatch(compiler_id)
+            if not m:
+                continue
+            if "arch" in m.groupdict():
+                arches = renamed_arches[m.group("arch")]
+            else:
+                arches = [a for arches in renamed_arches.values() for a in arches]
+            for arch in arches:
+                decoded.append((arch, lang, m.group("version")))
+        self.decoded[compiler_id] = decoded
+        return decoded
+
+
+COMPILER_ID_DECODER = None
+
+
+def get_compiler_id_decoder(arch=None):
+    global COMPILER_ID_DECODER
+    if COMPILER_ID_DECODER is None:
+        COMPILER_ID_DECODER = CompilerIdDecoder(known_arches())
+    if arch:
+        COMPILER_ID_DECODER.add_arches([arch])
+    return COMPILER_ID_DECODER
+
+
+## Per config file, per (arch, lang) sorted list of (version key, version,
+## compiler id) for all the listed compilers.
+VERSION_INDEXES = {}
+
+
+def get_version_index(parsed_conf: PropertiesFile, arch: str):
+    decoder = get_compiler_id_decoder(arch)
+    if parsed_conf.path in VERSION_INDEXES:
+        version_index, arches = VERSION_INDEXES[parsed_conf.path]
+        if arches == decoder.arches:
+            return version_index
+
+    version_index = defaultdict(list)
+    for compiler_id in parsed_conf.listed_compilers:
+        add_to_version_index(version_index, parsed_conf, decoder, compiler_id)
+    for versions in version_index.values():
+        versions.sort()
+
+    VERSION_INDEXES[parsed_conf.path] = (version_index, set(decoder.arches))
+    return version_index
+
+
+## Version of a compiler ID from its semver prop (e.g. 3.4.6 for an ID ending
+## with 346, which the digits alone would give as 34.6). The version digits of
+## the ID are only decoded when there is no numeric semver.
+def id_version(compiler_id: str, digits: str, semver_props):
+    m = re.match(r"\d+(\.\d+)*", semver_props.get(compiler_id, ""))
+    if m:
+        return m.group(0)
+    return decode_version_digits(digits)
+
+
+def add_to_version_index(version_index, parsed_conf, decoder, compiler_id: str):
+    for arch, lang, digits in decoder.decode(compiler_id):
+        version = id_version(compiler_id, digits, parsed_conf.compilers_semver_prop)
+        bisect.insort(
+            version_index[(arch, lang)], (version_key(version), version, compiler_id)
+        )
+
+
+def register_new_compiler(parsed_conf: PropertiesFile, arch: str, compiler_id: str):
+    if parsed_conf.path in VERSION_INDEXES:
+        version_index, _ = VERSION_INDEXES[parsed_conf.path]
+        add_to_version_index(
+            version_index, parsed_conf, get_compiler_id_decoder(arch), compiler_id
+        )
+
+
 def Do(args, lang):
     new_compiler_id = CompilerId(args.arch, args.version, lang)
 
     try:
-        Wrapped_Do(args, lang)
+        with timed("lang", lang=lang, target=f"{args.arch} {args.version}"):
+            Wrapped_Do(args, lang)
         if API_TESTS_OUTPUT:
-            create_test(args.arch, lang, new_compiler_id)
+            create_test(
+                args.arch, lang, new_compiler_id, previous=previous_of(new_compiler_id)
+            )
 
     except ManualFixupNeeded as e:
         if API_TESTS_OUTPUT:
-            create_test(args.arch, lang, new_compiler_id)
+            create_test(
+                args.arch, lang, new_compiler_id, previous=previous_of(new_compiler_id)
+            )
         raise e
     except AlreadyDefined as e:
         if API_TESTS_OUTPUT:
-            create_test(args.arch, lang, new_compiler_id)
+            create_test(
+                args.arch, lang, new_compiler_id, previous=previous_of(new_compiler_id)
+            )
         raise e
 
 
+def previous_of(compiler_id: str):
+    return NEW_COMPILERS.get(compiler_id, {}).get("previous")
+
+
 ## Used for creating fake tests at the end.
 NEW_COMPILERS = {}
 
 
-def Wrapped_Do(args, lang: str):
-    fixups = defaultdict(list)
-
+def conf_path(args, lang: str):
     if args.config:
-        conf = args.config
-    else:
-        conf = join(
-            args.config_dir, "{lang}.amazon.properties".format(lang=FILEPREFIX[lang])
-        )
+        return args.config
+    return join(
+        args.config_dir, "{lang}.amazon.properties".format(lang=FILEPREFIX[lang])
+    )
+
+
+def Wrapped_Do(args, lang: str):
+    fixups = []
 
-    p = parse_file(conf)
-    parse_previous_version(args.version, args.arch, lang, args.guess_previous, p)
+    conf = conf_path(args, lang)
+    p = get_parsed_conf(conf)
+    parse_previous_version(args, lang, p)
 
     new_compiler_id = CompilerId(args.arch, args.version, lang)
 
@@ -519,21 +1463,23 @@ def Wrapped_Do(args, lang: str):
             args.arch, get_previous_version(args.arch, lang), lang
         )
 
+    if previous_compiler_id in p.listed_compilers:
+        NEW_COMPILERS[new_compiler_id]["previous"] = previous_compiler_id
+
     print(new_compiler_id)
 
-    if new_compiler_id in p["listed_compilers"]:
+    if new_compiler_id in p.listed_compilers:
         msg = "{compiler} is already in {conf} at line {line}".format(
             compiler=new_compiler_id,
             conf=conf,
-            line=p["listed_compilers"][new_compiler_id].number,
+            line=p.listed_compilers[new_compiler_id].number,
         )
 
         raise AlreadyDefined(msg)
     else:
         print("{compiler} not in {conf}".format(compiler=new_compiler_id, conf=conf))
-        # findCompiler (args.arch, lang, args.version, '/opt/compiler-explorer')
 
-        if previous_compiler_id not in p["listed_compilers"]:
+        if previous_compiler_id not in p.listed_compilers:
             msg = "Could not find previous compiler version {version}".format(
                 version=get_previous_version(args.arch, lang)
             )
@@ -544,7 +1490,7 @@ def Wrapped_Do(args, lang: str):
                 print(msg)
 
             config_fixup = generateConfig(
-                args.arch, lang, args.version, "/opt/compiler-explorer", None
+                args.arch, lang, args.version, args.install_root, None
             )
             todo_msg = f"\nPlease add the following in {conf}:\n8<---8<--- BEGIN ---8<---8<---\n{config_fixup}\n8<---8<--- END ---8<---8<---\n"
 
@@ -556,12 +1502,12 @@ def Wrapped_Do(args, lang: str):
 
             raise ManualFixupNeeded()
         else:
-            previous_listed_line = p["listed_compilers"][previous_compiler_id]
+            previous_listed_line = p.listed_compilers[previous_compiler_id]
             if not previous_listed_line:
                 msg = f"Error, can't find where previous compiler {previous_compiler_id} is listed"
                 raise Woops(msg)
 
-            fixups[previous_listed_line.number].append(
+            fixups.append(
                 Fixup(
                     previous_listed_line.number,
                     f"{new_compiler_id}",
@@ -569,59 +1515,109 @@ def Wrapped_Do(args, lang: str):
                 )
             )
 
-            last_line = p["last_compilers_prop"][previous_compiler_id].number
+            last_line = p.last_compilers_prop[previous_compiler_id].number
             print(
                 "Last prop set for previous {version} at line {line}".format(
                     version=get_previous_version(args.arch, lang), line=last_line
                 )
             )
 
-            if previous_compiler_id in p["compilers_name_prop"]:
+            if previous_compiler_id in p.compilers_name_prop:
                 ## replace previous version by new version, and try to handle case of version M.m.p with name omiting .p
-                name = p["compilers_name_prop"][previous_compiler_id]
+                name = p.compilers_name_prop[previous_compiler_id]
                 name = name.replace(get_previous_version(args.arch, lang), args.version)
                 name = name.replace(
                     get_previous_version(args.arch, lang)[0:-2], args.version[0:-2]
                 )
             else:
                 name = None
-            fixups[last_line].append(
+            fixups.append(
                 Fixup(
                     last_line,
                     generateConfig(
-                        args.arch, lang, args.version, "/opt/compiler-explorer", name
+                        args.arch, lang, args.version, args.install_root, name
                     ),
                     FixupAction.ADD_NEW_LINE_AFTER,
                 )
             )
 
-    output = io.StringIO()
-    with open(conf) as f:
-        for line_number, text in enumerate(f, start=1):
-            if line_number in fixups:
-                for fixup in fixups[line_number]:
-                    match fixup.action:
-                        case FixupAction.REPLACE:
-                            print(fixup.text, file=output, end="")
-                        case FixupAction.ADD_NEW_LINE_AFTER:
-                            print(text, file=output, end="")
-                            print(fixup.text, file=output, end="")
-                        case FixupAction.APPEND_TO_LINE:
-                            print(text.strip() + fixup.text, file=output)
-                        case FixupAction.ADD_SORTED:
-                            new_line = add_sorted(text.strip(), fixup.text)
-                            print(new_line, file=output)
+            ## Record the new compiler as if it was already in the file, so
+            ## that other targets handled in the same run can see it.
+            p.listed_compilers[new_compiler_id] = previous_listed_line
+            p.last_compilers_prop[new_compiler_id] = p.last_compilers_prop[
+                previous_compiler_id
+            ]
+            if name is not None:
+                p.compilers_name_prop[new_compiler_id] = name
+            p.compilers_semver_prop[new_compiler_id] = args.version
+            register_new_compiler(p, args.arch, new_compiler_id)
+
+    for fixup in fixups:
+        p.add_fixup(fixup)
+
+
+## Parsed config files, shared by all the languages/targets handled in one run.
+## Fixups are attached to them and they are only written once at the end of the
+## run, see write_fixups().
+PARSED_CONFS = {}
+
+
+def get_parsed_conf(conf: str):
+    if conf not in PARSED_CONFS:
+        PARSED_CONFS[conf] = parse_file(conf)
+    return PARSED_CONFS[conf]
+
+
+def journal_path(args):
+    if args.journal:
+        return args.journal
+    if args.config:
+        return join(dirname(abspath(args.config)), ".check_and_update_conf.journal")
+    return join(args.config_dir or ".", ".check_and_update_conf.journal")
+
+
+## All the changed files are written in a single transaction: either all of
+## them are updated, or none.
+def write_fixups(args):
+    transaction = WriteTransaction(journal_path(args))
+    written = []
+    diff_output = sys.stdout
+    if args.dry_run and args.patch:
+        diff_output = open(args.patch, "w")
+    try:
+        for conf, p in PARSED_CONFS.items():
+            if not p.fixups:
+                continue
+
+            ## A dry run without an output shows the changes of the file itself.
+            if args.inplace or (args.dry_run and not args.output):
+                output_path = conf
+            elif not args.output:
+                raise Woops(f"{conf} needs changes, use --inplace or --output")
+            elif isdir(args.output):
+                output_path = join(args.output, basename(conf))
             else:
-                print(text, file=output, end="")
-        # output.close()
+                output_path = args.output
 
-    if args.inplace:
-        output_path = conf
-    else:
-        output_path = args.output
+            with timed("write", file=basename(conf)):
+                if args.dry_run:
+                    diff_output.writelines(p.diff(output_path))
+                else:
+                    stamp = p.stamp if output_path == conf else None
+                    transaction.add(output_path, p.serialize, stamp)
+            written.append(p)
+
+        with timed("commit"):
+            transaction.commit()
+    except BaseException:
+        transaction.rollback()
+        raise
+    finally:
+        if diff_output is not sys.stdout:
+            diff_output.close()
 
-    with open(output_path, "w") as f:
-        f.write(output.getvalue())
+    for p in written:
+        p.fixups.clear()
 
 
 def get_previous_version(lang, arch):
@@ -634,37 +1630,29 @@ def get_previous_version(lang, arch):
 
 
 def test_prev(version, arch, lang, parsed_conf):
-    version = version.split(".")
+    try:
+        key = version_key(version)
+    except ValueError:
+        print(f"Can't guess previous compiler for non numeric version {version}")
+        return None
 
-    for major in reversed(range(5, int(version[0]) + 1)):
-        for minor in reversed(range(1, 10)):
+    versions = get_version_index(parsed_conf, arch)[(arch, lang)]
+    pos = bisect.bisect_left(versions, (key,))
+    if pos == 0:
+        print(f"Did not find any previous compiler for {arch} {lang}")
+        return None
 
-            test_cid = CompilerId(arch, f"{major}.{minor}", lang)
-            ## print(f"Testing {major}.{minor}: {test_cid}")
-            if test_cid in parsed_conf["listed_compilers"]:
-                conf_found = parsed_conf["listed_compilers"][test_cid]
-                print(
-                    f"FOUND {test_cid} in line '{conf_found.text}' at line {conf_found.number}"
-                )
-                return (f"{arch};{lang}".upper(), f"{major}.{minor}")
-
-            for patch in reversed(range(0, 10)):
-                test_cid = CompilerId(arch, f"{major}.{minor}.{patch}", lang)
-                ## print(f"Testing {major}.{minor}.{patch}: {test_cid}")
-                if test_cid in parsed_conf["listed_compilers"]:
-                    conf_found = parsed_conf["listed_compilers"][test_cid]
-                    print(
-                        f"FOUND {test_cid} in line '{conf_found.text}' at line {conf_found.number}"
-                    )
-                    return (f"{arch};{lang}".upper(), f"{major}.{minor}.{patch}")
-    print(f"Did not find any previous compiler for {arch} {lang}")
-    return None
+    _, previous_version, test_cid = versions[pos - 1]
+    conf_found = parsed_conf.listed_compilers[test_cid]
+    print(f"FOUND {test_cid} in line '{conf_found.text}' at line {conf_found.number}")
+    return (f"{arch};{lang}".upper(), previous_version)
 
 
-def parse_previous_version(version, arch, lang, guess_previous, parsed_conf):
+def parse_previous_version(args, lang, parsed_conf):
 
-    if guess_previous:
-        guessed = test_prev(version, arch, lang, parsed_conf)
+    if args.guess_previous:
+        with timed("test_prev", lang=lang):
+            guessed = test_prev(args.version, args.arch, lang, parsed_conf)
         if guessed:
             PREVIOUS_VERSIONS[guessed[0]] = guessed[1]
 
@@ -677,6 +1665,9 @@ def parse_previous_version(version, arch, lang, guess_previous, parsed_conf):
                 PREVIOUS_VERSIONS[pv_s[0].upper()] = pv_s[1]
 
 
+CTNG_MATRIX = CtngMatrix()
+
+
 def check_lang_enabled_in_ctng(args, lang):
 
     ## You can't disable C \_o<
@@ -684,92 +1675,176 @@ def check_lang_enabled_in_ctng(args, lang):
     if lang == "C" or lang == "GIMPLE":
         return True
 
-    ct_ng_config = join("build", "latest", f"{args.arch}-{args.version}.config")
+    ct_ng_config = join(CTNG_MATRIX.config_dir, f"{args.arch}-{args.version}.config")
 
     ct_lang = CT_LANGS[lang]
     print(f"check for CT_CC_LANG_{ct_lang} in {ct_ng_config}")
 
-    with open(ct_ng_config) as ctng_conf:
-        for line in ctng_conf:
-            if re.match(f"^CT_CC_LANG_{ct_lang}=y", line):
-                return True
-    return False
+    return ct_lang in CTNG_MATRIX.langs(args.arch, args.version)
+
+
+def load_batch_targets(path: str):
+    targets = []
+    with open(path) as f:
+        for line_number, text in enumerate(f, start=1):
+            text = text.split("#", 1)[0].strip()
+            if not text:
+                continue
+            fields = text.split()
+            if len(fields) not in (2, 3):
+                raise Woops(
+                    f"Invalid target at {path}:{line_number}, expecting 'ARCH VERSION [PREVVERSION]': {text}"
+                )
+            target = (fields[0], fields[1], fields[2] if len(fields) == 3 else None)
+            if target not in targets:
+                targets.append(target)
+    return targets
+
+
+def batch_target_args(args, arch: str, version: str, previous: str):
+    target_args = copy.copy(args)
+    target_args.arch = arch
+    target_args.version = version
+    if previous:
+        target_args.previous_version = list(args.previous_version or []) + [
+            f"{arch};{lang}:{previous}" for lang in LANGS
+        ]
+    return target_args
+
+
+def forget_previous_versions(arch: str):
+    ## Don't let a previous version guessed for another target of the same
+    ## arch leak into the next one.
+    for lang in LANGS:
+        PREVIOUS_VERSIONS.pop(f"{arch};{lang}".upper(), None)
+
+
+def handle_target(args):
+    for lang in LANGS:
+        if check_lang_enabled_in_ctng(args, lang):
+            try:
+                Do(args, lang)
+                if args.summary:
+                    with open(args.summary, "a") as f:
+                        f.write(f"OK: {args.arch} {args.version} {lang}\n")
+
+            except ManualFixupNeeded:
+                msg = f"MANUAL FIXUP NEEDED: {args.arch} {args.version} {lang}"
+                if args.summary:
+                    with open(args.summary, "a") as f:
+                        f.write(f"{msg}\n")
+                else:
+                    print(msg)
+
+            except AlreadyDefined:
+                msg = f"ALREADY EXISTS: {args.arch} {args.version} {lang}"
+                if args.summary:
+                    with open(args.summary, "a") as f:
+                        f.write(f"{msg}\n")
+                else:
+                    print(msg)
+
+            except Woops as err:
+                if args.summary:
+                    with open(args.summary, "a") as f:
+                        f.write(f"NOT OK (ERROR): {args.arch} {args.version} {lang}\n")
+                        f.write(str(err))
+                        f.write("\n")
+
+                else:
+                    raise err
 
 
 if __name__ == "__main__":
     args = parser.parse_args()
 
-    if args.create_api_tests:
-        results_exists = exists(args.create_api_tests)
+    if args.timings:
+        TIMINGS = Timings()
+
+    recover_journal(journal_path(args), args.dry_run)
+
+    if args.profile:
+        import cProfile
+        import pstats
 
-        API_TESTS_OUTPUT = open(args.create_api_tests, "a")
+        profiler = cProfile.Profile()
+        profiler.enable()
 
-        if not results_exists:
-            API_TESTS_OUTPUT.write("#!/bin/bash\n")
-            API_TESTS_OUTPUT.write("set -euo pipefail\n")
-            API_TESTS_OUTPUT.write("line='----------------------------------------'\n")
-            API_TESTS_OUTPUT.write(f"CEHOST='{args.api_test_host}'\n")
+    if args.parse_cache:
+        PARSE_CACHE = ParseCache(args.parse_cache, args.parse_cache_max_size)
+
+    if args.install_index:
+        TOOLCHAIN_INDEX.load(args.install_index)
+
+    CTNG_MATRIX = CtngMatrix(
+        config_dir=args.ctng_config_dir, cache_path=args.ctng_matrix_cache
+    )
+
+    if args.create_api_tests:
+        API_TESTS_FORMAT = args.api_tests_format
+        API_TESTS_OUTPUT = open_api_tests(
+            args.create_api_tests, API_TESTS_FORMAT, args.api_test_host
+        )
 
-    if args.lang:
-        Do(args, args.lang)
+    if args.batch:
+        targets = [
+            batch_target_args(args, *target)
+            for target in load_batch_targets(args.batch)
+        ]
+    elif args.arch and args.version:
+        targets = [args]
     else:
-        for lang in LANGS:
-            if check_lang_enabled_in_ctng(args, lang):
-                try:
-                    Do(args, lang)
-                    if args.summary:
-                        with open(args.summary, "a") as f:
-                            f.write(f"OK: {args.arch} {args.version} {lang}\n")
-
-                except ManualFixupNeeded:
-                    msg = f"MANUAL FIXUP NEEDED: {args.arch} {args.version} {lang}"
-                    if args.summary:
-                        with open(args.summary, "a") as f:
-                            f.write(f"{msg}\n")
-                    else:
-                        print(msg)
-
-                except AlreadyDefined:
-                    msg = f"ALREADY EXISTS: {args.arch} {args.version} {lang}"
-                    if args.summary:
-                        with open(args.summary, "a") as f:
-                            f.write(f"{msg}\n")
-                    else:
-                        print(msg)
-
-                except Woops as err:
-                    if args.summary:
-                        with open(args.summary, "a") as f:
-                            f.write(
-                                f"NOT OK (ERROR): {args.arch} {args.version} {lang}\n"
-                            )
-                            f.write(str(err))
-                            f.write("\n")
-
-                    else:
-                        raise err
-
-        ## Create some fake test that checks the test harness can fail. All
-        ## tests created here are supposed to FAIL.
-        if args.create_api_tests:
+        parser.error("either -a/--arch and --version, or --batch are required")
+
+    COMPILER_PROBER = CompilerProber(args.probe_jobs, args.probe_timeout)
+    with timed("prefetch_compiler_probes"):
+        prefetch_compiler_probes(targets, [args.lang] if args.lang else LANGS)
+
+    for target_args in targets:
+        forget_previous_versions(target_args.arch)
+        with timed("target", target=f"{target_args.arch} {target_args.version}"):
+            if args.lang:
+                Do(target_args, args.lang)
+            else:
+                handle_target(target_args)
+
+    ## Create some fake test that checks the test harness can fail. All
+    ## tests created here are supposed to FAIL.
+    if not args.lang and args.create_api_tests and NEW_COMPILERS:
+        if API_TESTS_FORMAT == "bash":
             API_TESTS_OUTPUT.write("## Fake tests, they should all FAIL.\n")
             API_TESTS_OUTPUT.write(
                 "echo -e '\\n\\n#### Fake tests, they should FAIL or be SKIPPED, but never PASS\\n' >> test.result\n"
             )
-            first_cid = list(NEW_COMPILERS.keys())[0]
-            compiler = NEW_COMPILERS[first_cid]
-            lang = None
-
-            for l in LANGS:
-                if l != compiler["lang"] and not (
-                    l in ["C", "CXX"] and compiler["lang"] in ["C", "Cxx"]
-                ):
-                    lang = l
-                    break
-
-            ## Mismatching lang input
-            create_test(compiler["arch"], lang, first_cid)
+        first_cid = list(NEW_COMPILERS.keys())[0]
+        compiler = NEW_COMPILERS[first_cid]
+        lang = None
+
+        for l in LANGS:
+            if l != compiler["lang"] and not (
+                l in ["C", "CXX"] and compiler["lang"] in ["C", "Cxx"]
+            ):
+                lang = l
+                break
+
+        ## Mismatching lang input
+        create_test(compiler["arch"], lang, first_cid, fake=True)
+        if API_TESTS_FORMAT == "bash":
             API_TESTS_OUTPUT.write("## End of fake tests.\n")
             API_TESTS_OUTPUT.write(
                 "echo -e '#### End of fake tests\\n' >> test.result\n"
             )
+
+    write_fixups(args)
+    if args.install_index:
+        TOOLCHAIN_INDEX.save(args.install_index)
+    CTNG_MATRIX.save()
+
+    if args.profile:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+    if args.timings:
+        TIMINGS.write(args.timings)
+        TIMINGS.summary()
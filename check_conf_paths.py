@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import json
+import os
+import re
+import stat
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from os.path import basename, isabs, isdir, join
+
+import check_and_update_conf as conf
+
+## Checks that the executables referenced by the config files
+## (compiler.<id>.exe, and the objdumper and demangler of the compilers, of the
+## groups or of the whole file) exist and are executable. Each path is checked
+## once however many entries use it, with the checks running concurrently.
+##
+## With --probe, each executable is also run with --version, and the output
+## of the compilers is checked against their semver. The probes are cached in
+## --cache, keyed on the (inode, size, mtime) of the executable, so that only
+## new or changed executables (or the ones that failed) are run again.
+
+CHECKED_PROPS = ("exe", "objdumper", "demangler")
+CACHE_FORMAT = 1
+
+
+## Maps each referenced path to the entries using it.
+def collect_references(files):
+    references = defaultdict(list)
+    for path in files:
+        p = conf.PropertiesFile.parse(path)
+        for key, line in p.props.items():
+            kind, _, rest = key.partition(".")
+            name, _, prop = rest.rpartition(".")
+            if key in CHECKED_PROPS:
+                prop = key
+            elif kind not in ("compiler", "group") or prop not in CHECKED_PROPS:
+                continue
+            value = line.text.partition("=")[2].strip()
+            if not value:
+                continue
+            semver = None
+            if kind == "compiler" and prop == "exe":
+                semver = p.compilers_semver_prop.get(name)
+            references[value].append(
+                {
+                    "file": basename(path),
+                    "line": line.number,
+                    "key": key,
+                    "semver": semver,
+                }
+            )
+    return references
+
+
+## Returns (status, detail, stamp), the stamp identifying the file for the
+## probe cache.
+def check_path(path: str):
+    if not isabs(path):
+        return "relative", "not an absolute path", None
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return "missing", "no such file", None
+    except OSError as e:
+        return "error", e.strerror, None
+    if not stat.S_ISREG(st.st_mode):
+        return "not-a-file", "not a regular file", None
+    if not os.access(path, os.X_OK):
+        return "not-executable", f"mode {stat.filemode(st.st_mode)}", None
+    return "ok", "", [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+class ProbeCache:
+    def __init__(self, path):
+        self.path = path
+        self.probes = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            with open(path) as f:
+                cache = json.load(f)
+            if cache.get("format") == CACHE_FORMAT:
+                self.probes = cache["probes"]
+
+    def get(self, path: str, stamp):
+        entry = self.probes.get(path)
+        if entry and entry["stamp"] == stamp:
+            return entry
+        return None
+
+    def put(self, path: str, entry):
+        self.probes[path] = entry
+        self.dirty = True
+
+    def save(self, paths):
+        ## Forget the executables no longer referenced.
+        for path in set(self.probes) - set(paths):
+            del self.probes[path]
+            self.dirty = True
+        if not self.path or not self.dirty:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"format": CACHE_FORMAT, "probes": self.probes}, f, indent=1)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def probe(prober, path: str, stamp):
+    try:
+        lines = prober.probe(path).result()
+    except (conf.Woops, UnicodeDecodeError) as e:
+        return {"stamp": stamp, "error": str(e)}
+    return {"stamp": stamp, "output": lines}
+
+
+## The semver of a compiler is expected in its --version output. Non numeric
+## semvers (e.g. trunk or snapshots) aren't checked.
+def version_mismatches(refs, output):
+    mismatches = []
+    for ref in refs:
+        semver = ref["semver"]
+        if not semver or not semver[0].isdigit():
+            continue
+        ## Not part of a longer version: 2.0 isn't found in 12.2.0.
+        pattern = re.compile(rf"(?<![\d.]){re.escape(semver)}(?![\d])")
+        if not any(pattern.search(l) for l in output):
+            mismatches.append(f"{ref['key']} expects {semver}")
+    return mismatches
+
+
+def validate(args, references):
+    paths = sorted(references)
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        checks = list(pool.map(check_path, paths))
+
+    results = {}
+    to_probe = []
+    cache = ProbeCache(args.cache)
+    for path, (status, detail, stamp) in zip(paths, checks):
+        results[path] = {"path": path, "status": status, "detail": detail}
+        if status == "ok" and args.probe:
+            cached = cache.get(path, stamp)
+            if cached:
+                results[path]["probe"] = cached
+            else:
+                to_probe.append((path, stamp))
+
+    prober = conf.CompilerProber(args.probe_jobs, args.probe_timeout)
+    for path, stamp in to_probe:
+        prober.probe(path)
+    for path, stamp in to_probe:
+        results[path]["probe"] = probe(prober, path, stamp)
+        results[path]["probed"] = True
+        ## Failures (e.g. timeouts of a busy node) are tried again next time.
+        if "error" not in results[path]["probe"]:
+            cache.put(path, results[path]["probe"])
+    cache.save(paths)
+
+    for path, result in results.items():
+        result["refs"] = references[path]
+        entry = result.pop("probe", None)
+        if entry is None:
+            continue
+        if "error" in entry:
+            result["status"] = "probe-failed"
+            result["detail"] = entry["error"]
+            continue
+        result["version"] = entry["output"][0] if entry["output"] else ""
+        mismatches = version_mismatches(references[path], entry["output"])
+        if mismatches:
+            result["status"] = "version-mismatch"
+            result["detail"] = f"{', '.join(mismatches)}, got '{result['version']}'"
+    return [results[path] for path in paths]
+
+
+def properties_files(config_dir: str, pattern: str):
+    return sorted(
+        join(config_dir, name)
+        for name in os.listdir(config_dir)
+        if fnmatch(name, pattern)
+    )
+
+
+parser = argparse.ArgumentParser(
+    description="Check the executables referenced by the config files."
+)
+parser.add_argument(
+    "files",
+    nargs="*",
+    metavar="PROPERTIES",
+    help="config files to check (default: the ones matching --pattern in --config-dir)",
+)
+parser.add_argument("--config-dir", required=False, metavar="CONFIGDIR")
+parser.add_argument(
+    "--pattern",
+    default="*.amazon.properties",
+    metavar="GLOB",
+    help="config files checked in --config-dir",
+)
+parser.add_argument(
+    "-j",
+    "--jobs",
+    default=32,
+    type=int,
+    metavar="JOBS",
+    help="number of paths checked concurrently",
+)
+parser.add_argument(
+    "--probe",
+    action="store_true",
+    help="also run the executables with --version and check the compilers semver",
+)
+parser.add_argument(
+    "--probe-jobs",
+    default=8,
+    type=int,
+    metavar="JOBS",
+    help="number of executables probed with --version concurrently",
+)
+parser.add_argument(
+    "--probe-timeout",
+    default=10,
+    type=float,
+    metavar="SECONDS",
+    help="time allowed for an executable to answer --version",
+)
+parser.add_argument(
+    "--cache",
+    required=False,
+    metavar="CACHE_PATH",
+    help="keep the --version probes in CACHE_PATH and reuse them while the executables are unchanged",
+)
+parser.add_argument(
+    "--json",
+    required=False,
+    metavar="REPORT_PATH",
+    help="write the report as JSON in REPORT_PATH ('-' for stdout)",
+)
+parser.add_argument(
+    "--all", action="store_true", help="also list the paths that are fine"
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    files = list(args.files)
+    if args.config_dir:
+        if not isdir(args.config_dir):
+            parser.error(f"{args.config_dir} is not a directory")
+        files += properties_files(args.config_dir, args.pattern)
+    if not files:
+        parser.error("either --config-dir or some config files are required")
+
+    start = time.monotonic()
+    references = collect_references(files)
+    results = validate(args, references)
+
+    summary = defaultdict(int)
+    for result in results:
+        summary[result["status"]] += 1
+    report = {
+        "files": files,
+        "paths": len(results),
+        "entries": sum(len(refs) for refs in references.values()),
+        "probed": sum(1 for r in results if r.get("probed")),
+        "summary": dict(sorted(summary.items())),
+        "seconds": round(time.monotonic() - start, 3),
+        "results": [r for r in results if args.all or r["status"] != "ok"],
+    }
+
+    if args.json == "-":
+        print(json.dumps(report, indent=1))
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.json != "-":
+        for result in report["results"]:
+            print(f"{result['status']:16} {result['path']}  {result['detail']}")
+            for ref in result["refs"]:
+                print(f"{'':16}   {ref['file']}:{ref['line']} {ref['key']}")
+        counts = ", ".join(f"{n} {status}" for status, n in report["summary"].items())
+        print(
+            f"{report['paths']} paths used by {report['entries']} entries in"
+            f" {len(files)} files ({report['probed']} probed): {counts}"
+            f" in {report['seconds']:.1f}s"
+        )
+
+    sys.exit(1 if set(summary) - {"ok"} else 0)
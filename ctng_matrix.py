@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import fnmatch
+import json
+import os
+import re
+import sys
+from os.path import abspath, dirname, join, exists
+
+## Matrix of the ct-ng configs in build/latest: arch x version x the few CT_*
+## symbols we care about (enabled languages, package versions and sources,
+## target tuple components).
+
+## ARCH-VERSION of a target, the version may have a -N revision suffix (e.g.
+## sparc-leon-12.2.0-1).
+TARGET_RE = r"(?P<arch>[a-z][a-z0-9_]*(-[a-z][a-z0-9_]*)*)-(?P<version>\d+(\.\d+)*(-\d+)?|trunk)"
+CONFIG_RE = re.compile(TARGET_RE + r"\.config$")
+
+SYMBOL_RE = re.compile(r"(CT_\w+)=(.*)")
+
+SELECTED_SYMBOL_RE = re.compile(
+    r"CT_("
+    r"CC_LANG_\w+"
+    r"|(?!CONFIG_)\w+_VERSION"
+    r"|\w+_SRC_(RELEASE|DEVEL|CUSTOM)"
+    r"|\w+_DEVEL_(VCS|URL|BRANCH|REVISION)"
+    r"|\w+_MIRRORS|\w+_ARCHIVE_(FILENAME|DIRNAME|FORMATS)|\w+_PKG_NAME|\w+_DIR_NAME"
+    r"|COMP_LIBS_\w+|\w+_NEEDED"
+    r"|ARCH|ARCH_ARCH|ARCH_BITNESS|ARCH_SUFFIX|ARCH_\w+_ENDIAN"
+    r"|TARGET_VENDOR|TARGET_ALIAS|KERNEL|LIBC"
+    r")"
+)
+
+CT_LANG_PREFIX = "CT_CC_LANG_"
+
+## Next to this script, so that the scripts can be run from anywhere.
+DEFAULT_CONFIG_DIR = join(dirname(abspath(__file__)), "build", "latest")
+
+
+def version_key(version: str):
+    ## trunk is always the most recent
+    if version == "trunk":
+        return (float("inf"),)
+    return tuple(int(v) for v in re.split(r"[.-]", version))
+
+
+## (arch, version) of an ARCH-VERSION target name.
+def split_target(name: str):
+    m = re.fullmatch(TARGET_RE, name)
+    if not m:
+        raise ValueError(f"{name} is not an ARCH-VERSION target")
+    return m.group("arch"), m.group("version")
+
+
+def list_configs(config_dir: str = DEFAULT_CONFIG_DIR):
+    configs = []
+    for name in os.listdir(config_dir):
+        m = CONFIG_RE.match(name)
+        if m:
+            configs.append((m.group("arch"), m.group("version")))
+        elif name.endswith(".config"):
+            print(f"Ignoring {name}, not named ARCH-VERSION.config", file=sys.stderr)
+    return configs
+
+
+def select_configs(config_dir: str, patterns):
+    configs = sorted(list_configs(config_dir), key=lambda t: (t[0], version_key(t[1])))
+    selected = []
+    for pattern in patterns:
+        matches = [
+            (arch, version)
+            for arch, version in configs
+            if fnmatch.fnmatchcase(f"{arch}-{version}", pattern)
+        ]
+        if not matches:
+            raise ValueError(f"No config in {config_dir} matches {pattern}")
+        selected += [m for m in matches if m not in selected]
+    return selected
+
+
+def parse_config(path: str):
+    symbols = {}
+    with open(path) as f:
+        for line in f:
+            if not line.startswith("CT_"):
+                continue
+            m = SYMBOL_RE.match(line)
+            if m and SELECTED_SYMBOL_RE.fullmatch(m.group(1)):
+                symbols[m.group(1)] = m.group(2).strip().strip('"')
+    return symbols
+
+
+class CtngMatrix:
+    ## Bump when SELECTED_SYMBOL_RE changes.
+    FORMAT = 2
+
+    def __init__(self, config_dir: str = DEFAULT_CONFIG_DIR, cache_path=None):
+        self.config_dir = config_dir
+        self.cache_path = cache_path
+        self.entries = {}
+        self.dirty = False
+
+        if cache_path and exists(cache_path):
+            with open(cache_path) as f:
+                cache = json.load(f)
+            if cache.get("format") == self.FORMAT and cache.get(
+                "config_dir"
+            ) == os.path.abspath(config_dir):
+                self.entries = cache["entries"]
+
+    def save(self):
+        if not self.cache_path or not self.dirty:
+            return
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "format": self.FORMAT,
+                    "config_dir": os.path.abspath(self.config_dir),
+                    "entries": self.entries,
+                },
+                f,
+                separators=(",", ":"),
+            )
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
+
+    def config(self, arch: str, version: str):
+        name = f"{arch}-{version}.config"
+        st = os.stat(join(self.config_dir, name))
+
+        entry = self.entries.get(name)
+        if (
+            entry is None
+            or entry["mtime"] != st.st_mtime_ns
+            or entry["size"] != st.st_size
+        ):
+            entry = {
+                "arch": arch,
+                "version": version,
+                "mtime": st.st_mtime_ns,
+                "size": st.st_size,
+                "symbols": parse_config(join(self.config_dir, name)),
+            }
+            self.entries[name] = entry
+            self.dirty = True
+        return entry["symbols"]
+
+    def load_all(self):
+        names = set()
+        for arch, version in list_configs(self.config_dir):
+            names.add(f"{arch}-{version}.config")
+            self.config(arch, version)
+
+        for name in set(self.entries) - names:
+            del self.entries[name]
+            self.dirty = True
+        return self
+
+    def arches(self):
+        return sorted({e["arch"] for e in self.entries.values()})
+
+    def targets(self):
+        return sorted(
+            ((e["arch"], e["version"]) for e in self.entries.values()),
+            key=lambda t: (t[0], version_key(t[1])),
+        )
+
+    def langs(self, arch: str, version: str):
+        return {
+            symbol[len(CT_LANG_PREFIX) :]
+            for symbol, value in self.config(arch, version).items()
+            if symbol.startswith(CT_LANG_PREFIX) and value == "y"
+        }
+
+    def where(self, symbol: str, value=None):
+        return [
+            (arch, version)
+            for arch, version in self.targets()
+            if symbol in self.config(arch, version)
+            and (value is None or self.config(arch, version)[symbol] == value)
+        ]
+
+
+parser = argparse.ArgumentParser(
+    description="Query the matrix of ct-ng configs (arch x version x CT_* symbols)."
+)
+parser.add_argument("--config-dir", default=DEFAULT_CONFIG_DIR, metavar="CONFIGDIR")
+parser.add_argument(
+    "--cache",
+    required=False,
+    metavar="CACHE_PATH",
+    help="keep the parsed matrix in CACHE_PATH, only changed configs are parsed again",
+)
+parser.add_argument("--json", action="store_true", help="output JSON")
+subparsers = parser.add_subparsers(dest="command", required=True)
+
+lang_parser = subparsers.add_parser("lang", help="targets enabling LANG (e.g. ADA)")
+lang_parser.add_argument("lang", metavar="LANG")
+
+versions_parser = subparsers.add_parser("versions", help="versions existing for ARCH")
+versions_parser.add_argument("arch", metavar="ARCH")
+
+arches_parser = subparsers.add_parser("arches", help="all the arches")
+
+where_parser = subparsers.add_parser(
+    "where", help="targets where SYMBOL is set (to VALUE if given)"
+)
+where_parser.add_argument("symbol", metavar="SYMBOL[=VALUE]")
+
+show_parser = subparsers.add_parser("show", help="selected symbols for a target")
+show_parser.add_argument("arch", metavar="ARCH")
+show_parser.add_argument("version", metavar="VERSION")
+
+
+def print_targets(args, targets):
+    if args.json:
+        print(json.dumps([{"arch": a, "version": v} for a, v in targets], indent=1))
+    else:
+        for arch, version in targets:
+            print(f"{arch} {version}")
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    matrix = CtngMatrix(args.config_dir, args.cache).load_all()
+
+    match args.command:
+        case "lang":
+            print_targets(args, matrix.where(f"{CT_LANG_PREFIX}{args.lang}", "y"))
+        case "versions":
+            versions = [v for a, v in matrix.targets() if a == args.arch]
+            if args.json:
+                print(json.dumps(versions, indent=1))
+            else:
+                print("\n".join(versions))
+        case "arches":
+            arches = matrix.arches()
+            if args.json:
+                print(json.dumps(arches, indent=1))
+            else:
+                print("\n".join(arches))
+        case "where":
+            symbol, _, value = args.symbol.partition("=")
+            if not symbol.startswith("CT_"):
+                symbol = f"CT_{symbol}"
+            print_targets(args, matrix.where(symbol, value if value else None))
+        case "show":
+            try:
+                symbols = matrix.config(args.arch, args.version)
+            except FileNotFoundError:
+                sys.exit(f"No config for {args.arch} {args.version}")
+            if args.json:
+                print(json.dumps(symbols, indent=1, sort_keys=True))
+            else:
+                for symbol, value in sorted(symbols.items()):
+                    print(f"{symbol}={value}")
+
+    matrix.save()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import hashlib
+import json
+import os
+import stat
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from os.path import abspath, exists, join
+
+## Hardlinks the identical files of installed compiler trees (e.g. sysroot
+## headers, locales or docs shared by the versions of an arch or by sibling
+## targets) to a single copy kept in a content-addressed store:
+## STORE/<sha256[:2]>/<sha256>-<mode>. The store must be on the same filesystem
+## as the trees. Only files with the same content, mode and owner are merged.
+##
+## The hashes are kept in an index keyed on (device, inode) and checked
+## against the size and mtime, so that a new run only hashes the files of new
+## or changed trees. Once linked, all the copies share the store's inode, which
+## is hashed only once.
+
+DEFAULT_ROOT = "/opt/compiler-explorer"
+INDEX_FORMAT = 1
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while data := f.read(1024 * 1024):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+class HashIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self.inodes = {}
+        self.seen = set()
+        if exists(path):
+            with open(path, encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("format") == INDEX_FORMAT:
+                self.inodes = index["inodes"]
+
+    def get(self, st: os.stat_result):
+        self.seen.add(f"{st.st_dev}:{st.st_ino}")
+        entry = self.inodes.get(f"{st.st_dev}:{st.st_ino}")
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def set(self, st: os.stat_result, sha256: str):
+        self.inodes[f"{st.st_dev}:{st.st_ino}"] = [st.st_size, st.st_mtime_ns, sha256]
+
+    ## Only keeps the inodes seen during this run.
+    def compact(self):
+        self.inodes = {k: v for k, v in self.inodes.items() if k in self.seen}
+
+    def save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": INDEX_FORMAT, "inodes": self.inodes}, f)
+        os.replace(tmp_path, self.path)
+
+
+## Regular files of a tree on the given device, at least min_size bytes.
+def scan_tree(top: str, device: int, min_size: int, skip: str):
+    files = []
+    for root, dirs, names in os.walk(top):
+        dirs[:] = [d for d in dirs if join(root, d) != skip]
+        for name in names:
+            path = join(root, name)
+            st = os.lstat(path)
+            if (
+                stat.S_ISREG(st.st_mode)
+                and st.st_dev == device
+                and st.st_size >= min_size
+            ):
+                files.append((path, st))
+    return files
+
+
+class Deduper:
+    def __init__(self, args):
+        self.store = abspath(args.store)
+        os.makedirs(self.store, exist_ok=True)
+        self.device = os.stat(self.store).st_dev
+        self.index = HashIndex(args.index or join(self.store, "index.json"))
+        self.jobs = args.jobs
+        self.min_size = args.min_size
+        self.stats = dict.fromkeys(
+            [
+                "files",
+                "hashed",
+                "hashed_bytes",
+                "linked",
+                "skipped",
+                "saved",
+                "stored",
+                "relinked",
+                "to_store",
+                "to_link",
+            ],
+            0,
+        )
+
+    def scan(self, roots):
+        ## One task per tree, the install roots having one directory per
+        ## compiler (or per arch).
+        tops = []
+        for root in roots:
+            with os.scandir(root) as it:
+                for entry in sorted(it, key=lambda e: e.name):
+                    if entry.is_dir(follow_symlinks=False) and entry.path != self.store:
+                        tops.append(entry.path)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            results = pool.map(
+                lambda top: scan_tree(top, self.device, self.min_size, self.store),
+                tops,
+            )
+            files = sorted(f for result in results for f in result)
+        self.stats["files"] = len(files)
+        return files
+
+    def hash(self, files):
+        todo = {}
+        hashes = {}
+        for path, st in files:
+            key = (st.st_dev, st.st_ino)
+            known = self.index.get(st)
+            if known:
+                hashes[key] = known
+            elif key not in todo:
+                todo[key] = (path, st)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for (key, (path, st)), sha256 in zip(
+                todo.items(), pool.map(file_sha256, [p for p, _ in todo.values()])
+            ):
+                hashes[key] = sha256
+                self.index.set(st, sha256)
+                self.stats["hashed"] += 1
+                self.stats["hashed_bytes"] += st.st_size
+        return hashes
+
+    def store_path(self, sha256: str, mode: int) -> str:
+        return join(self.store, sha256[:2], f"{sha256}-{stat.S_IMODE(mode):o}")
+
+    ## Returns (path, stat, store path) of the files to replace by a link to
+    ## the store, and counts what would be saved.
+    def plan(self, files, hashes):
+        paths_per_inode = defaultdict(list)
+        for path, st in files:
+            paths_per_inode[(st.st_dev, st.st_ino)].append((path, st))
+
+        ## store path: (device, inode, uid, gid) of its copy
+        canonical = {}
+        to_link = []
+        for key, paths in paths_per_inode.items():
+            st = paths[0][1]
+            target = self.store_path(hashes[key], st.st_mode)
+            if target not in canonical:
+                try:
+                    stored = os.stat(target)
+                    canonical[target] = (
+                        (stored.st_dev, stored.st_ino),
+                        stored.st_uid,
+                        stored.st_gid,
+                    )
+                except FileNotFoundError:
+                    ## First copy seen: it becomes the store's copy.
+                    canonical[target] = (key, st.st_uid, st.st_gid)
+                    to_link.append((paths[0][0], st, target, True))
+                    continue
+            inode, uid, gid = canonical[target]
+            if inode == key:
+                self.stats["linked"] += len(paths)
+                continue
+            if (uid, gid) != (st.st_uid, st.st_gid):
+                self.stats["skipped"] += len(paths)
+                continue
+            for path, st in paths:
+                to_link.append((path, st, target, False))
+            ## The inode is freed if all its links are replaced.
+            if st.st_nlink == len(paths):
+                self.stats["saved"] += st.st_size
+        return to_link
+
+    def link(self, to_link, dry_run: bool):
+        for path, st, target, first in to_link:
+            if dry_run:
+                self.stats["to_store" if first else "to_link"] += 1
+                continue
+            if first:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.link(path, target)
+                self.stats["stored"] += 1
+                continue
+            ## Replaced atomically, the file is never missing.
+            tmp_path = f"{path}.{os.getpid()}.dedupe"
+            os.link(target, tmp_path)
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+            self.stats["relinked"] += 1
+
+    ## Store entries no longer used by any tree.
+    def orphans(self):
+        found = []
+        for root, _, names in os.walk(self.store):
+            for name in names:
+                path = join(root, name)
+                if root != self.store and os.lstat(path).st_nlink == 1:
+                    found.append(path)
+        return found
+
+
+parser = argparse.ArgumentParser(
+    description="Hardlink identical files of installed compiler trees to a content-addressed store."
+)
+parser.add_argument(
+    "roots",
+    nargs="*",
+    metavar="ROOT",
+    help=f"install roots, each directory in them is a tree (default: {DEFAULT_ROOT})",
+)
+parser.add_argument(
+    "--store",
+    metavar="STORE_DIR",
+    help="content-addressed store, on the same filesystem (default: ROOT/.dedupe-store)",
+)
+parser.add_argument(
+    "--index",
+    metavar="INDEX_PATH",
+    help="persistent hash index (default: STORE_DIR/index.json)",
+)
+parser.add_argument("-j", "--jobs", default=os.cpu_count(), type=int, metavar="JOBS")
+parser.add_argument(
+    "--min-size",
+    default=1024,
+    type=int,
+    metavar="BYTES",
+    help="ignore smaller files (default: 1024)",
+)
+parser.add_argument(
+    "--dry-run", action="store_true", help="only report what would be saved"
+)
+parser.add_argument(
+    "--prune",
+    action="store_true",
+    help="remove the store entries no longer used by any tree, and the index"
+    " entries of the files not seen",
+)
+parser.add_argument("--json", action="store_true", help="output JSON")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    roots = [abspath(r) for r in args.roots or [DEFAULT_ROOT]]
+    args.store = args.store or join(roots[0], ".dedupe-store")
+
+    start = time.monotonic()
+    deduper = Deduper(args)
+    try:
+        files = deduper.scan(roots)
+        hashes = deduper.hash(files)
+        to_link = deduper.plan(files, hashes)
+        deduper.link(to_link, args.dry_run)
+    finally:
+        deduper.index.save()
+    orphans = deduper.orphans()
+    if args.prune and not args.dry_run:
+        for path in orphans:
+            os.unlink(path)
+        deduper.index.compact()
+        deduper.index.save()
+    stats = dict(deduper.stats, orphans=len(orphans), seconds=time.monotonic() - start)
+
+    if args.json:
+        print(json.dumps(stats, indent=1, sort_keys=True))
+    else:
+        mib = 1024 * 1024
+        print(
+            f"{stats['files']} files, {stats['hashed']} hashed"
+            f" ({stats['hashed_bytes'] / mib:.1f} MiB), {stats['linked']} already linked"
+        )
+        if args.dry_run:
+            print(
+                f"would store {stats['to_store']} and link {stats['to_link']} files,"
+                f" saving {stats['saved'] / mib:.1f} MiB"
+            )
+        else:
+            print(
+                f"stored {stats['stored']}, linked {stats['relinked']} files,"
+                f" saved {stats['saved'] / mib:.1f} MiB"
+            )
+        if stats["skipped"]:
+            print(f"{stats['skipped']} files skipped (different owner)")
+        if orphans:
+            print(
+                f"{len(orphans)} unused store entries"
+                + (" removed" if args.prune and not args.dry_run else " (--prune)")
+            )
+        print(f"done in {stats['seconds']:.1f}s")
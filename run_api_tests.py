@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import asyncio
+import json
+import ssl
+import statistics
+import sys
+import time
+from urllib.parse import urlsplit
+
+from check_and_update_conf import compile_request
+
+## Runs the API smoke tests listed in a manifest created by
+## `check_and_update_conf.py --create-api-tests` against a CE instance.
+
+parser = argparse.ArgumentParser(description="Run the CE API smoke tests.")
+parser.add_argument("manifest", metavar="TESTS_PATH")
+parser.add_argument(
+    "--host",
+    required=False,
+    metavar="TEST_HOST",
+    help="CE instance to test, defaults to the one recorded in the manifest",
+)
+parser.add_argument(
+    "-j",
+    "--jobs",
+    default=8,
+    type=int,
+    metavar="JOBS",
+    help="number of concurrent requests (and of pooled connections)",
+)
+parser.add_argument("--timeout", default=120, type=float, metavar="SECONDS")
+parser.add_argument(
+    "--results",
+    default="test.result.json",
+    metavar="RESULTS_PATH",
+    help="where to write the results as JSON",
+)
+parser.add_argument(
+    "--benchmark",
+    default=0,
+    type=int,
+    metavar="REQUESTS",
+    help="instead of testing, send REQUESTS compilations per new compiler and kind"
+    " (and per previous compiler) and measure the latencies",
+)
+parser.add_argument(
+    "--benchmark-results",
+    default="bench.result.json",
+    metavar="RESULTS_PATH",
+    help="where to write the benchmark results as JSON",
+)
+parser.add_argument(
+    "--regression-threshold",
+    default=1.5,
+    type=float,
+    metavar="RATIO",
+    help="p50 ratio against the previous compiler above which it's a regression",
+)
+
+
+class HttpError(Exception):
+    pass
+
+
+## Minimal HTTP/1.1 client over asyncio streams, keeping up to `size`
+## connections alive to a single host.
+class HttpConnectionPool:
+    def __init__(self, url: str, size: int, timeout: float):
+        parsed = urlsplit(url)
+        self.ssl = ssl.create_default_context() if parsed.scheme == "https" else None
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if self.ssl else 80)
+        self.base_path = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self.idle = []
+        self.semaphore = asyncio.Semaphore(size)
+
+    ## Also bounded by the timeout: a host that doesn't answer the SYN would
+    ## otherwise hang the request until the OS gives up.
+    async def _connect(self):
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout
+        )
+
+    async def _read_body(self, reader, headers):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    ## trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(chunks), True
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"])), True
+
+        return await reader.read(), False
+
+    async def _roundtrip(self, conn, method: str, path: str, body: bytes, headers):
+        reader, writer = conn
+        request = [f"{method} {self.base_path}{path} HTTP/1.1", f"Host: {self.host}"]
+        request += [f"{k}: {v}" for k, v in headers.items()]
+        if body is not None:
+            request.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(request) + "\r\n\r\n").encode("utf-8"))
+        if body is not None:
+            writer.write(body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by peer")
+        status = int(status_line.split()[1])
+
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            response_headers[k.strip().lower()] = v.strip()
+
+        data, reusable = await self._read_body(reader, response_headers)
+        if response_headers.get("connection", "").lower() == "close":
+            reusable = False
+        return status, data, reusable
+
+    async def request(self, method: str, path: str, body=None, headers=None):
+        headers = headers or {}
+        async with self.semaphore:
+            ## An idle connection may have been closed by the server in the
+            ## meantime: retry once on a fresh one.
+            for attempt in range(2):
+                reused = bool(self.idle)
+                conn = self.idle.pop() if reused else await self._connect()
+                try:
+                    status, data, reusable = await asyncio.wait_for(
+                        self._roundtrip(conn, method, path, body, headers),
+                        self.timeout,
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    conn[1].close()
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except BaseException:
+                    conn[1].close()
+                    raise
+
+                if reusable:
+                    self.idle.append(conn)
+                else:
+                    conn[1].close()
+                return status, data
+
+    async def get_json(self, path: str):
+        status, data = await self.request(
+            "GET", path, headers={"Accept": "application/json"}
+        )
+        if status != 200:
+            raise HttpError(f"GET {path} returned {status}")
+        return json.loads(data)
+
+    async def post_json(self, path: str, content):
+        status, data = await self.request(
+            "POST",
+            path,
+            body=json.dumps(content).encode("utf-8"),
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+        )
+        if status != 200:
+            raise HttpError(f"POST {path} returned {status}")
+        return json.loads(data)
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+
+def load_manifest(path: str):
+    host = None
+    tests = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "host" in entry:
+                host = host or entry["host"]
+            else:
+                tests.append(entry)
+    return host, tests
+
+
+async def run_test(pool: HttpConnectionPool, limit, test, supports_binary):
+    result = dict(test)
+    if test["filters"].get("binary") and supports_binary.get(test["compiler"]) is False:
+        result.update(status="SKIPPED", reason="not supported", duration=0)
+        return result
+
+    async with limit:
+        start = time.monotonic()
+        try:
+            response = await pool.post_json(
+                f"/api/compiler/{test['compiler']}/compile",
+                compile_request(test["source"], test["filters"]),
+            )
+            result["code"] = response.get("code")
+            result["status"] = "OK" if response.get("code") == 0 else "FAIL"
+        except (HttpError, OSError, ValueError, asyncio.TimeoutError) as e:
+            result["status"] = "ERROR"
+            result["reason"] = str(e) or type(e).__name__
+        result["duration"] = time.monotonic() - start
+    return result
+
+
+async def fetch_supports_binary(pool: HttpConnectionPool, tests):
+    if not any(t["filters"].get("binary") for t in tests):
+        return {}
+    try:
+        compilers = await pool.get_json("/api/compilers?fields=id,supportsBinary")
+    except (HttpError, OSError, ValueError, asyncio.TimeoutError) as e:
+        print(f"Can't get the list of compilers, assuming binary is supported: {e}")
+        return {}
+    return {c["id"]: c.get("supportsBinary") for c in compilers}
+
+
+async def run_tests(host: str, tests, jobs: int, timeout: float):
+    pool = HttpConnectionPool(host, jobs, timeout)
+    try:
+        supports_binary = await fetch_supports_binary(pool, tests)
+        limit = asyncio.Semaphore(jobs)
+        return await asyncio.gather(
+            *(run_test(pool, limit, test, supports_binary) for test in tests)
+        )
+    finally:
+        pool.close()
+
+
+## Benchmark mode: each (compiler, kind) is benchmarked on its own, with
+## `jobs` requests in flight, so that the latencies of one compiler are not
+## polluted by the others.
+
+
+def latency_stats(durations):
+    if not durations:
+        return None
+    if len(durations) == 1:
+        p50 = p95 = p99 = durations[0]
+    else:
+        q = statistics.quantiles(durations, n=100, method="inclusive")
+        p50, p95, p99 = q[49], q[94], q[98]
+    return {
+        "p50": p50,
+        "p95": p95,
+        "p99": p99,
+        "mean": statistics.fmean(durations),
+        "min": min(durations),
+        "max": max(durations),
+    }
+
+
+async def benchmark_compiler(pool, limit, test, compiler: str, requests: int):
+    bench = dict(test, compiler=compiler, fake=False)
+    start = time.monotonic()
+    results = await asyncio.gather(
+        *(run_test(pool, limit, bench, {}) for _ in range(requests))
+    )
+    wall = time.monotonic() - start
+
+    durations = [r["duration"] for r in results if r["status"] == "OK"]
+    errors = [r for r in results if r["status"] != "OK"]
+    return {
+        "compiler": compiler,
+        "requests": requests,
+        "errors": len(errors),
+        "error_rate": len(errors) / requests,
+        "first_error": errors[0].get("reason", errors[0]["status"]) if errors else None,
+        "wall": wall,
+        "throughput": len(durations) / wall if wall else 0,
+        "latency": latency_stats(durations),
+    }
+
+
+async def run_benchmarks(host: str, tests, jobs: int, timeout: float, requests: int):
+    pool = HttpConnectionPool(host, jobs, timeout)
+    try:
+        supports_binary = await fetch_supports_binary(pool, tests)
+        limit = asyncio.Semaphore(jobs)
+        benchmarks = []
+        for test in tests:
+            if test["fake"]:
+                continue
+            entry = {k: test[k] for k in ("name", "arch", "lang", "compiler", "kind")}
+            if test["filters"].get("binary") and (
+                supports_binary.get(test["compiler"]) is False
+            ):
+                entry["status"] = "SKIPPED"
+                benchmarks.append(entry)
+                continue
+
+            entry["status"] = "OK"
+            entry["new"] = await benchmark_compiler(
+                pool, limit, test, test["compiler"], requests
+            )
+            previous = test.get("previous")
+            if previous and not (
+                test["filters"].get("binary") and supports_binary.get(previous) is False
+            ):
+                entry["previous"] = await benchmark_compiler(
+                    pool, limit, test, previous, requests
+                )
+            benchmarks.append(entry)
+        return benchmarks
+    finally:
+        pool.close()
+
+
+def compare(benchmarks, threshold: float):
+    regressions = 0
+    for entry in benchmarks:
+        if entry["status"] != "OK":
+            continue
+        new = entry["new"]
+        previous = entry.get("previous")
+        if new["errors"]:
+            entry["status"] = "ERROR"
+        elif previous and previous["latency"]:
+            ratio = new["latency"]["p50"] / previous["latency"]["p50"]
+            entry["p50_ratio"] = ratio
+            if ratio > threshold:
+                entry["status"] = "REGRESSION"
+        regressions += entry["status"] != "OK"
+    return regressions
+
+
+def report_benchmarks(benchmarks):
+    print(
+        f"{'':40} {'p50':>7} {'p95':>7} {'p99':>7} {'req/s':>7} {'err':>5}"
+        f" {'prev p50':>8} {'ratio':>6}"
+    )
+    for entry in benchmarks:
+        if entry["status"] == "SKIPPED":
+            print(f"{entry['name']:-<40} [SKIPPED (not supported)]")
+            continue
+        new = entry["new"]
+        latency = new["latency"] or dict.fromkeys(("p50", "p95", "p99"), float("nan"))
+        line = (
+            f"{entry['name']:-<40} {latency['p50']:7.3f} {latency['p95']:7.3f}"
+            f" {latency['p99']:7.3f} {new['throughput']:7.2f} {new['error_rate']:5.0%}"
+        )
+        if "p50_ratio" in entry:
+            line += f" {entry['previous']['latency']['p50']:8.3f} {entry['p50_ratio']:5.2f}x"
+        if entry["status"] != "OK":
+            line += f" [{entry['status']}]"
+        print(line)
+
+
+def report(results):
+    failures = 0
+    in_fake = False
+    for result in results:
+        if result["fake"] != in_fake:
+            in_fake = result["fake"]
+            if in_fake:
+                print(
+                    "\n\n#### Fake tests, they should FAIL or be SKIPPED, but never PASS\n"
+                )
+            else:
+                print("#### End of fake tests\n")
+
+        status = result["status"]
+        if "reason" in result:
+            status += f" ({result['reason']})"
+        print(f"{result['name']:-<40} [{status}] {result['duration']:.2f}s")
+
+        if result["fake"]:
+            failures += result["status"] == "OK"
+        elif result["status"] in ("FAIL", "ERROR"):
+            failures += 1
+    if in_fake:
+        print("#### End of fake tests\n")
+    return failures
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    manifest_host, tests = load_manifest(args.manifest)
+    host = args.host or manifest_host or "http://localhost:10240"
+
+    if args.benchmark > 0:
+        benchmarks = asyncio.run(
+            run_benchmarks(host, tests, args.jobs, args.timeout, args.benchmark)
+        )
+        regressions = compare(benchmarks, args.regression_threshold)
+
+        with open(args.benchmark_results, "w") as f:
+            json.dump(
+                {
+                    "host": host,
+                    "requests": args.benchmark,
+                    "jobs": args.jobs,
+                    "regression_threshold": args.regression_threshold,
+                    "benchmarks": benchmarks,
+                },
+                f,
+                indent=1,
+            )
+
+        report_benchmarks(benchmarks)
+        print(f"{len(benchmarks)} benchmarks, {regressions} regressions or errors")
+        sys.exit(1 if regressions else 0)
+
+    start = time.monotonic()
+    results = asyncio.run(run_tests(host, tests, args.jobs, args.timeout))
+    elapsed = time.monotonic() - start
+
+    with open(args.results, "w") as f:
+        json.dump({"host": host, "elapsed": elapsed, "results": results}, f, indent=1)
+
+    failures = report(results)
+    print(f"{len(results)} tests in {elapsed:.2f}s, {failures} unexpected results")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import check_and_update_conf as conf
+
+## Compiles the TEST_FOR_LANG snippets with the new compilers straight from the
+## install root, before any config file is changed and without a CE instance:
+## for each enabled language, the compiler found by findCompiler() compiles
+## the snippet to assembly (-S) and to an object (-c), which is then
+## disassembled with the objdump and c++filt of the toolchain, as CE would do.
+## The compilations run in a process pool.
+
+## Source file name for each language. GNAT wants the file named after the
+## unit.
+SOURCE_NAME = {
+    "ADA": "example.adb",
+    "C": "example.c",
+    "CXX": "example.cpp",
+    "D": "example.d",
+    "FORTRAN": "example.f90",
+    "GIMPLE": "example.c",
+    "GO": "example.go",
+    "OBJC": "example.m",
+    "OBJCXX": "example.mm",
+}
+
+EXTRA_FLAGS = {
+    "GIMPLE": ["-fgimple"],
+}
+
+## Driver used for -S and -c when the compiler of the config can't do it:
+## gnatmake builds programs, the gcc of the toolchain compiles Ada units.
+COMPILE_DRIVER = {
+    "ADA": "gcc",
+}
+
+
+## Languages enabled in the ct-ng config of the target, see
+## check_lang_enabled_in_ctng().
+def enabled_langs(arch: str, version: str, only=None):
+    ct_langs = conf.CTNG_MATRIX.langs(arch, version)
+    return [
+        lang
+        for lang in conf.LANGS
+        if (not only or lang in only)
+        and (lang in ("C", "GIMPLE") or conf.CT_LANGS[lang] in ct_langs)
+    ]
+
+
+## Results of the languages asked with --lang which can't be tested.
+def skipped_langs(arch: str, version: str, only, enabled):
+    skipped = []
+    for lang in only or []:
+        if lang in enabled:
+            continue
+        if lang in conf.LANGS:
+            reason = "not enabled in the ct-ng config"
+        else:
+            reason = f"unknown language, expected one of {', '.join(conf.LANGS)}"
+        skipped.append(
+            {
+                "arch": arch,
+                "version": version,
+                "lang": lang,
+                "status": "skipped",
+                "stage": None,
+                "timings": {},
+                "error": reason,
+            }
+        )
+    return skipped
+
+
+## Result of a target whose ct-ng config can't be read: its languages aren't
+## known, nothing is tested.
+def config_error(arch: str, version: str, error: OSError):
+    return {
+        "arch": arch,
+        "version": version,
+        "lang": "*",
+        "status": "failed",
+        "stage": "config",
+        "timings": {},
+        "error": f"can't read the ct-ng config: {error}",
+    }
+
+
+## The binaries to test, resolved as for the config files. Errors are kept
+## in the job and reported as failures of the "resolve" stage.
+def resolve(arch: str, version: str, lang: str, install_root: str):
+    job = {"arch": arch, "version": version, "lang": lang}
+    ## findFile() and findCompiler() report what they search.
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            job["compiler"] = conf.findCompiler(arch, lang, version, install_root)
+            job["driver"] = job["compiler"]
+            if lang in COMPILE_DRIVER:
+                job["driver"] = conf.findFile(
+                    arch, lang, version, install_root, COMPILE_DRIVER[lang]
+                )
+            job["objdump"] = conf.findFile(arch, lang, version, install_root, "objdump")
+            job["c++filt"] = conf.findFile(arch, lang, version, install_root, "c++filt")
+        except (conf.Woops, OSError) as e:
+            job["error"] = str(e)
+    return job
+
+
+def run(stage: str, cmd, cwd: str, timeout: float, result, **kwargs):
+    start = time.monotonic()
+    try:
+        process = subprocess.run(
+            cmd, cwd=cwd, timeout=timeout, capture_output=True, **kwargs
+        )
+    except subprocess.TimeoutExpired:
+        result["error"] = f"{stage}: no answer within {timeout}s"
+        return None
+    finally:
+        result["timings"][stage] = round(time.monotonic() - start, 3)
+    if process.returncode != 0:
+        stderr = process.stderr.decode("utf-8", errors="replace").strip()
+        result["error"] = f"{stage}: exit status {process.returncode}\n{stderr}"
+        return None
+    return process.stdout
+
+
+## Runs in the pool: -S, -c, then objdump | c++filt on the object.
+def smoke_test(job, timeout: float):
+    result = dict(job, status="failed", stage="resolve", timings={})
+    if "error" in job:
+        return result
+
+    lang = job["lang"]
+    name = SOURCE_NAME[lang]
+    stem = name.rsplit(".", 1)[0]
+    flags = EXTRA_FLAGS.get(lang, [])
+    with tempfile.TemporaryDirectory(prefix="smoke-") as tmp:
+        with open(os.path.join(tmp, name), "w") as f:
+            f.write(conf.TEST_FOR_LANG[lang])
+
+        result["stage"] = "asm"
+        if (
+            run("asm", [job["driver"], "-S", *flags, name], tmp, timeout, result)
+            is None
+        ):
+            return result
+        if not os.path.getsize(os.path.join(tmp, f"{stem}.s")):
+            result["error"] = "asm: empty output"
+            return result
+
+        result["stage"] = "object"
+        if (
+            run("object", [job["driver"], "-c", *flags, name], tmp, timeout, result)
+            is None
+        ):
+            return result
+
+        result["stage"] = "disassemble"
+        disassembly = run(
+            "disassemble", [job["objdump"], "-d", f"{stem}.o"], tmp, timeout, result
+        )
+        if disassembly is None:
+            return result
+        if b"Disassembly of section" not in disassembly:
+            result["error"] = "disassemble: no code in the object"
+            return result
+
+        result["stage"] = "demangle"
+        if (
+            run("demangle", [job["c++filt"]], tmp, timeout, result, input=disassembly)
+            is None
+        ):
+            return result
+
+    result["status"] = "ok"
+    result["stage"] = None
+    return result
+
+
+def report(results):
+    failures = 0
+    for r in results:
+        timings = " ".join(f"{stage} {t:.2f}s" for stage, t in r["timings"].items())
+        status = r["status"] if r["stage"] is None else f"failed ({r['stage']})"
+        print(f"{r['arch']:12} {r['version']:10} {r['lang']:8} {status:20} {timings}")
+        if r["status"] == "failed":
+            failures += 1
+        if r["status"] != "ok":
+            for line in r["error"].splitlines()[:10]:
+                print(f"    {line}")
+    return failures
+
+
+def per_lang(results):
+    langs = defaultdict(lambda: {"ok": 0, "failed": 0, "skipped": 0, "seconds": 0.0})
+    for r in results:
+        langs[r["lang"]][r["status"]] += 1
+        langs[r["lang"]]["seconds"] += sum(r["timings"].values())
+    return dict(langs)
+
+
+parser = argparse.ArgumentParser(
+    description="Compile some code with the new compilers, without CE."
+)
+parser.add_argument("-a", "--arch", required=False, metavar="ARCH")
+parser.add_argument("--version", required=False, metavar="VERSION")
+parser.add_argument(
+    "--batch",
+    required=False,
+    metavar="TARGETS_PATH",
+    help="test all targets listed in TARGETS_PATH (one 'ARCH VERSION' per line) instead of -a/--version",
+)
+parser.add_argument(
+    "-l",
+    "--lang",
+    action="append",
+    metavar="LANG",
+    help="only test LANG (can be repeated) instead of the languages enabled in the ct-ng config",
+)
+parser.add_argument(
+    "--install-root",
+    default="/opt/compiler-explorer",
+    metavar="INSTALL_ROOT",
+    help="where the toolchains are installed",
+)
+parser.add_argument(
+    "--ctng-config-dir",
+    default=conf.DEFAULT_CONFIG_DIR,
+    metavar="CTNG_CONFIG_DIR",
+    help="where the ct-ng configs are (default: build/latest next to this script)",
+)
+parser.add_argument(
+    "--ctng-matrix-cache",
+    required=False,
+    metavar="CACHE_PATH",
+    help="keep the parsed ct-ng configs in CACHE_PATH (see ctng_matrix.py)",
+)
+parser.add_argument(
+    "-j",
+    "--jobs",
+    default=os.cpu_count(),
+    type=int,
+    metavar="JOBS",
+    help="number of compilations run concurrently",
+)
+parser.add_argument("--timeout", default=60, type=float, metavar="SECONDS")
+parser.add_argument(
+    "--results",
+    required=False,
+    metavar="RESULTS_PATH",
+    help="write the results as JSON in RESULTS_PATH",
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.batch:
+        targets = [
+            (arch, version) for arch, version, _ in conf.load_batch_targets(args.batch)
+        ]
+    elif args.arch and args.version:
+        targets = [(args.arch, args.version)]
+    else:
+        parser.error("either -a/--arch and --version, or --batch are required")
+
+    conf.CTNG_MATRIX = conf.CtngMatrix(
+        config_dir=args.ctng_config_dir, cache_path=args.ctng_matrix_cache
+    )
+    if args.lang:
+        args.lang = [lang.upper() for lang in args.lang]
+
+    start = time.monotonic()
+    to_test = []
+    ## skipped languages and targets without a ct-ng config
+    untested = []
+    for arch, version in targets:
+        try:
+            langs = enabled_langs(arch, version, args.lang)
+        except OSError as e:
+            untested.append(config_error(arch, version, e))
+            continue
+        to_test += [(arch, version, lang) for lang in langs]
+        untested += skipped_langs(arch, version, args.lang, langs)
+    ## Start all the --version probes of findCompiler() at once.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for arch, version, lang in to_test:
+            with contextlib.suppress(conf.Woops, OSError):
+                conf.COMPILER_PROBER.probe(
+                    conf.findFile(
+                        arch,
+                        lang,
+                        version,
+                        args.install_root,
+                        conf.COMPILER_SUFFIX[lang],
+                    )
+                )
+    jobs = [resolve(*target, args.install_root) for target in to_test]
+    conf.CTNG_MATRIX.save()
+    ## The probe threads must be gone before the pool forks.
+    conf.COMPILER_PROBER.shutdown()
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        results = list(pool.map(smoke_test, jobs, [args.timeout] * len(jobs)))
+    results += untested
+    elapsed = time.monotonic() - start
+
+    if args.results:
+        with open(args.results, "w") as f:
+            json.dump(
+                {"elapsed": elapsed, "langs": per_lang(results), "results": results},
+                f,
+                indent=1,
+            )
+
+    failures = report(results)
+    print()
+    for lang, stats in per_lang(results).items():
+        print(
+            f"{lang:8} {stats['ok']:3} ok {stats['failed']:3} failed"
+            f" {stats['skipped']:3} skipped {stats['seconds']:7.2f}s"
+        )
+    print(
+        f"{len(jobs)} tests in {elapsed:.2f}s, {failures} failures,"
+        f" {sum(r['status'] == 'skipped' for r in untested)} skipped"
+    )
+    ## Nothing tested is not a success.
+    sys.exit(1 if failures or not jobs else 0)
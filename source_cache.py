@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join, exists, isdir, basename
+
+from ctng_matrix import DEFAULT_CONFIG_DIR, CtngMatrix, select_configs
+
+## Works out the source archives needed by a set of ct-ng configs (from the
+## CT_<PKG>_VERSION, _MIRRORS and _ARCHIVE_* symbols) and fills a shared cache
+## directory with them, so that a batch of builds downloads each archive only
+## once. The cache is laid out as a ct-ng CT_LOCAL_TARBALLS_DIR, see build.sh
+## (CT_TARBALLS_CACHE). Packages built from a VCS (CT_<PKG>_SRC_DEVEL) are
+## mirrored in git/ and their URL is rewritten by build.sh.
+
+CT_NG_PACKAGES = "/opt/crosstool-ng-latest/share/crosstool-ng/packages"
+
+CT_MIRRORS_RE = re.compile(r"\$\(CT_Mirrors (\S+) (\S+)(?: (\S+))?\)")
+
+MANIFEST = "manifest.json"
+GIT_MIRRORS = join("git", "mirrors")
+DEFAULT_BRANCH = "ce-default"
+
+
+## Same as CT_Mirrors in ct-ng's scripts/functions, for the organizations used
+## by our configs. ftp:// mirrors are left out.
+def ct_mirrors(org: str, project: str, version=None):
+    match org:
+        case "GNU":
+            return [
+                f"https://ftpmirror.gnu.org/gnu/{project}",
+                f"https://ftp.gnu.org/gnu/{project}",
+            ]
+        case "sourceware":
+            return [
+                f"https://sourceware.org/pub/{project}",
+                f"https://mirrors.kernel.org/sourceware/{project}",
+            ]
+        case "kernel.org" if project == "linux" and version:
+            if version.startswith("2.6"):
+                return ["https://cdn.kernel.org/pub/linux/kernel/v2.6"]
+            return [
+                f"https://cdn.kernel.org/pub/linux/kernel/v{version.split('.')[0]}.x"
+            ]
+    return []
+
+
+def expand(value: str, symbols):
+    return re.sub(
+        r"\$\{(CT_\w+)\}", lambda m: symbols.get(m.group(1), m.group(0)), value
+    )
+
+
+def package_names(symbols):
+    for symbol in symbols:
+        if symbol.endswith("_PKG_NAME"):
+            yield symbol[len("CT_") : -len("_PKG_NAME")]
+
+
+## A package is fetched if its sources are selected, and if it's a companion
+## library, only if it's actually needed (e.g. expat is selected for gdb but
+## not needed when gdb is not built).
+def used(symbols, pkg: str):
+    if f"CT_COMP_LIBS_{pkg}" in symbols and symbols.get(f"CT_{pkg}_NEEDED") != "y":
+        return False
+    return any(
+        symbols.get(f"CT_{pkg}_SRC_{kind}") == "y"
+        for kind in ("RELEASE", "DEVEL", "CUSTOM")
+    )
+
+
+def config_sources(symbols):
+    sources = []
+    for pkg in package_names(symbols):
+        if not used(symbols, pkg):
+            continue
+
+        pkg_name = symbols[f"CT_{pkg}_PKG_NAME"]
+        if symbols.get(f"CT_{pkg}_SRC_DEVEL") == "y":
+            sources.append(
+                {
+                    "kind": "devel",
+                    "package": pkg_name,
+                    "vcs": symbols.get(f"CT_{pkg}_DEVEL_VCS"),
+                    "url": symbols.get(f"CT_{pkg}_DEVEL_URL"),
+                    "branch": symbols.get(f"CT_{pkg}_DEVEL_BRANCH"),
+                    "revision": symbols.get(f"CT_{pkg}_DEVEL_REVISION"),
+                }
+            )
+            continue
+
+        if symbols.get(f"CT_{pkg}_SRC_CUSTOM") == "y":
+            sources.append({"kind": "custom", "package": pkg_name})
+            continue
+
+        version = symbols.get(f"CT_{pkg}_VERSION", "")
+        filename = (
+            symbols.get(f"CT_{pkg}_ARCHIVE_FILENAME", "@{pkg_name}-@{version}")
+            .replace("@{pkg_name}", pkg_name)
+            .replace("@{version}", version)
+        )
+        mirrors = CT_MIRRORS_RE.sub(
+            lambda m: " ".join(ct_mirrors(*m.groups())),
+            expand(symbols.get(f"CT_{pkg}_MIRRORS", ""), symbols),
+        )
+        mirrors = [u for u in mirrors.split() if u.startswith(("http://", "https://"))]
+
+        sources.append(
+            {
+                "kind": "release",
+                "package": pkg_name,
+                "dir_name": symbols.get(f"CT_{pkg}_DIR_NAME", pkg_name),
+                "version": version,
+                "filename": filename,
+                "formats": symbols.get(f"CT_{pkg}_ARCHIVE_FORMATS", ".tar.xz").split(),
+                "mirrors": mirrors,
+            }
+        )
+    return sources
+
+
+## Deduplicated sources needed by all the targets, with the targets using them.
+def plan(matrix: CtngMatrix, targets):
+    sources = {}
+    for arch, version in targets:
+        for source in config_sources(matrix.config(arch, version)):
+            match source["kind"]:
+                case "release":
+                    key = ("release", source["filename"])
+                case "devel":
+                    key = ("devel", source["url"], source["branch"])
+                case _:
+                    key = ("custom", source["package"])
+            entry = sources.setdefault(key, dict(source, targets=[]))
+            entry["targets"].append(f"{arch}-{version}")
+            if source["kind"] == "release":
+                for mirror in source["mirrors"]:
+                    if mirror not in entry["mirrors"]:
+                        entry["mirrors"].append(mirror)
+    return sorted(
+        sources.values(),
+        key=lambda s: (s["kind"], s["package"], s.get("filename") or s.get("branch")),
+    )
+
+
+def sha256(path: str):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+## Digests shipped with ct-ng (packages/<dir>/<version>/chksum), if available.
+def ct_ng_digest(packages_dir: str, source, archive: str):
+    chksum = join(packages_dir or "", source["dir_name"], source["version"], "chksum")
+    if not packages_dir or not exists(chksum):
+        return None
+    with open(chksum) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 3 and fields[0] == "sha256" and fields[1] == archive:
+                return fields[2]
+    return None
+
+
+class SourceCache:
+    def __init__(self, directory: str, mirrors, upstream: bool, packages_dir):
+        self.directory = directory
+        self.mirrors = mirrors
+        self.upstream = upstream
+        self.packages_dir = packages_dir
+        os.makedirs(join(directory, "git"), exist_ok=True)
+
+        self.manifest = {}
+        if exists(join(directory, MANIFEST)):
+            with open(join(directory, MANIFEST)) as f:
+                self.manifest = json.load(f)
+
+    def save(self):
+        tmp_path = join(self.directory, f"{MANIFEST}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, join(self.directory, MANIFEST))
+
+        git_mirrors = sorted(
+            (url, entry["mirror"])
+            for url, entry in self.manifest.items()
+            if entry.get("kind") == "devel" and entry.get("branches")
+        )
+        with open(join(self.directory, GIT_MIRRORS), "w") as f:
+            for url, mirror in git_mirrors:
+                f.write(f"{url} {mirror}\n")
+
+    def cached(self, source):
+        for fmt in source["formats"]:
+            archive = source["filename"] + fmt
+            if archive in self.manifest and exists(join(self.directory, archive)):
+                return archive
+        return None
+
+    def candidates(self, source):
+        for fmt in source["formats"]:
+            archive = source["filename"] + fmt
+            for mirror in self.mirrors:
+                yield archive, mirror
+            if self.upstream:
+                for mirror in source["mirrors"]:
+                    yield archive, mirror
+
+    def _download(self, location: str, archive: str, destination: str):
+        if isdir(location):
+            shutil.copyfile(join(location, archive), destination)
+            return
+        url = f"{location.rstrip('/')}/{archive}"
+        with (
+            urllib.request.urlopen(url, timeout=60) as response,
+            open(destination, "wb") as f,
+        ):
+            shutil.copyfileobj(response, f, 1 << 20)
+
+    def fetch_release(self, source):
+        if archive := self.cached(source):
+            return archive, "cached", None
+
+        errors = []
+        for archive, location in self.candidates(source):
+            destination = join(self.directory, archive)
+            tmp_path = f"{destination}.{os.getpid()}.part"
+            try:
+                self._download(location, archive, tmp_path)
+            except (OSError, urllib.error.URLError) as e:
+                errors.append(f"{location}/{archive}: {e}")
+                if exists(tmp_path):
+                    os.remove(tmp_path)
+                continue
+
+            digest = sha256(tmp_path)
+            expected = ct_ng_digest(self.packages_dir, source, archive)
+            if expected and digest != expected:
+                os.remove(tmp_path)
+                errors.append(f"{location}/{archive}: sha256 mismatch")
+                continue
+
+            os.replace(tmp_path, destination)
+            self.manifest[archive] = {
+                "kind": "release",
+                "package": source["package"],
+                "version": source["version"],
+                "sha256": digest,
+                "size": os.path.getsize(destination),
+                "source": location,
+                "verified": bool(expected),
+            }
+            return archive, "fetched", None
+        return None, "missing", errors[-1] if errors else "no mirror"
+
+    ## Shallow mirror with only the needed branches (or tags), exposed as
+    ## branches so that ct-ng can clone it and checkout any of them. Returns
+    ## the branches that couldn't be fetched, with the error.
+    def fetch_devel(self, url: str, branches):
+        mirror = re.sub(r"\W+", "_", url.split("://", 1)[-1]).strip("_") + ".git"
+        path = join(self.directory, "git", mirror)
+        if not exists(path):
+            subprocess.run(["git", "init", "-q", "--bare", path], check=True)
+
+        def git(*command):
+            return subprocess.run(
+                ["git", "-C", path, *command], capture_output=True, text=True
+            )
+
+        missing = {}
+        for branch in branches:
+            ## no branch: ct-ng clones the default one, i.e. the mirror's HEAD
+            ref = f"refs/heads/{branch or DEFAULT_BRANCH}"
+            if git("rev-parse", "-q", "--verify", ref).returncode == 0:
+                continue
+            fetched = git(
+                "fetch", "-q", "--depth", "1", url, f"+{branch or 'HEAD'}:{ref}"
+            )
+            if fetched.returncode != 0:
+                missing[branch] = fetched.stderr.strip()
+            elif not branch:
+                git("symbolic-ref", "HEAD", ref)
+
+        entry = self.manifest.setdefault(url, {"kind": "devel", "mirror": mirror})
+        entry["branches"] = sorted(
+            set(entry.get("branches", [])) | (set(branches) - set(missing))
+        )
+        return missing
+
+    def verify(self):
+        bad = []
+        for archive, entry in sorted(self.manifest.items()):
+            if entry.get("kind") != "release":
+                continue
+            path = join(self.directory, archive)
+            if not exists(path):
+                bad.append((archive, "missing"))
+            elif sha256(path) != entry["sha256"]:
+                bad.append((archive, "sha256 mismatch"))
+        return bad
+
+
+parser = argparse.ArgumentParser(
+    description="Plan and cache the source archives needed by ct-ng builds."
+)
+parser.add_argument("--config-dir", default=DEFAULT_CONFIG_DIR, metavar="CONFIGDIR")
+parser.add_argument("--ctng-matrix-cache", required=False, metavar="CACHE_PATH")
+parser.add_argument("--json", action="store_true", help="output JSON")
+subparsers = parser.add_subparsers(dest="command", required=True)
+
+plan_parser = subparsers.add_parser("plan", help="list the sources needed by TARGETs")
+fetch_parser = subparsers.add_parser("fetch", help="fill the cache for TARGETs")
+verify_parser = subparsers.add_parser("verify", help="check the cached archives")
+
+for p in (plan_parser, fetch_parser):
+    p.add_argument(
+        "targets",
+        nargs="*",
+        metavar="TARGET",
+        help="ARCH-VERSION of the configs, shell patterns allowed (default: all)",
+    )
+for p in (fetch_parser, verify_parser):
+    p.add_argument("--cache", required=True, metavar="CACHE_DIR")
+
+fetch_parser.add_argument("-j", "--jobs", default=8, type=int, metavar="JOBS")
+fetch_parser.add_argument(
+    "--mirror",
+    action="append",
+    default=[],
+    metavar="URL_OR_DIR",
+    help="try this HTTP server or directory before the upstream mirrors",
+)
+fetch_parser.add_argument(
+    "--no-upstream", action="store_true", help="only use the --mirror ones"
+)
+fetch_parser.add_argument(
+    "--offline",
+    action="store_true",
+    help="don't download anything, only report what is missing from the cache",
+)
+fetch_parser.add_argument(
+    "--no-devel", action="store_true", help="don't mirror the VCS sources"
+)
+fetch_parser.add_argument(
+    "--ct-ng-packages",
+    default=CT_NG_PACKAGES,
+    metavar="DIR",
+    help="ct-ng packages directory, to check the archives against the known sha256",
+)
+
+
+def print_plan(sources):
+    for source in sources:
+        users = len(source["targets"])
+        match source["kind"]:
+            case "release":
+                print(f"{source['filename']:<32} {users:>4} targets")
+            case "devel":
+                print(
+                    f"{source['package'] + ' (' + source['vcs'] + ')':<32} {users:>4} targets"
+                    f"  {source['url']} {source['branch']}"
+                )
+            case _:
+                print(f"{source['package'] + ' (custom)':<32} {users:>4} targets")
+
+
+def fetch(args, cache: SourceCache, sources):
+    releases = [s for s in sources if s["kind"] == "release"]
+    devels = defaultdict(list)
+    for s in sources:
+        if s["kind"] == "devel" and s["vcs"] == "git" and not args.no_devel:
+            devels[s["url"]].append(s["branch"])
+
+    results = []
+    if args.offline:
+        for source in releases:
+            archive = cache.cached(source)
+            results.append(
+                (source["filename"], "cached" if archive else "missing", None)
+            )
+        for url, branches in devels.items():
+            have = set(cache.manifest.get(url, {}).get("branches", []))
+            for branch in branches:
+                status = "cached" if branch in have else "missing"
+                results.append((f"{url} {branch}", status, None))
+        return results
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        release_futures = [(s, pool.submit(cache.fetch_release, s)) for s in releases]
+        devel_futures = [
+            (url, branches, pool.submit(cache.fetch_devel, url, branches))
+            for url, branches in devels.items()
+        ]
+
+        for source, future in release_futures:
+            archive, status, error = future.result()
+            results.append((archive or source["filename"], status, error))
+        for url, branches, future in devel_futures:
+            failed = future.result()
+            for branch in branches:
+                if branch in failed:
+                    results.append((f"{url} {branch}", "missing", failed[branch]))
+                else:
+                    results.append((f"{url} {branch}", "mirrored", None))
+    cache.save()
+    return results
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        cache = SourceCache(args.cache, [], False, None)
+        bad = cache.verify()
+        for archive, reason in bad:
+            print(f"{archive}: {reason}")
+        print(f"{len(cache.manifest)} entries, {len(bad)} bad")
+        sys.exit(1 if bad else 0)
+
+    matrix = CtngMatrix(args.config_dir, args.ctng_matrix_cache)
+    try:
+        targets = select_configs(args.config_dir, args.targets or ["*"])
+    except ValueError as e:
+        sys.exit(str(e))
+    sources = plan(matrix, targets)
+    matrix.save()
+
+    if args.command == "plan":
+        if args.json:
+            print(json.dumps(sources, indent=1))
+        else:
+            print_plan(sources)
+            releases = [s for s in sources if s["kind"] == "release"]
+            downloads = sum(len(s["targets"]) for s in releases)
+            print(
+                f"{len(targets)} targets, {len(releases)} archives to fetch"
+                f" (instead of {downloads})"
+            )
+        sys.exit(0)
+
+    cache = SourceCache(
+        args.cache, args.mirror, not args.no_upstream, args.ct_ng_packages
+    )
+    results = fetch(args, cache, sources)
+    if args.json:
+        print(
+            json.dumps(
+                [{"source": s, "status": st, "error": e} for s, st, e in results],
+                indent=1,
+            )
+        )
+    else:
+        for source, status, error in results:
+            print(f"{source:<48} {status}" + (f" ({error})" if error else ""))
+    missing = sum(status == "missing" for _, status, _ in results)
+    print(f"{len(results)} sources, {missing} missing")
+    sys.exit(1 if missing else 0)
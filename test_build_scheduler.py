@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import contextlib
+import io
+import json
+import os
+import stat
+import tempfile
+import unittest
+from os.path import join, exists
+from unittest import mock
+
+import build_scheduler
+
+## Tests of build_scheduler.py with a fake build.sh (and a fake docker running
+## it in a directory standing for the container), run with:
+##   python3 -m unittest test_build_scheduler
+
+FAKE_BUILD = """#!/bin/bash
+set -eu
+output="$3/$1-gcc-$2.tar.xz"
+manifest="$3/$1-gcc-$2.ce-build"
+echo "ccache:${CT_CCACHE_DIR:-}"
+echo "ce-build-revision:${FAKE_REVISION}"
+if [[ "${4:-}" == "${FAKE_REVISION}" ]]; then
+    echo "ce-build-output:${output}"
+    echo "ce-build-status:SKIPPED"
+    exit
+fi
+if [[ -f "${manifest}" ]]; then
+    read -r revision artifact < "${manifest}"
+    if [[ "${revision}" == "${FAKE_REVISION}" && -f "${artifact}" ]]; then
+        echo "ce-build-output:${artifact}"
+        echo "ce-build-status:SKIPPED"
+        exit
+    fi
+fi
+echo "ce-build-output:${output}"
+echo "$1 $2" > "${output}"
+echo "${FAKE_REVISION} ${output}" > "${manifest}"
+echo "ce-build-status:OK"
+"""
+
+## Each container is a directory of FAKE_DOCKER_ROOT, the /opt/ given to
+## build.sh is its opt/ directory. The calls are logged in 'calls'.
+FAKE_DOCKER = """#!/usr/bin/env python3
+import json, os, shutil, subprocess, sys
+root = os.environ["FAKE_DOCKER_ROOT"]
+args = sys.argv[1:]
+with open(os.path.join(root, "calls"), "a") as f:
+    f.write(json.dumps(args) + "\\n")
+if args[0] == "run":
+    env = {k: v for k, v in os.environ.items() if k == "PATH" or k.startswith("FAKE_")}
+    i = 1
+    while args[i].startswith("-"):
+        if args[i] in ("--name", "-e", "-v"):
+            if args[i] == "--name":
+                name = args[i + 1]
+            elif args[i] == "-e":
+                key, _, value = args[i + 1].partition("=")
+                env[key] = value
+            i += 2
+        else:
+            i += 1
+    opt = os.path.join(root, name, "opt")
+    os.makedirs(opt)
+    command = [a.replace("/opt/", opt + "/") for a in args[i + 2 :]]
+    sys.exit(subprocess.run([os.environ["FAKE_BUILD"], *command], env=env).returncode)
+elif args[0] == "cp":
+    shutil.copy(args[1].split(":", 1)[1], args[2])
+elif args[0] == "rm":
+    shutil.rmtree(os.path.join(root, args[-1]), ignore_errors=True)
+"""
+
+
+def write_script(path: str, text: str):
+    with open(path, "w") as f:
+        f.write(text)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+
+class BuildSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+        bin_dir = join(self.tmp, "bin")
+        os.makedirs(bin_dir)
+        fake_build = join(self.tmp, "build.sh")
+        write_script(fake_build, FAKE_BUILD)
+        write_script(join(bin_dir, "docker"), FAKE_DOCKER)
+        self.docker_root = join(self.tmp, "containers")
+        os.makedirs(self.docker_root)
+
+        env = mock.patch.dict(
+            os.environ,
+            PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+            FAKE_BUILD=fake_build,
+            FAKE_DOCKER_ROOT=self.docker_root,
+            FAKE_REVISION="r1",
+        )
+        env.start()
+        self.addCleanup(env.stop)
+        build_sh = mock.patch.object(build_scheduler, "BUILD_SH", fake_build)
+        build_sh.start()
+        self.addCleanup(build_sh.stop)
+
+        self.output = join(self.tmp, "output")
+        self.work_dir = join(self.tmp, "work")
+
+    ## Runs the scheduler like its main, and returns the state of the targets.
+    def schedule(self, *options, targets=("arm-14.2.0",)):
+        args = build_scheduler.parser.parse_args(
+            [
+                "--state",
+                join(self.tmp, "state.json"),
+                "--work-dir",
+                self.work_dir,
+                "--output",
+                self.output,
+                "--cores",
+                "4",
+                "--memory",
+                "16G",
+                *options,
+                *targets,
+            ]
+        )
+        os.makedirs(join(args.work_dir, "logs"), exist_ok=True)
+        os.makedirs(args.output, exist_ok=True)
+        state = build_scheduler.State(args.state)
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_scheduler.run(args, state, list(targets))
+        return state.targets
+
+    def docker_runs(self):
+        with open(join(self.docker_root, "calls")) as f:
+            calls = [json.loads(line) for line in f]
+        return [call for call in calls if call[0] == "run"]
+
+    def log(self, name: str):
+        with open(join(self.work_dir, "logs", f"{name}.log")) as f:
+            return f.read()
+
+    def test_docker_rerun_is_skipped(self):
+        targets = self.schedule()
+        self.assertEqual(targets["arm-14.2.0"]["status"], "OK")
+        self.assertTrue(exists(join(self.output, "arm-gcc-14.2.0.tar.xz")))
+        self.assertTrue(exists(join(self.output, "arm-gcc-14.2.0.ce-build")))
+
+        targets = self.schedule("--rebuild")
+        self.assertEqual(targets["arm-14.2.0"]["status"], "SKIPPED")
+        self.assertEqual(self.docker_runs()[-1][-1], "r1")
+
+    def test_docker_rebuilds_changed_or_missing_tarball(self):
+        self.schedule()
+        os.environ["FAKE_REVISION"] = "r2"
+        targets = self.schedule("--rebuild")
+        self.assertEqual(targets["arm-14.2.0"]["status"], "OK")
+
+        os.remove(join(self.output, "arm-gcc-14.2.0.tar.xz"))
+        targets = self.schedule("--rebuild")
+        self.assertEqual(targets["arm-14.2.0"]["status"], "OK")
+        self.assertEqual(self.docker_runs()[-1][-1], "nope")
+
+    def test_docker_memory_limit_is_opt_in(self):
+        self.schedule("--memory-per-build", "4G")
+        self.assertFalse(any(a.startswith("--memory") for a in self.docker_runs()[-1]))
+
+        self.schedule("--rebuild", "--memory-per-build", "4G", "--hard-memory-limit")
+        self.assertIn(f"--memory={4 << 30}", self.docker_runs()[-1])
+
+    def test_ccache_volume(self):
+        self.schedule("--ccache", "gcc-cross-ccache")
+        run = self.docker_runs()[-1]
+        self.assertIn("gcc-cross-ccache:/opt/.ccache", run)
+        self.assertIn("ccache:/opt/.ccache", self.log("arm-14.2.0"))
+
+    def test_ccache_local(self):
+        self.schedule("--runner", "local", "--ccache", "ccache")
+        self.assertIn(f"ccache:{os.path.abspath('ccache')}", self.log("arm-14.2.0"))
+
+    def test_local_rerun_is_skipped(self):
+        self.schedule("--runner", "local")
+        targets = self.schedule("--runner", "local", "--rebuild")
+        self.assertEqual(targets["arm-14.2.0"]["status"], "SKIPPED")
+
+    def test_cores_are_shared(self):
+        targets = self.schedule(
+            "--min-cores", "1", targets=("arm-14.2.0", "arm64-14.2.0")
+        )
+        self.assertEqual(targets["arm-14.2.0"]["cores"], 2)
+        self.assertEqual(targets["arm64-14.2.0"]["cores"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
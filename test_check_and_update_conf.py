@@ -0,0 +1,629 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from os.path import basename, dirname, exists, join
+from unittest import mock
+
+import check_and_update_conf as conf
+
+SCRIPT = join(dirname(__file__) or ".", "check_and_update_conf.py")
+
+## Tests of the parts of check_and_update_conf.py editing the CE properties
+## files, without any installed compiler.
+
+
+class AddSortedTest(unittest.TestCase):
+    CASES = [
+        ## (listed IDs, new IDs, expected IDs)
+        ("armg1120:armg1320", ["armg1220"], "armg1120:armg1220:armg1320"),
+        ("armg1120:armg1320", ["armg940"], "armg940:armg1120:armg1320"),
+        ("armg1120:armg1320", ["armg1410"], "armg1120:armg1320:armg1410"),
+        (
+            "armg1120:armg1320",
+            ["armg1410", "armg940", "armg1220"],
+            "armg940:armg1120:armg1220:armg1320:armg1410",
+        ),
+        ## versions, not strings, are compared
+        ("armg940:armg1120", ["armg1020"], "armg940:armg1020:armg1120"),
+        ## after the equal versions
+        ("carmg1220:armg1320", ["armg1220"], "carmg1220:armg1220:armg1320"),
+        ("&gcc86:armg1120:armg1320", ["armg940"], "&gcc86:armg940:armg1120:armg1320"),
+        ("armg1120:&other", ["armg1220"], "armg1120:armg1220:&other"),
+        ("armg1120:&a:armg1320:&b", ["armg1410"], "armg1120:&a:armg1320:armg1410:&b"),
+        ("armg1120:weird:armg1320", ["armg1220"], "armg1120:weird:armg1220:armg1320"),
+        ("weird:armg1120", ["armg940"], "weird:armg940:armg1120"),
+        ("armg1120", ["weird", "armg1220"], "armg1120:armg1220:weird"),
+        ("&other", ["armg1220"], "&other:armg1220"),
+        ## duplicates
+        ("armg1120:armg1320", ["armg1220", "armg1220"], "armg1120:armg1220:armg1320"),
+        ("armg1120:armg1320", ["armg1320"], "armg1120:armg1320"),
+        ("armg1120", ["weird", "weird"], "armg1120:weird"),
+        ## empty value
+        ("", ["armg1220"], "armg1220"),
+        ("", ["armg1320", "armg1220"], "armg1220:armg1320"),
+    ]
+
+    def test_add_sorted(self):
+        for listed, new, expected in self.CASES:
+            with self.subTest(listed=listed, new=new):
+                self.assertEqual(
+                    conf.add_sorted(f"group.gccarm.compilers={listed}", new),
+                    f"group.gccarm.compilers={expected}",
+                )
+
+    def test_semver(self):
+        ## armg346 is 34.6 without its semver
+        self.assertEqual(
+            conf.add_sorted(
+                "compilers=armg346:armg1120", "armg950", {"armg346": "3.4.6"}
+            ),
+            "compilers=armg346:armg950:armg1120",
+        )
+
+
+class PropertiesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        conf.VERSION_INDEXES.clear()
+
+    def write_conf(self, text: str, name: str = "c++.amazon.properties") -> str:
+        path = join(self.tmpdir.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+
+class VersionIndexTest(PropertiesTestCase):
+    ARCHES = [
+        "arm",
+        "arm-unknown",
+        "arm64",
+        "riscv32",
+        "riscv64",
+        "powerpc64",
+        "powerpc64le",
+        "sparc-leon",
+    ]
+
+    def test_decode_round_trip(self):
+        decoder = conf.CompilerIdDecoder(self.ARCHES)
+        for arch in self.ARCHES:
+            for lang in conf.COMPILER_ID_PATTERN[arch]:
+                compiler_id = conf.CompilerId(arch, "12.2.0", lang)
+                with self.subTest(compiler_id=compiler_id):
+                    self.assertIn((arch, lang, "1220"), decoder.decode(compiler_id))
+
+    def test_decode(self):
+        decoder = conf.CompilerIdDecoder(self.ARCHES)
+        self.assertEqual(decoder.decode("arm64g1220"), [("arm64", "CXX", "1220")])
+        self.assertEqual(decoder.decode("armg1220"), [("arm", "CXX", "1220")])
+        self.assertEqual(decoder.decode("armug1220"), [("arm-unknown", "CXX", "1220")])
+        self.assertEqual(decoder.decode("rv64-gcc1220"), [("riscv64", "CXX", "1220")])
+        self.assertEqual(
+            decoder.decode("ppc64leg1220"), [("powerpc64le", "CXX", "1220")]
+        )
+        self.assertEqual(
+            sorted(decoder.decode("objcrv32g1220")),
+            [("riscv32", "OBJC", "1220"), ("riscv64", "OBJC", "1220")],
+        )
+        for compiler_id in ("armgtrunk", "&gccarm", "clang1500", "arm64g"):
+            self.assertEqual(decoder.decode(compiler_id), [], compiler_id)
+
+    def parse(self, compilers: str):
+        text = f"group.gcc.compilers={compilers}\n" + "".join(
+            f"compiler.{compiler_id}.exe=/opt/{compiler_id}\n"
+            for compiler_id in compilers.split(":")
+            if not compiler_id.startswith("&")
+        )
+        return conf.PropertiesFile.parse(self.write_conf(text))
+
+    def test_version_index(self):
+        parsed_conf = self.parse(
+            "armg1320:armgtrunk:armg940:arm64g1220:armg1120:rv64-gcc1220:&other"
+        )
+        index = conf.get_version_index(parsed_conf, "arm")
+        self.assertEqual(
+            index[("arm", "CXX")],
+            [
+                ((9, 4, 0), "9.4.0", "armg940"),
+                ((11, 2, 0), "11.2.0", "armg1120"),
+                ((13, 2, 0), "13.2.0", "armg1320"),
+            ],
+        )
+        self.assertEqual(
+            index[("arm64", "CXX")], [((12, 2, 0), "12.2.0", "arm64g1220")]
+        )
+        self.assertEqual(
+            index[("riscv64", "CXX")], [((12, 2, 0), "12.2.0", "rv64-gcc1220")]
+        )
+
+    def check_prev(self, arch: str, prefix: str):
+        parsed_conf = self.parse(
+            f"{prefix}940:{prefix}1120:{prefix}1320:{prefix}trunk:&other"
+        )
+        cases = [
+            ("8.5.0", None),
+            ("9.4.0", None),
+            ("10.5.0", "9.4.0"),
+            ("12.2.0", "11.2.0"),
+            ("13.2.0", "11.2.0"),
+            ("13.3.0", "13.2.0"),
+            ("15.1.0", "13.2.0"),
+            ("trunk", None),
+        ]
+        for version, previous in cases:
+            with self.subTest(arch=arch, version=version):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    guessed = conf.test_prev(version, arch, "CXX", parsed_conf)
+                self.assertEqual(
+                    guessed, previous and (f"{arch};CXX".upper(), previous)
+                )
+
+    def test_prev(self):
+        self.check_prev("arm", "armg")
+
+    def test_prev_renamed_arches(self):
+        for arch in ("arm64", "riscv64", "riscv32", "powerpc64le", "arm-unknown"):
+            prefix = conf.CompilerId(arch, "1", "CXX")[:-1]
+            self.check_prev(arch, prefix)
+            conf.VERSION_INDEXES.clear()
+
+    def test_prev_other_lang(self):
+        parsed_conf = self.parse("armg1120:carmg1320")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(
+                conf.test_prev("14.1.0", "arm", "C", parsed_conf), ("ARM;C", "13.2.0")
+            )
+            self.assertEqual(
+                conf.test_prev("14.1.0", "arm", "CXX", parsed_conf),
+                ("ARM;CXX", "11.2.0"),
+            )
+            self.assertIsNone(conf.test_prev("14.1.0", "arm", "FORTRAN", parsed_conf))
+
+
+class PropertiesFileTest(PropertiesTestCase):
+    TEXT = (
+        "# Compiler Explorer properties\n"
+        "\n"
+        "compilers=&gccarm:&other\n"
+        "defaultCompiler=armg1320\n"
+        "   \n"
+        "group.gccarm.compilers=armg1120:armg1320\n"
+        "group.gccarm.options=-DFOO=1 -DBAR=a=b\n"
+        "compiler.armg1120.exe=/opt/arm/gcc-11.2.0/bin/arm-unknown-linux-gnueabi-g++\n"
+        "compiler.armg1120.semver=11.2.0\n"
+        "#compiler.armg1320.exe=/commented/out\n"
+        "compiler.armg1320.exe=/opt/arm/gcc-13.2.0/bin/arm-unknown-linux-gnueabi-g++\n"
+        "compiler.armg1320.name=ARM gcc 13.2  \t\n"
+        "\t\n"
+        "libs.fmt.url=https://example.com/?a=b&c=d\n"
+        "compiler.armg1320.options=-O2 -march=armv7"
+    )
+
+    def serialize(self, p) -> str:
+        output = io.StringIO()
+        p.serialize(output)
+        return output.getvalue()
+
+    def test_index(self):
+        p = conf.PropertiesFile.parse(self.write_conf(self.TEXT))
+        self.assertEqual(list(p.listed_compilers), ["armg1120", "armg1320"])
+        self.assertEqual(p.listed_compilers["armg1320"].number, 6)
+        self.assertEqual(p.compilers_exe["armg1320"].number, 11)
+        self.assertEqual(p.last_compilers_prop["armg1320"].number, 15)
+        self.assertEqual(p.compilers_semver_prop, {"armg1120": "11.2.0"})
+        self.assertEqual(p.group_prop("gccarm", "options"), "-DFOO=1 -DBAR=a=b")
+        self.assertEqual(p.value("libs.fmt.url"), "https://example.com/?a=b&c=d")
+        self.assertEqual(p.compiler_prop("armg1320", "options"), "-O2 -march=armv7")
+        self.assertNotIn("#compiler.armg1320.exe", p.props)
+
+    def test_round_trip(self):
+        path = self.write_conf(self.TEXT)
+        p = conf.PropertiesFile.parse(path)
+        self.assertEqual(self.serialize(p), self.TEXT)
+        output_path = join(self.tmpdir.name, "output.properties")
+        p.write(output_path)
+        with open(path, "rb") as f, open(output_path, "rb") as output:
+            self.assertEqual(output.read(), f.read())
+
+    def test_crlf_round_trip(self):
+        text = self.TEXT.replace("\n", "\r\n")
+        path = join(self.tmpdir.name, "c++.amazon.properties")
+        with open(path, "w", newline="") as f:
+            f.write(text)
+        p = conf.PropertiesFile.parse(path)
+        self.assertEqual(p.compilers_semver_prop, {"armg1120": "11.2.0"})
+        output_path = join(self.tmpdir.name, "output.properties")
+        p.write(output_path)
+        with open(output_path, "rb") as f:
+            self.assertEqual(f.read(), text.encode())
+
+        p.add_fixup(conf.Fixup(6, "armg1220", conf.FixupAction.ADD_SORTED))
+        p.write(output_path)
+        with open(output_path, "rb") as f:
+            self.assertEqual(
+                f.read(),
+                text.replace(
+                    "armg1120:armg1320", "armg1120:armg1220:armg1320"
+                ).encode(),
+            )
+
+    def test_fixups(self):
+        p = conf.PropertiesFile.parse(self.write_conf(self.TEXT))
+        p.add_fixup(conf.Fixup(6, "armg1220", conf.FixupAction.ADD_SORTED))
+        p.add_fixup(
+            conf.Fixup(
+                9, "compiler.armg1220.exe=/x\n", conf.FixupAction.ADD_NEW_LINE_AFTER
+            )
+        )
+        p.add_fixup(conf.Fixup(4, ":armg1220", conf.FixupAction.APPEND_TO_LINE))
+        lines = self.TEXT.splitlines(keepends=True)
+        lines[3] = "defaultCompiler=armg1320:armg1220\n"
+        lines[5] = "group.gccarm.compilers=armg1120:armg1220:armg1320\n"
+        lines[8] += "compiler.armg1220.exe=/x\n"
+        self.assertEqual(self.serialize(p), "".join(lines))
+
+
+class ParseCacheTest(PropertiesTestCase):
+    TEXT = PropertiesFileTest.TEXT
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = join(self.tmpdir.name, "cache")
+        self.cache = conf.ParseCache(self.cache_dir, 1024 * 1024)
+        self.path = self.write_conf(self.TEXT)
+        self.cache.store(self.path, conf.PropertiesFile.parse(self.path))
+
+    def assertCached(self, path: str):
+        p = self.cache.load(path)
+        self.assertIsNotNone(p)
+        expected = conf.PropertiesFile.parse(path)
+        self.assertEqual(p.to_index(), expected.to_index())
+        self.assertEqual(
+            p.compilers_exe["armg1320"].text, expected.compilers_exe["armg1320"].text
+        )
+        ## the rest of the file is only parsed when needed
+        self.assertEqual(p.group_prop("gccarm", "options"), "-DFOO=1 -DBAR=a=b")
+
+    def test_hit(self):
+        self.assertCached(self.path)
+
+    def test_size_change(self):
+        self.write_conf(self.TEXT + "\ncompiler.armg1320.semver=13.2.0\n")
+        self.assertIsNone(self.cache.load(self.path))
+
+    def test_mtime_change(self):
+        st = os.stat(self.path)
+        ## same size, same content: still valid
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertCached(self.path)
+        with open(self.cache._entry_path(self.path)) as f:
+            self.assertEqual(json.load(f)["mtime"], st.st_mtime_ns + 10**9)
+
+        ## same size, other content
+        self.write_conf(self.TEXT.replace("armg1120", "armg1121"))
+        self.assertEqual(os.stat(self.path).st_size, st.st_size)
+        self.assertIsNone(self.cache.load(self.path))
+
+    def test_format_bump(self):
+        with mock.patch.object(conf.ParseCache, "FORMAT", conf.ParseCache.FORMAT + 1):
+            self.assertIsNone(self.cache.load(self.path))
+
+    def test_corrupted_entry(self):
+        with open(self.cache._entry_path(self.path), "w") as f:
+            f.write("{")
+        self.assertIsNone(self.cache.load(self.path))
+
+    def test_lru_eviction(self):
+        entry_size = os.stat(self.cache._entry_path(self.path)).st_size
+        self.cache.max_size = entry_size * 3
+        paths = [self.path] + [
+            self.write_conf(self.TEXT, f"{n}.properties") for n in range(2)
+        ]
+        for n, path in enumerate(paths):
+            if n:
+                self.cache.store(path, conf.PropertiesFile.parse(path))
+            os.utime(self.cache._entry_path(path), (1000 + n, 1000 + n))
+        ## the oldest entry is used again, the next one is evicted
+        self.assertCached(self.path)
+        path = self.write_conf(self.TEXT, "new.properties")
+        self.cache.store(path, conf.PropertiesFile.parse(path))
+        self.assertEqual(
+            [p for p in paths + [path] if exists(self.cache._entry_path(p))],
+            [self.path, paths[2], path],
+        )
+
+
+class WriteTransactionTest(PropertiesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.journal = join(self.tmpdir.name, ".check_and_update_conf.journal")
+        self.targets = [self.write_conf("old\n", f"{n}.properties") for n in range(3)]
+
+    def transaction(self):
+        transaction = conf.WriteTransaction(self.journal)
+        for target in self.targets:
+            transaction.add(target, lambda f: f.write("new\n"), conf.file_stamp(target))
+        return transaction
+
+    def contents(self):
+        contents = []
+        for target in self.targets:
+            with open(target) as f:
+                contents.append(f.read())
+        return contents
+
+    def tmp_files(self):
+        return sorted(f for f in os.listdir(self.tmpdir.name) if f.endswith(".tmp"))
+
+    def test_commit(self):
+        self.transaction().commit()
+        self.assertEqual(self.contents(), ["new\n"] * 3)
+        self.assertFalse(exists(self.journal))
+        self.assertEqual(self.tmp_files(), [])
+
+    def test_changed_target(self):
+        transaction = self.transaction()
+        self.write_conf("changed behind our back\n", "1.properties")
+        with self.assertRaises(conf.Woops):
+            transaction.commit()
+        self.assertEqual(
+            self.contents(), ["old\n", "changed behind our back\n", "old\n"]
+        )
+        self.assertFalse(exists(self.journal))
+        self.assertEqual(self.tmp_files(), [])
+
+    def crash(self, renamed: int):
+        ## The process dies after the journal is written and `renamed` files
+        ## are renamed.
+        replace = os.replace
+        calls = []
+
+        def crashing_replace(src, dst):
+            if dst != self.journal:
+                if len(calls) == renamed:
+                    raise KeyboardInterrupt()
+                calls.append(dst)
+            replace(src, dst)
+
+        transaction = self.transaction()
+        with mock.patch.object(conf.os, "replace", crashing_replace):
+            with self.assertRaises(KeyboardInterrupt):
+                transaction.commit()
+        ## write_fixups() rolls back on any error.
+        transaction.rollback()
+
+    def recover(self, dry_run: bool) -> str:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            conf.recover_journal(self.journal, dry_run)
+        return output.getvalue()
+
+    def test_recover(self):
+        for renamed in range(3):
+            with self.subTest(renamed=renamed):
+                self.crash(renamed)
+                self.assertEqual(
+                    self.contents(), ["new\n"] * renamed + ["old\n"] * (3 - renamed)
+                )
+                self.assertEqual(len(self.tmp_files()), 3 - renamed)
+
+                self.assertIn("not written", self.recover(dry_run=True))
+                self.assertEqual(len(self.tmp_files()), 3 - renamed)
+                self.assertTrue(exists(self.journal))
+
+                self.assertIn("Finished writing 3 files", self.recover(dry_run=False))
+                self.assertEqual(self.contents(), ["new\n"] * 3)
+                self.assertEqual(self.tmp_files(), [])
+                self.assertFalse(exists(self.journal))
+                self.assertEqual(self.recover(dry_run=False), "")
+                for target in self.targets:
+                    self.write_conf("old\n", basename(target))
+
+    def test_recover_on_startup(self):
+        self.crash(1)
+        batch = self.write_conf("", "targets")
+        command = [
+            sys.executable,
+            SCRIPT,
+            "--config-dir",
+            self.tmpdir.name,
+            "--batch",
+            batch,
+            "--ctng-config-dir",
+            join(self.tmpdir.name, "ctng"),
+        ]
+        output = subprocess.run(
+            command + ["--dry-run"], check=True, capture_output=True, text=True
+        ).stdout
+        self.assertIn("3 files were not written by an interrupted run", output)
+        self.assertEqual(self.contents(), ["new\n", "old\n", "old\n"])
+        self.assertTrue(exists(self.journal))
+
+        output = subprocess.run(
+            command, check=True, capture_output=True, text=True
+        ).stdout
+        self.assertIn("Finished writing 3 files", output)
+        self.assertEqual(self.contents(), ["new\n"] * 3)
+        self.assertFalse(exists(self.journal))
+        self.assertEqual(self.tmp_files(), [])
+
+
+class ToolchainIndexTest(PropertiesTestCase):
+    TARGET = "arm-unknown-linux-gnueabi"
+
+    def setUp(self):
+        super().setUp()
+        self.tree = join(self.tmpdir.name, "arm", "gcc-12.2.0")
+        self.index_path = join(self.tmpdir.name, "index.json")
+        self.executable(f"bin/{self.TARGET}-gcc")
+        self.executable(f"{self.TARGET}/sysroot/usr/lib/libc.so", mode=0o644)
+        ## Older mtimes, so that any later change is seen even with a coarse
+        ## timestamp granularity.
+        for root, dirs, _ in os.walk(self.tree):
+            for d in [root] + [join(root, d) for d in dirs]:
+                os.utime(d, ns=(10**18, 10**18))
+        self.run_index()
+
+    def executable(self, path: str, mode: int = 0o755):
+        path = join(self.tree, path)
+        os.makedirs(dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\n")
+        os.chmod(path, mode)
+
+    ## A new run, with the index saved by the previous one.
+    def run_index(self):
+        index = conf.ToolchainIndex()
+        index.load(self.index_path)
+        executables = index.executables(self.tree)
+        rescanned = index.dirty
+        index.save(self.index_path)
+        return executables, rescanned
+
+    def test_unchanged(self):
+        executables, rescanned = self.run_index()
+        self.assertFalse(rescanned)
+        self.assertEqual(
+            executables["gcc"], join(self.tree, "bin", f"{self.TARGET}-gcc")
+        )
+        self.assertIn("linux-gnueabi-gcc", executables)
+        self.assertNotIn("so", executables)
+
+    def test_new_bin_directory(self):
+        self.executable(f"{self.TARGET}/bin/{self.TARGET}-objdump")
+        executables, rescanned = self.run_index()
+        self.assertTrue(rescanned)
+        self.assertEqual(
+            executables["objdump"],
+            join(self.tree, self.TARGET, "bin", f"{self.TARGET}-objdump"),
+        )
+
+    def test_new_executable(self):
+        self.executable(f"bin/{self.TARGET}-g++")
+        executables, rescanned = self.run_index()
+        self.assertTrue(rescanned)
+        self.assertIn("g++", executables)
+
+    def test_subdirectory_change(self):
+        os.utime(join(self.tree, self.TARGET, "sysroot", "usr"))
+        self.assertTrue(self.run_index()[1])
+        self.assertFalse(self.run_index()[1])
+
+    def test_older_index(self):
+        with open(self.index_path) as f:
+            trees = json.load(f)
+        trees[self.tree] = {"mtimes": {}, "executables": {}}
+        with open(self.index_path, "w") as f:
+            json.dump(trees, f)
+        executables, rescanned = self.run_index()
+        self.assertTrue(rescanned)
+        self.assertIn("gcc", executables)
+
+    def test_checked_once_per_run(self):
+        index = conf.ToolchainIndex()
+        index.load(self.index_path)
+        with mock.patch.object(
+            conf.ToolchainIndex, "_up_to_date", return_value=True
+        ) as up_to_date:
+            for _ in range(3):
+                self.assertIn("gcc", index.executables(self.tree))
+        self.assertEqual(up_to_date.call_count, 1)
+
+
+class CompilerProberTest(PropertiesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.prober = conf.CompilerProber(2, 5)
+        self.addCleanup(self.prober.shutdown)
+
+    def script(
+        self, name: str, body: str, mode: int = 0o755, shebang: str = "/bin/sh"
+    ) -> str:
+        path = join(self.tmpdir.name, name)
+        with open(path, "w") as f:
+            f.write(f"#!{shebang}\n{body}\n")
+        os.chmod(path, mode)
+        return path
+
+    def test_defaults(self):
+        self.assertEqual(
+            conf.COMPILER_PROBER.timeout, conf.parser.get_default("probe_timeout")
+        )
+        self.assertEqual(
+            conf.COMPILER_PROBER.pool._max_workers,
+            conf.parser.get_default("probe_jobs"),
+        )
+
+    def test_probe(self):
+        count = join(self.tmpdir.name, "count")
+        path = self.script("gcc", f"echo >> {count}; echo 'gcc 14.2.0'; echo more")
+        for _ in range(3):
+            self.assertEqual(self.prober.probe(path).result(), ["gcc 14.2.0", "more"])
+        with open(count) as f:
+            self.assertEqual(f.read(), "\n")
+
+    def test_errors(self):
+        cases = [
+            (self.script("failing", "exit 3"), "exited with 3"),
+            (self.script("not-executable", "true", mode=0o644), "Can't run"),
+            (self.script("bad", "true", shebang="/nonexistent/sh"), "Can't run"),
+            (join(self.tmpdir.name, "missing"), "Can't probe"),
+        ]
+        for path, message in cases:
+            with self.subTest(path=path):
+                with self.assertRaisesRegex(conf.Woops, message):
+                    self.prober.probe(path).result()
+
+    def test_timeout(self):
+        prober = conf.CompilerProber(1, 0.1)
+        self.addCleanup(prober.shutdown)
+        path = self.script("slow", "exec sleep 5")
+        with self.assertRaisesRegex(conf.Woops, "within 0.1s"):
+            prober.probe(path).result()
+
+    def test_find_compiler(self):
+        tree = join(self.tmpdir.name, "arm", "gcc-14.2.0", "bin")
+        os.makedirs(tree)
+        self.script("arm/gcc-14.2.0/bin/arm-unknown-linux-gnueabi-g++", "exit 1")
+        with mock.patch.object(conf, "COMPILER_PROBER", self.prober):
+            with contextlib.redirect_stdout(io.StringIO()):
+                with self.assertRaisesRegex(conf.Woops, "exited with 1"):
+                    conf.findCompiler("arm", "CXX", "14.2.0", self.tmpdir.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
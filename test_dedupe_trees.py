@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from os.path import dirname, join
+from unittest import mock
+
+import dedupe_trees
+
+## Tests of dedupe_trees.py on small trees in a temporary install root.
+
+SCRIPT = join(dirname(__file__) or ".", "dedupe_trees.py")
+CONTENT = b"#include <stdio.h>\n" * 100
+
+
+class DedupeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        self.store = join(self.root, ".dedupe-store")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, path: str, content: bytes = CONTENT, mode: int = 0o644) -> str:
+        path = join(self.root, path)
+        os.makedirs(dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        os.chmod(path, mode)
+        return path
+
+    def deduper(self) -> dedupe_trees.Deduper:
+        return dedupe_trees.Deduper(
+            argparse.Namespace(store=self.store, index=None, jobs=2, min_size=1)
+        )
+
+    def run_deduper(self, deduper=None, dry_run: bool = False):
+        deduper = deduper or self.deduper()
+        files = deduper.scan([self.root])
+        deduper.link(deduper.plan(files, deduper.hash(files)), dry_run)
+        deduper.index.save()
+        return deduper
+
+    def run_script(self, *args: str) -> dict:
+        output = subprocess.run(
+            [sys.executable, SCRIPT, "--json", "--min-size", "1", self.root, *args],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        return json.loads(output)
+
+    def inode(self, path: str) -> int:
+        return os.stat(join(self.root, path)).st_ino
+
+    def test_identical_files_share_an_inode(self):
+        self.write("gcc-12/include/stdio.h")
+        self.write("gcc-13/include/stdio.h")
+        self.write("gcc-13/include/other.h", b"other")
+        stats = self.run_deduper().stats
+        self.assertEqual(
+            self.inode("gcc-12/include/stdio.h"), self.inode("gcc-13/include/stdio.h")
+        )
+        self.assertNotEqual(
+            self.inode("gcc-13/include/other.h"), self.inode("gcc-13/include/stdio.h")
+        )
+        self.assertEqual((stats["stored"], stats["relinked"]), (2, 1))
+        self.assertEqual(stats["saved"], len(CONTENT))
+        with open(join(self.root, "gcc-12/include/stdio.h"), "rb") as f:
+            self.assertEqual(f.read(), CONTENT)
+
+        ## A second run finds everything already linked, and hashes nothing.
+        stats = self.run_deduper().stats
+        self.assertEqual((stats["hashed"], stats["relinked"]), (0, 0))
+        self.assertEqual(stats["linked"], 3)
+
+    def test_dry_run(self):
+        self.write("gcc-12/include/stdio.h")
+        self.write("gcc-13/include/stdio.h")
+        stats = self.run_deduper(dry_run=True).stats
+        self.assertEqual((stats["to_store"], stats["to_link"]), (1, 1))
+        self.assertNotEqual(
+            self.inode("gcc-12/include/stdio.h"), self.inode("gcc-13/include/stdio.h")
+        )
+
+    def test_modes_are_stored_separately(self):
+        self.write("gcc-12/bin/tool", mode=0o755)
+        self.write("gcc-13/bin/tool", mode=0o755)
+        self.write("gcc-13/share/tool", mode=0o644)
+        self.run_deduper()
+        self.assertEqual(self.inode("gcc-12/bin/tool"), self.inode("gcc-13/bin/tool"))
+        self.assertNotEqual(
+            self.inode("gcc-13/bin/tool"), self.inode("gcc-13/share/tool")
+        )
+        sha256 = dedupe_trees.file_sha256(join(self.root, "gcc-12/bin/tool"))
+        self.assertEqual(
+            sorted(os.listdir(join(self.store, sha256[:2]))),
+            [f"{sha256}-644", f"{sha256}-755"],
+        )
+        self.assertEqual(
+            os.stat(join(self.root, "gcc-12/bin/tool")).st_mode & 0o777, 0o755
+        )
+
+    def test_failed_link_leaves_the_original(self):
+        self.write("gcc-12/include/stdio.h")
+        original = self.write("gcc-13/include/stdio.h")
+        inode = self.inode("gcc-13/include/stdio.h")
+        for name in ("link", "replace"):
+            deduper = self.deduper()
+            files = deduper.scan([self.root])
+            to_link = deduper.plan(files, deduper.hash(files))
+            ## The store's copy is made, then relinking the other file fails.
+            deduper.link([t for t in to_link if t[3]], False)
+            with mock.patch.object(
+                dedupe_trees.os, name, side_effect=OSError(28, "No space left")
+            ):
+                with self.assertRaises(OSError):
+                    deduper.link([t for t in to_link if not t[3]], False)
+            self.assertEqual(self.inode("gcc-13/include/stdio.h"), inode)
+            with open(original, "rb") as f:
+                self.assertEqual(f.read(), CONTENT)
+            self.assertEqual(os.listdir(dirname(original)), ["stdio.h"])
+
+    @unittest.skipUnless(os.geteuid() == 0, "chown needs root")
+    def test_other_owner_is_skipped(self):
+        self.write("gcc-12/include/stdio.h")
+        other = self.write("gcc-13/include/stdio.h")
+        os.chown(other, 12345, 12345)
+        stats = self.run_deduper().stats
+        self.assertEqual(stats["skipped"], 1)
+        self.assertEqual(stats["relinked"], 0)
+        self.assertNotEqual(
+            self.inode("gcc-12/include/stdio.h"), self.inode("gcc-13/include/stdio.h")
+        )
+        self.assertEqual(os.stat(other).st_uid, 12345)
+
+    def test_other_device_is_skipped(self):
+        self.write("gcc-12/include/stdio.h")
+        self.write("gcc-13/include/stdio.h")
+        deduper = self.deduper()
+        ## The store is on another filesystem than the trees.
+        deduper.device += 1
+        stats = self.run_deduper(deduper).stats
+        self.assertEqual(stats["files"], 0)
+        self.assertEqual(os.listdir(self.store), ["index.json"])
+
+    def test_prune(self):
+        self.write("gcc-12/include/stdio.h")
+        self.write("gcc-12/include/removed.h", b"removed")
+        self.write("gcc-13/include/stdio.h")
+        stats = self.run_script()
+        self.assertEqual((stats["stored"], stats["orphans"]), (2, 0))
+
+        os.unlink(join(self.root, "gcc-12/include/removed.h"))
+        stats = self.run_script("--dry-run", "--prune")
+        self.assertEqual(stats["orphans"], 1)
+        self.assertEqual(len(self.deduper().orphans()), 1)
+
+        stats = self.run_script("--prune")
+        self.assertEqual(stats["orphans"], 1)
+        self.assertEqual(self.deduper().orphans(), [])
+        sha256 = dedupe_trees.file_sha256(join(self.root, "gcc-12/include/stdio.h"))
+        self.assertEqual(os.listdir(join(self.store, sha256[:2])), [f"{sha256}-644"])
+        self.assertEqual(
+            self.inode("gcc-12/include/stdio.h"), self.inode("gcc-13/include/stdio.h")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import check_and_update_conf as conf
+import run_api_tests
+
+## Tests of run_api_tests.py against a stub CE API server, run with:
+##   python3 -m unittest test_run_api_tests
+
+
+## Answers /api/compilers and /api/compiler/ID/compile with HTTP/1.1
+## keep-alive. Compilers named in `codes` answer with that code, those in
+## `delays` only after that many seconds. With `chunked`, the compile
+## responses use the chunked transfer encoding, and with `close_after`, the
+## connections are dropped after that many responses without a
+## 'Connection: close' header.
+class StubServer:
+    def __init__(self, codes=None, delays=None, chunked=False, close_after=None):
+        self.codes = codes or {}
+        self.delays = delays or {}
+        self.chunked = chunked
+        self.close_after = close_after
+        self.connections = 0
+        self.requests = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/base"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        served = 0
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, path, _ = request_line.decode().split()
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    k, _, v = line.decode().partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests.append((method, path, body))
+                await self.respond(writer, method, path)
+                served += 1
+                if self.close_after and served >= self.close_after:
+                    return
+        finally:
+            writer.close()
+
+    async def respond(self, writer, method, path):
+        if path == "/base/api/compilers?fields=id,supportsBinary":
+            data = [{"id": "nobin", "supportsBinary": False}, {"id": "gcc"}]
+            self.send(writer, 200, json.dumps(data).encode())
+            return
+        compiler = path.split("/")[4]
+        if method != "POST" or compiler == "missing":
+            self.send(writer, 404, b"not found")
+            return
+        await asyncio.sleep(self.delays.get(compiler, 0))
+        data = json.dumps({"code": self.codes.get(compiler, 0)}).encode()
+        self.send(writer, 200, data, self.chunked)
+
+    def send(self, writer, status, data, chunked=False):
+        headers = [f"HTTP/1.1 {status} X"]
+        if chunked:
+            half = len(data) // 2
+            headers.append("Transfer-Encoding: chunked")
+            data = b"".join(
+                b"%x\r\n%s\r\n" % (len(part), part)
+                for part in (data[:half], data[half:])
+            )
+            data += b"0\r\n\r\n"
+        else:
+            headers.append(f"Content-Length: {len(data)}")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode() + data)
+
+
+## The tests are written by check_and_update_conf.py (--create-api-tests) and
+## read back as run_api_tests.py does, each compiler getting an ASM and an
+## ASM+BINARY test.
+def write_manifest(path: str, compilers, fake=False, previous=None):
+    with conf.open_api_tests(path, "manifest", "http://ce") as output:
+        with mock.patch.multiple(
+            conf, API_TESTS_FORMAT="manifest", API_TESTS_OUTPUT=output
+        ), contextlib.redirect_stdout(io.StringIO()):
+            for compiler in compilers:
+                conf.create_test("arm", "C", compiler, fake=fake, previous=previous)
+
+
+def make_tests(compilers, fake=False, previous=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tests.jsonl")
+        write_manifest(path, compilers, fake, previous)
+        return run_api_tests.load_manifest(path)[1]
+
+
+def make_test(compiler, binary=False, fake=False, previous=None):
+    kind = "ASM+BINARY" if binary else "ASM"
+    tests = make_tests([compiler], fake, previous)
+    return next(t for t in tests if t["kind"] == kind)
+
+
+class ManifestTest(unittest.TestCase):
+    def test_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tests.jsonl")
+            write_manifest(path, ["armg1320"], previous="armg1220")
+            ## appended by a later run
+            write_manifest(path, ["fake"], fake=True)
+            host, tests = run_api_tests.load_manifest(path)
+        self.assertEqual(host, "http://ce")
+        self.assertEqual(
+            [(t["compiler"], t["kind"], t["fake"]) for t in tests],
+            [
+                ("armg1320", "ASM", False),
+                ("armg1320", "ASM+BINARY", False),
+                ("fake", "ASM", True),
+                ("fake", "ASM+BINARY", True),
+            ],
+        )
+        self.assertEqual(tests[0]["name"], "arm C armg1320 ASM")
+        self.assertEqual(tests[0]["previous"], "armg1220")
+        self.assertNotIn("previous", tests[2])
+        self.assertEqual(tests[0]["filters"], {})
+        self.assertEqual(tests[1]["filters"], {"binary": True})
+        self.assertEqual(
+            run_api_tests.compile_request(tests[1]["source"], tests[1]["filters"]),
+            conf.compile_request("C", {"binary": True}),
+        )
+
+
+class RunApiTestsTest(unittest.IsolatedAsyncioTestCase):
+    async def serve(self, **kwargs):
+        self.server = StubServer(**kwargs)
+        self.addAsyncCleanup(self.server.stop)
+        return await self.server.start()
+
+    async def test_statuses(self):
+        host = await self.serve(codes={"broken": 1})
+        tests = [
+            make_test("gcc"),
+            make_test("broken"),
+            make_test("missing"),
+            make_test("nobin", binary=True),
+            make_test("gcc", binary=True),
+        ]
+        results = await run_api_tests.run_tests(host, tests, 2, 5)
+        self.assertEqual(
+            [r["status"] for r in results], ["OK", "FAIL", "ERROR", "SKIPPED", "OK"]
+        )
+        self.assertIn("returned 404", results[2]["reason"])
+        _, path, body = self.server.requests[-1]
+        self.assertTrue(path.startswith("/base/api/compiler/"))
+        self.assertEqual(
+            json.loads(body)["source"], run_api_tests.compile_request("C")["source"]
+        )
+
+    async def test_connections_are_reused(self):
+        host = await self.serve(chunked=True)
+        tests = [make_test(f"gcc{i}") for i in range(20)]
+        results = await run_api_tests.run_tests(host, tests, 3, 5)
+        self.assertEqual({r["status"] for r in results}, {"OK"})
+        self.assertLessEqual(self.server.connections, 3)
+
+    async def test_closed_idle_connection_is_retried(self):
+        host = await self.serve(close_after=1)
+        tests = [make_test(f"gcc{i}") for i in range(5)]
+        results = await run_api_tests.run_tests(host, tests, 1, 5)
+        self.assertEqual({r["status"] for r in results}, {"OK"})
+        self.assertEqual(self.server.connections, 5)
+
+    async def test_request_timeout(self):
+        host = await self.serve(delays={"slow": 5})
+        results = await run_api_tests.run_tests(
+            host, [make_test("slow"), make_test("gcc")], 2, 0.2
+        )
+        self.assertEqual([r["status"] for r in results], ["ERROR", "OK"])
+        self.assertEqual(results[0]["reason"], "TimeoutError")
+
+    async def test_connect_timeout(self):
+        async def never_connects(*args, **kwargs):
+            await asyncio.sleep(60)
+
+        with mock.patch("asyncio.open_connection", never_connects):
+            results = await run_api_tests.run_tests(
+                "http://127.0.0.1:1", [make_test("gcc")], 1, 0.2
+            )
+        self.assertEqual(results[0]["status"], "ERROR")
+        self.assertLess(results[0]["duration"], 5)
+
+    async def test_benchmark(self):
+        host = await self.serve(delays={"new": 0.05})
+        test = make_test("new", previous="old")
+        benchmarks = await run_api_tests.run_benchmarks(host, [test], 2, 5, 4)
+        self.assertEqual(benchmarks[0]["new"]["requests"], 4)
+        self.assertEqual(benchmarks[0]["previous"]["errors"], 0)
+        self.assertEqual(run_api_tests.compare(benchmarks, 1.5), 1)
+        self.assertEqual(benchmarks[0]["status"], "REGRESSION")
+
+
+class ReportTest(unittest.TestCase):
+    def test_fake_tests_must_not_pass(self):
+        results = [
+            dict(make_test("gcc"), status="OK", duration=0),
+            dict(make_test("fake", fake=True), status="OK", duration=0),
+            dict(make_test("fake", fake=True), status="FAIL", duration=0),
+        ]
+        with mock.patch("builtins.print"):
+            self.assertEqual(run_api_tests.report(results), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
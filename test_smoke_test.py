@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from os.path import dirname, join
+
+## Tests of smoke_test.py with a stub arm64 toolchain wrapping the host
+## compiler, and stub ct-ng configs.
+
+SCRIPT = join(dirname(__file__) or ".", "smoke_test.py")
+TARGET = "aarch64-unknown-linux-gnu"
+
+STUB_DRIVER = """#!/bin/sh
+if [ "$1" = --version ]; then
+    echo "{name} (stub) 14.2.0"
+    exit 0
+fi
+exec {path} "$@"
+"""
+
+
+@unittest.skipUnless(
+    all(shutil.which(t) for t in ("gcc", "g++", "objdump", "c++filt")),
+    "needs a host toolchain",
+)
+class SmokeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.root = join(self.tmpdir.name, "root")
+        self.ctng_config_dir = join(self.tmpdir.name, "ctng")
+        os.makedirs(self.ctng_config_dir)
+        self.results = join(self.tmpdir.name, "results.json")
+
+        bin_dir = join(self.root, "arm64", "gcc-14.2.0", TARGET, "bin")
+        os.makedirs(bin_dir)
+        for name in ("gcc", "g++"):
+            path = join(bin_dir, f"{TARGET}-{name}")
+            with open(path, "w") as f:
+                f.write(STUB_DRIVER.format(name=name, path=shutil.which(name)))
+            os.chmod(path, 0o755)
+        for name in ("objdump", "c++filt"):
+            os.symlink(shutil.which(name), join(bin_dir, f"{TARGET}-{name}"))
+
+    def write_config(self, target: str, langs):
+        with open(join(self.ctng_config_dir, f"{target}.config"), "w") as f:
+            f.write('CT_ARCH="arm"\n')
+            for lang in langs:
+                f.write(f"CT_CC_LANG_{lang}=y\n")
+
+    def smoke_test(self, *targets: str, langs=("C", "CXX", "FORTRAN")):
+        batch = join(self.tmpdir.name, "targets")
+        with open(batch, "w") as f:
+            f.write("".join(f"{target}\n" for target in targets))
+        command = [
+            sys.executable,
+            SCRIPT,
+            "--batch",
+            batch,
+            "--install-root",
+            self.root,
+            "--ctng-config-dir",
+            self.ctng_config_dir,
+            "--results",
+            self.results,
+            "-j",
+            "2",
+        ]
+        for lang in langs:
+            command += ["-l", lang]
+        process = subprocess.run(command, capture_output=True, text=True)
+        with open(self.results) as f:
+            results = json.load(f)["results"]
+        return (
+            process.returncode,
+            process.stdout,
+            {(r["version"], r["lang"]): r for r in results},
+        )
+
+    def test_ok(self):
+        self.write_config("arm64-14.2.0", ["CXX"])
+        status, output, results = self.smoke_test("arm64 14.2.0")
+        self.assertEqual(status, 0, output)
+        self.assertEqual(results[("14.2.0", "C")]["status"], "ok")
+        self.assertEqual(results[("14.2.0", "CXX")]["status"], "ok")
+        self.assertEqual(
+            list(results[("14.2.0", "CXX")]["timings"]),
+            ["asm", "object", "disassemble", "demangle"],
+        )
+        self.assertEqual(results[("14.2.0", "FORTRAN")]["status"], "skipped")
+        self.assertIn("2 tests", output)
+
+    def test_missing_config(self):
+        self.write_config("arm64-14.2.0", ["CXX"])
+        status, output, results = self.smoke_test("arm64 14.2.0", "arm64 15.1.0")
+        self.assertEqual(status, 1)
+        missing = results[("15.1.0", "*")]
+        self.assertEqual((missing["status"], missing["stage"]), ("failed", "config"))
+        self.assertIn("arm64-15.1.0.config", missing["error"])
+        self.assertIn("failed (config)", output)
+        ## the other target is still tested
+        self.assertEqual(results[("14.2.0", "CXX")]["status"], "ok")
+        self.assertIn("2 tests", output)
+        self.assertIn("1 failures", output)
+
+    def test_resolve_failure(self):
+        self.write_config("arm64-14.2.0", ["CXX", "FORTRAN"])
+        status, output, results = self.smoke_test("arm64 14.2.0")
+        self.assertEqual(status, 1)
+        self.assertEqual(results[("14.2.0", "FORTRAN")]["stage"], "resolve")
+        self.assertEqual(results[("14.2.0", "CXX")]["status"], "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import unittest
+from os.path import join
+from unittest import mock
+
+import check_and_update_conf as conf
+import watch_installs
+
+## Tests of watch_installs.py on a temporary install root, with a stub
+## updater, run with:
+##   python3 -m unittest test_watch_installs
+
+STUB_UPDATER = """import json, sys
+batch = sys.argv[sys.argv.index("--batch") + 1]
+print(json.dumps({"argv": sys.argv[1:], "batch": open(batch).read()}))
+sys.exit(3 if "--fail" in sys.argv else 0)
+"""
+
+
+## ct-ng installs in TREE/TARGET (CT_PREFIX_DIR of the configs).
+TARGET = "arm-unknown-linux-gnueabi"
+
+
+def touch(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("x")
+
+
+class WatcherTests:
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        os.makedirs(join(self.root, "arm", "gcc-13.2.0", TARGET, "bin"))
+        os.makedirs(join(self.root, "unknown"))
+        self.watcher = self.make_watcher({"arm", "arm64"})
+
+    def new_trees(self):
+        return self.watcher.new_trees(0.2)
+
+    def test_new_trees(self):
+        self.assertEqual(self.watcher.trees, {join(self.root, "arm", "gcc-13.2.0")})
+        os.makedirs(join(self.root, "arm", "gcc-14.2.0"))
+        os.makedirs(join(self.root, "arm64", "gcc-14.2.0"))
+        os.makedirs(join(self.root, "unknown", "gcc-14.2.0"))
+        found = self.new_trees() | self.new_trees()
+        self.assertEqual(
+            found,
+            {
+                join(self.root, "arm", "gcc-14.2.0"),
+                join(self.root, "arm64", "gcc-14.2.0"),
+            },
+        )
+        self.assertEqual(self.new_trees(), set())
+
+    def test_ready_once_settled(self):
+        tree = join(self.root, "arm", "gcc-14.2.0")
+        os.makedirs(tree)
+        self.assertEqual(self.new_trees(), {tree})
+        self.assertFalse(watch_installs.tree_ready(self.watcher, tree, 0.5))
+
+        time.sleep(0.6)
+        self.assertFalse(watch_installs.tree_ready(self.watcher, tree, 0.5))
+        touch(join(tree, TARGET, "bin", f"{TARGET}-as"))
+        self.new_trees()
+        time.sleep(0.6)
+        self.assertFalse(watch_installs.tree_ready(self.watcher, tree, 0.5))
+        touch(join(tree, TARGET, "bin", f"{TARGET}-gcc"))
+        self.new_trees()
+        self.assertFalse(watch_installs.tree_ready(self.watcher, tree, 0.5))
+
+        time.sleep(0.6)
+        self.new_trees()
+        self.assertTrue(watch_installs.tree_ready(self.watcher, tree, 0.5))
+        self.watcher.forget(tree)
+
+
+class InotifyWatcherTest(WatcherTests, unittest.TestCase):
+    def make_watcher(self, arches):
+        try:
+            return watch_installs.InotifyWatcher(self.root, arches)
+        except (OSError, AttributeError) as e:
+            self.skipTest(f"inotify not available ({e})")
+
+    def test_changes_in_new_directories(self):
+        tree = join(self.root, "arm", "gcc-14.2.0")
+        os.makedirs(tree)
+        self.new_trees()
+        os.makedirs(join(tree, "libexec", "gcc"))
+        self.new_trees()
+        before = time.time()
+        touch(join(tree, "libexec", "gcc", "cc1"))
+        self.new_trees()
+        self.assertGreaterEqual(self.watcher.changes[tree], before)
+
+        self.watcher.forget(tree)
+        self.assertEqual(self.watcher.tree_watches, {})
+        self.assertNotIn(tree, self.watcher.inotify.watches.values())
+
+
+class PollingWatcherTest(WatcherTests, unittest.TestCase):
+    def make_watcher(self, arches):
+        return watch_installs.PollingWatcher(self.root, arches, 0.1)
+
+    def test_walks_only_settled_trees(self):
+        tree = join(self.root, "arm", "gcc-14.2.0")
+        os.makedirs(tree)
+        self.new_trees()
+        with mock.patch.object(watch_installs, "newest_change") as newest_change:
+            self.assertFalse(self.watcher.settled(tree, 10))
+            newest_change.assert_not_called()
+
+
+class RunUpdaterTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        updater = join(self.tmp, "updater.py")
+        with open(updater, "w") as f:
+            f.write(STUB_UPDATER)
+        patcher = mock.patch.object(watch_installs, "UPDATER", updater)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_updater(self, *updater_args):
+        args = argparse.Namespace(
+            output_dir=self.tmp,
+            config_dir=join(self.tmp, "config"),
+            install_root=join(self.tmp, "root"),
+            updater_args=list(updater_args),
+        )
+        return watch_installs.run_updater(
+            args, [("arm", "14.2.0"), ("arm-unknown", "14.2.0")], "stamp"
+        )
+
+    def test_batch(self):
+        status, patch, tests, log = self.run_updater("--ctng-matrix-cache", "x")
+        self.assertEqual(status, 0)
+        with open(log) as f:
+            output = json.load(f)
+        self.assertEqual(output["batch"], "arm 14.2.0\narm-unknown 14.2.0\n")
+        argv = output["argv"]
+        self.assertIn("--dry-run", argv)
+        self.assertEqual(argv[argv.index("--patch") + 1], patch)
+        self.assertEqual(argv[argv.index("--create-api-tests") + 1], tests)
+        self.assertEqual(argv[-2:], ["--ctng-matrix-cache", "x"])
+        self.assertEqual(
+            [f for f in os.listdir(self.tmp) if f.endswith(".targets")], []
+        )
+
+    def test_failure(self):
+        status, _, _, _ = self.run_updater("--fail")
+        self.assertEqual(status, 3)
+
+
+class ArchDirectoryTest(unittest.TestCase):
+    def test_arch_directory(self):
+        for arch in ("arm", "arm-unknown", "arm64"):
+            tree = conf.toolchain_dir(arch, "14.2.0", "/root")
+            self.assertEqual(tree.split("/")[2], conf.arch_directory(arch))
+            self.assertEqual(conf.toolchain_target(tree, "/root"), (arch, "14.2.0"))
+
+
+if __name__ == "__main__":
+    unittest.main()
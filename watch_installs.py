@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Compiler Explorer Authors
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#     * Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import ctypes
+import errno
+import glob
+import os
+import select
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from os.path import abspath, dirname, isdir, join
+
+import check_and_update_conf as conf
+
+## Watches the install root for new toolchains (ROOT/<arch>/gcc-<version>, see
+## toolchain_dir() in check_and_update_conf.py) and runs the config updater
+## only for them, producing a patch for the config files and a smoke test
+## manifest for run_api_tests.py instead of changing anything. Uses inotify
+## when available, polling otherwise.
+##
+## A new tree is handled once it looks complete (it has a TARGET/bin/*-gcc) and
+## nothing changed in it for --settle seconds; the trees ready at the same time
+## are handled together by a single --batch run. With inotify, the directories
+## of the new trees are watched to know when they last changed; when polling,
+## a new tree is walked again only once it may have settled.
+
+UPDATER = join(dirname(abspath(__file__)), "check_and_update_conf.py")
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+EVENT_HEADER = struct.Struct("iIII")
+
+DIRECTORY_EVENTS = IN_CREATE | IN_MOVED_TO | IN_DELETE_SELF
+TREE_EVENTS = (
+    DIRECTORY_EVENTS
+    | IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_DELETE
+)
+
+
+## Lists the toolchain trees of the known arches under root.
+def scan_trees(root: str, arches):
+    trees = set()
+    for arch in arches:
+        arch_dir = join(root, arch)
+        try:
+            with os.scandir(arch_dir) as it:
+                for entry in it:
+                    if entry.name.startswith("gcc-") and entry.is_dir():
+                        trees.add(entry.path)
+        except OSError:
+            continue
+    return trees
+
+
+class Inotify:
+    def __init__(self):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def add_watch(self, path: str, mask=DIRECTORY_EVENTS):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"can't watch {path}: {os.strerror(err)}")
+        self.watches[wd] = path
+        return wd
+
+    def rm_watch(self, wd: int):
+        if self.watches.pop(wd, None) is not None:
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    ## Returns the (watch descriptor, directory, mask, name) of the events
+    ## (directory is None for IN_Q_OVERFLOW).
+    def read(self, timeout: float):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, self.watches.get(wd), mask, os.fsdecode(name)))
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+        return events
+
+
+## Time of the last change in a tree, from the mtimes of its directories.
+def newest_change(tree: str):
+    newest = 0
+    for root, _, _ in os.walk(tree):
+        try:
+            newest = max(newest, os.stat(root).st_mtime)
+        except OSError:
+            continue
+    return newest
+
+
+class InotifyWatcher:
+    def __init__(self, root: str, arches):
+        self.root = root
+        self.arches = arches
+        self.inotify = Inotify()
+        self.inotify.add_watch(root)
+        for arch in arches:
+            if isdir(join(root, arch)):
+                self.inotify.add_watch(join(root, arch))
+        self.trees = scan_trees(root, arches)
+        ## Time of the last event in each new tree, and the tree of each watch
+        ## in them. Trees which can't be watched (e.g. too many watches) are
+        ## walked instead.
+        self.changes = {}
+        self.tree_watches = {}
+        self.unwatched = set()
+
+    ## Watches the directories of a tree (or the new directory of a tree).
+    ## Anything created before the watch is added is seen by the walk.
+    def follow(self, tree: str, directory: str):
+        for path, _, _ in os.walk(directory):
+            try:
+                self.tree_watches[self.inotify.add_watch(path, TREE_EVENTS)] = tree
+            except OSError as e:
+                if e.errno != errno.ENOENT and tree not in self.unwatched:
+                    print(f"{e}, {tree} will be walked instead", flush=True)
+                    self.unwatched.add(tree)
+
+    def forget(self, tree: str):
+        for wd in [wd for wd, t in self.tree_watches.items() if t == tree]:
+            del self.tree_watches[wd]
+            self.inotify.rm_watch(wd)
+        self.changes.pop(tree, None)
+        self.unwatched.discard(tree)
+
+    def settled(self, tree: str, settle: float) -> bool:
+        if tree in self.unwatched:
+            return time.time() - newest_change(tree) >= settle
+        return time.time() - self.changes.get(tree, 0) >= settle
+
+    def new_trees(self, timeout: float):
+        found = set()
+        now = time.time()
+        for wd, directory, mask, name in self.inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                ## Events were lost: anything may have changed.
+                self.changes = dict.fromkeys(self.changes, now)
+                found |= scan_trees(self.root, self.arches)
+            elif wd in self.tree_watches:
+                tree = self.tree_watches[wd]
+                self.changes[tree] = now
+                if mask & IN_IGNORED:
+                    del self.tree_watches[wd]
+                elif mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.follow(tree, join(directory, name))
+            elif not mask & IN_ISDIR or directory is None:
+                continue
+            elif directory == self.root and name in self.arches:
+                ## Anything created before the watch is added is seen by the
+                ## scan.
+                self.inotify.add_watch(join(directory, name))
+                found |= scan_trees(self.root, [name])
+            elif directory != self.root and name.startswith("gcc-"):
+                found.add(join(directory, name))
+        found -= self.trees
+        self.trees |= found
+        for tree in found:
+            self.changes[tree] = now
+            self.follow(tree, tree)
+        return found
+
+
+class PollingWatcher:
+    def __init__(self, root: str, arches, interval: float):
+        self.root = root
+        self.arches = arches
+        self.interval = interval
+        self.trees = scan_trees(root, arches)
+        ## Last change seen in each new tree.
+        self.changes = {}
+
+    def new_trees(self, timeout: float):
+        time.sleep(min(timeout, self.interval))
+        current = scan_trees(self.root, self.arches)
+        found = current - self.trees
+        self.trees = current
+        for tree in found:
+            self.changes[tree] = time.time()
+        return found
+
+    def forget(self, tree: str):
+        self.changes.pop(tree, None)
+
+    ## The tree is only walked again once the last change seen is old enough.
+    def settled(self, tree: str, settle: float) -> bool:
+        if time.time() - self.changes.get(tree, 0) < settle:
+            return False
+        self.changes[tree] = newest_change(tree)
+        return time.time() - self.changes[tree] >= settle
+
+
+## A tree is ready when it has a compiler and nothing changed in it for
+## settle seconds.
+def tree_ready(watcher, tree: str, settle: float) -> bool:
+    return has_compiler(tree) and watcher.settled(tree, settle)
+
+
+## ct-ng installs the toolchain in TREE/TARGET (CT_PREFIX_DIR), so the
+## compiler is TREE/TARGET/bin/TARGET-gcc; TREE/bin is also accepted.
+def has_compiler(tree: str) -> bool:
+    return bool(glob.glob(join(glob.escape(tree), "*", "bin", "*-gcc"))) or bool(
+        glob.glob(join(glob.escape(tree), "bin", "*-gcc"))
+    )
+
+
+def run_updater(args, targets, stamp: str):
+    patch = join(args.output_dir, f"update-{stamp}.patch")
+    tests = join(args.output_dir, f"update-{stamp}.tests.jsonl")
+    log = join(args.output_dir, f"update-{stamp}.log")
+    with tempfile.NamedTemporaryFile("w", suffix=".targets", delete=False) as f:
+        for arch, version in targets:
+            f.write(f"{arch} {version}\n")
+        batch = f.name
+    cmd = [
+        sys.executable,
+        UPDATER,
+        "--batch",
+        batch,
+        "--guess-previous",
+        "--config-dir",
+        args.config_dir,
+        "--install-root",
+        args.install_root,
+        "--inplace",
+        "--dry-run",
+        "--patch",
+        patch,
+        "--create-api-tests",
+        tests,
+        "--config-todo",
+        join(args.output_dir, f"update-{stamp}.todo"),
+        "--summary",
+        join(args.output_dir, f"update-{stamp}.summary"),
+    ] + args.updater_args
+    try:
+        with open(log, "w") as log_f:
+            status = subprocess.call(cmd, stdout=log_f, stderr=subprocess.STDOUT)
+    finally:
+        os.remove(batch)
+    return status, patch, tests, log
+
+
+parser = argparse.ArgumentParser(
+    description="Watch the install root and prepare the config updates for the new toolchains."
+)
+parser.add_argument("--install-root", default="/opt/compiler-explorer", metavar="ROOT")
+parser.add_argument("--config-dir", required=True, metavar="CONFIGDIR")
+parser.add_argument(
+    "--output-dir",
+    default=".",
+    metavar="DIR",
+    help="where the patches, test manifests and logs are written",
+)
+parser.add_argument(
+    "--settle",
+    default=30,
+    type=float,
+    metavar="SECONDS",
+    help="time without change in a new tree before handling it",
+)
+parser.add_argument(
+    "--interval",
+    default=10,
+    type=float,
+    metavar="SECONDS",
+    help="polling interval, when inotify is not available",
+)
+parser.add_argument("--poll", action="store_true", help="don't use inotify")
+parser.add_argument(
+    "--once", action="store_true", help="exit after handling the first new trees"
+)
+parser.add_argument(
+    "updater_args",
+    nargs="*",
+    metavar="-- UPDATER_ARGS",
+    help="more arguments for check_and_update_conf.py (e.g. --ctng-matrix-cache)",
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    args.install_root = abspath(args.install_root)
+    os.makedirs(args.output_dir, exist_ok=True)
+    args.config_dir = abspath(args.config_dir)
+    arches = {conf.arch_directory(arch) for arch in conf.known_arches()}
+
+    watcher = None
+    if not args.poll:
+        try:
+            watcher = InotifyWatcher(args.install_root, arches)
+        except (OSError, AttributeError) as e:
+            print(f"inotify not available ({e}), polling every {args.interval}s")
+    if watcher is None:
+        watcher = PollingWatcher(args.install_root, arches, args.interval)
+    print(f"Watching {args.install_root} ({len(watcher.trees)} trees)", flush=True)
+
+    pending = set()
+    while True:
+        for tree in watcher.new_trees(1 if pending else args.interval):
+            target = conf.toolchain_target(tree, args.install_root)
+            if target:
+                print(f"New toolchain {target[0]} {target[1]} in {tree}", flush=True)
+                pending.add(tree)
+            else:
+                watcher.forget(tree)
+
+        gone = {tree for tree in pending if not isdir(tree)}
+        ready = {
+            tree for tree in pending - gone if tree_ready(watcher, tree, args.settle)
+        }
+        for tree in gone | ready:
+            watcher.forget(tree)
+        pending -= gone | ready
+        if not ready:
+            continue
+
+        targets = sorted(conf.toolchain_target(t, args.install_root) for t in ready)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        status, patch, tests, log = run_updater(args, targets, stamp)
+        names = ", ".join(f"{arch} {version}" for arch, version in targets)
+        if status == 0:
+            print(f"{names}: patch in {patch}, tests in {tests}", flush=True)
+        else:
+            print(f"{names}: update failed, see {log}", flush=True)
+        if args.once:
+            sys.exit(status)